@@ -1,9 +1,9 @@
-from flask import Flask
-from flask import Flask
-from app.extensions import init_extensions
-from app.routes import register_blueprints
-
 def create_app():
+    # Imported here so the services under app/ stay importable without Flask or Celery (e.g. in the Lambda)
+    from flask import Flask
+    from app.extensions import init_extensions
+    from app.routes import register_blueprints
+    
     app = Flask(__name__)
     # Initialize extensions
     init_extensions(app)
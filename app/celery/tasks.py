@@ -1,54 +1,125 @@
 from app.redis.redis import redis_client
+from app.redis.lock import ProcessingLock
 from app.extensions import celery
-from celery.signals import worker_init
+from celery.signals import worker_init, worker_process_shutdown, before_task_publish, task_prerun, task_postrun
+from contextlib import ExitStack
+from app.helpers.tracing import continue_trace, inject, span
+from app.helpers import metrics
+import os
 
 # Worker initialization - this runs when each worker process starts
 @worker_init.connect
 def init_worker(**kwargs):
     """Initialize services when worker starts"""
-    from app.services.SQLService import SQLService
-    from app.services.RAGService import RAGService
-    from app.services.FileService import FileService
-    from app.helpers.logger import Logger
+    from app.service_instances import registry
     
-    logger = Logger().get_logger()
-    sql_service = SQLService(logger)
-    rag_service = RAGService(logger, sql_service)
-    file_service = FileService(logger, sql_service, rag_service)
+    registry.tracer
+    # Created before the pool forks, every child then writes its own samples to PROMETHEUS_MULTIPROC_DIR
+    registry.metrics
+    
+    # Ingestion workers warm up the model clients and layout models before taking tasks
+    try:
+        registry.preload()
+    except Exception as e:
+        registry.logger.error(f"Failed to preload models, they will load on first use: {e}")
     
     # Store services in celery configuration for this worker
     celery.conf.update({
-        'file_service': file_service,
-        'rag_service': rag_service,
-        'sql_service': sql_service,
-        'logger': logger
+        'file_service': registry.file_service,
+        'rag_service': registry.rag_service,
+        'sql_service': registry.sql_service,
+        'logger': registry.logger
     })
 
-@celery.task
-def process_file_task(id: int):
+@worker_process_shutdown.connect
+def drop_worker_metrics(pid=None, **kwargs):
+    metrics.mark_process_dead(pid or os.getpid())
+
+# task_id -> (ExitStack, span, query counter) of the running task, opened in task_prerun and closed in task_postrun
+_task_spans = {}
+
+@before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    """Send the trace of the enqueuing request along as a message header, read back by start_task_span."""
+    if headers is not None:
+        headers.update(inject())
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, args=None, **kwargs):
+    # Custom message headers show up as attributes of the task request
+    traceparent = getattr(task.request, "traceparent", None)
+    stack = ExitStack()
+    stack.enter_context(continue_trace({"traceparent": traceparent} if traceparent else {}))
+    task_span = stack.enter_context(span(f"celery.{task.name.rsplit('.', 1)[-1]}", task_id=task_id, file_id=args[0] if args else None))
+    queries = stack.enter_context(metrics.count_queries())
+    _task_spans[task_id] = (stack, task_span, queries)
+
+@task_postrun.connect
+def end_task_span(task_id=None, task=None, state=None, retval=None, **kwargs):
+    entry = _task_spans.pop(task_id, None)
+    if entry is not None:
+        stack, task_span, queries = entry
+        task_span.set("state", state)
+        # The tasks report failures in their result, an exception that escaped them is an error too
+        status = retval.get("status", "error") if isinstance(retval, dict) else "error"
+        metrics.count_ingest(task.name.rsplit('.', 1)[-1], status, queries[0])
+        stack.close()
+
+def get_task_services():
     # Get services from celery configuration
     file_service = celery.conf.get('file_service')
     logger = celery.conf.get('logger')
     
-    
-        # Fallback initialization if services are not available
+    # Fallback initialization if services are not available
     if not file_service or not logger:
         print(f"{'*'*50}\nServices not initialized in Celery context.\n{'*'*50}")
         
-        from app.services.SQLService import SQLService
-        from app.services.RAGService import RAGService
-        from app.services.FileService import FileService
-        from app.helpers.logger import Logger
+        from app.service_instances import registry
         
-        logger = Logger().get_logger()
-        sql_service = SQLService(logger)
-        rag_service = RAGService(logger, sql_service)
-        file_service = FileService(logger, sql_service, rag_service)
+        logger = registry.logger
+        file_service = registry.file_service
+    return file_service, logger
+
+def take_processing_lock(id: int, lock_token: str, logger) -> ProcessingLock:
+    """Take over the lock acquired by the enqueuing request, or acquire it ourselves. None if not ours."""
+    lock = ProcessingLock(redis_client, id)
+    # If the lock of the enqueuing request expired while the task was queued, nobody else was
+    # asked to do the work: acquire it again rather than dropping the task
+    if not lock.take_over(lock_token):
+        logger.info(f"File {id} is already being processed by another worker.")
+        return None
+    lock.start_heartbeat()
+    return lock
+
+def release_processing_lock(lock: ProcessingLock, logger):
+    # Release the lock only if we still own it
+    if lock.release():
+        logger.info(f"Released processing lock: {lock.key}")
+    else:
+        logger.info(f"Processing lock {lock.key} was no longer held by this task.")
+
+@celery.task
+def process_file_task(id: int, lock_token: str = None):
+    file_service, logger = get_task_services()
+    
+    lock = take_processing_lock(id, lock_token, logger)
+    if lock is None:
+        return {"status": "processing", "file_id": id}
     
-    logger.info(f"Processing file with ID: {id}")
     try:
+        # A request may have enqueued this task while an earlier one was finishing the same file
+        exists = file_service.rag_service.file_exists(id)
+        if exists:
+            logger.info(f"File with ID {id} was already processed, skipping.")
+            return {"status": "success", "file_id": id}
+        if exists is None:
+            logger.error(f"Could not check whether file with ID {id} is processed, skipping.")
+            return {"status": "error", "message": "Could not check whether the file is processed."}
+        
+        logger.info(f"Processing file with ID: {id}")
         # Call the file service to process the file
-        result = file_service.prepare_data_for_rag(id)
+        # Every write first checks the lock is still ours, a task that lost it stops before overwriting the new holder's work
+        result = file_service.prepare_data_for_rag(id, before_write=lock.ensure_held)
         
         if result:
             logger.info(f"File with ID {id} processed successfully.")
@@ -60,11 +131,28 @@ def process_file_task(id: int):
         logger.error(f"Error processing file with ID {id}: {e}")
         return {"status": "error", "message": str(e)}
     finally:
-        # Clean up Redis key after processing
-        redis_key = f"processing:{id}"
-        if redis_client.exists(redis_key):
-            redis_client.delete(redis_key)
-            logger.info(f"Removed Redis key: {redis_key}")
-        else:
-            logger.info(f"Redis key {redis_key} does not exist.")
+        release_processing_lock(lock, logger)
+
+@celery.task
+def reingest_file_task(id: int, lock_token: str = None):
+    file_service, logger = get_task_services()
+    
+    lock = take_processing_lock(id, lock_token, logger)
+    if lock is None:
+        return {"status": "processing", "file_id": id}
     
+    logger.info(f"Re-ingesting file with ID: {id}")
+    try:
+        report = file_service.reingest(id, before_write=lock.ensure_held)
+        
+        if report is not None:
+            logger.info(f"File with ID {id} re-ingested successfully.")
+            return {"status": "success", "file_id": id, "report": report}
+        else:
+            logger.error(f"Failed to re-ingest file with ID {id}.")
+            return {"status": "error", "message": "File re-ingest failed."}
+    except Exception as e:
+        logger.error(f"Error re-ingesting file with ID {id}: {e}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        release_processing_lock(lock, logger)
@@ -1,6 +1,10 @@
-from app.dtos.chat_dtos import AskRequestDTO, AskResponseDTO, AnswerDTO
+from app.dtos.chat_dtos import AskRequestDTO, AskDocumentsRequestDTO, AskBatchRequestDTO, AskResponseDTO, AnswerDTO, DocumentsAnswerDTO, BatchAnswerDTO
+from functools import wraps
 from flask import Blueprint, request, jsonify, current_app
+from app.helpers.admission import Deadline, DeadlineExceeded, Overloaded, current_deadline
+from app.helpers.circuit_breaker import CircuitOpen
 from app.redis.redis import redis_client
+from app.redis.lock import ProcessingLock
 from app.services.RAGService import RAGService
 from app.services.SQLService import SQLService
 from app.celery.tasks import process_file_task
@@ -8,7 +12,125 @@ from app.celery.tasks import process_file_task
 
 chat_blueprint = Blueprint('chat_blueprint', __name__)
 
+def processing_response():
+    answer_dto = AnswerDTO(
+        answer="File is being processed, please try again later in a few minutes.",
+        location=["file_location_placeholder"]  
+    )
+    
+    response_dto = AskResponseDTO(
+        status="processing",
+        message="File is being processed, please try again later.",
+        data=[answer_dto]
+    )
+    
+    return jsonify(response_dto.__dict__), 200
+
+def busy_response(reason: str, retry_after: int = 1):
+    answer_dto = AnswerDTO(
+        answer="The service is busy, please try again in a few seconds.",
+        location=["file_location_placeholder"]  
+    )
+    
+    response_dto = AskResponseDTO(
+        status="busy",
+        message=f"Request not answered in time ({reason}), please try again later.",
+        data=[answer_dto]
+    )
+    
+    response = jsonify(response_dto.__dict__)
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 503
+
+def request_deadline() -> Deadline:
+    """Deadline of this request: the client's X-Timeout-Ms header, capped by the configured default."""
+    default_ms = current_app.sql_service.settings.ask_deadline_ms
+    try:
+        timeout_ms = min(int(request.headers.get("X-Timeout-Ms", default_ms)), default_ms)
+    except ValueError:
+        timeout_ms = default_ms
+    return Deadline(max(timeout_ms, 0) / 1000)
+
+def current_deadline_expired() -> bool:
+    """True when an error was most likely caused by the deadline cancelling a query or a model call."""
+    deadline = current_deadline()
+    return deadline is not None and deadline.expired()
+
+def admission_controlled(view):
+    """Run an ask view under a deadline and a concurrency slot.
+
+    Answers 503 "busy" when it is shed, runs out of time or needs a provider whose circuit is open.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        logger = current_app.logger
+        admission = current_app.admission
+        deadline = request_deadline()
+        try:
+            with admission.admit(deadline), deadline.scope():
+                return view(*args, **kwargs)
+        except Overloaded as e:
+            logger.warning(f"Shedding {request.path}: {e.reason}, {admission.stats()['queue_depth']} waiting.")
+            return busy_response(e.reason)
+        except DeadlineExceeded as e:
+            admission.record_expired(e.stage)
+            logger.warning(f"Deadline of {deadline.seconds:.1f}s exceeded for {request.path} before {e.stage}.")
+            return busy_response("deadline")
+        except CircuitOpen as e:
+            logger.warning(f"Failing fast on {request.path}: {e}")
+            return busy_response(f"{e.name} provider unavailable", max(int(e.retry_in + 0.5), 1))
+    return wrapper
+
+def file_not_ready_response(file_id: int):
+    """Response for a file that is still being processed or not ingested yet (enqueuing it), None when it can be asked."""
+    logger = current_app.logger
+    rag_service: RAGService = current_app.rag_service
+    
+    # Check if the file is already being processed
+    lock = ProcessingLock(redis_client, file_id)
+    
+    if lock.is_locked():
+        logger.info(f"File {file_id} is already being processed.")
+        return processing_response()
+    
+    # Check if the file exists in the database
+    file_exists = rag_service.file_exists(file_id)
+    if file_exists:
+        return None
+    if file_exists is None:
+        # Unknown is not "missing": enqueueing here would ingest an already ingested file again
+        logger.error(f"Could not check whether file {file_id} is ingested, not enqueueing it.")
+        return busy_response("database")
+    
+    # Only the request that wins the lock enqueues the task
+    lock_token = lock.acquire()
+    if lock_token is None:
+        logger.info(f"File {file_id} is already being processed.")
+        return processing_response()
+    
+    logger.error(f"File with ID {file_id} does not exist. Processing the file now, please try again later in a few minutes.")
+    try:
+        task = process_file_task.apply_async(args=[file_id, lock_token])
+    except Exception:
+        lock.release()
+        raise
+    
+    answer_dto = AnswerDTO(
+        answer="File does not exist, please try again later in a few minutes.",
+        location=["file_location_placeholder"]  
+    )
+    
+    response_dto = AskResponseDTO(
+        status="error",
+        message="File does not exist, please try again later.",
+        task_id=task.id,
+        data=[answer_dto]
+    )
+    
+    return jsonify(response_dto.__dict__), 200
+
 @chat_blueprint.route('/ask', methods=['POST'])
+@admission_controlled
 def ask():
     logger = current_app.logger
     rag_service: RAGService = current_app.rag_service
@@ -17,56 +139,18 @@ def ask():
         request_dto = AskRequestDTO(**data)
         logger.info(f"Received ask request: {request_dto}")
         
-        #Check for being processed file
-        # Check if the file is already being processed
-        redis_key = f"processing:{request_dto.fileID}"
-        
-        if redis_client.get(redis_key):
-            logger.info(f"File {request_dto.fileID} is already being processed.")
-            
-            answer_dto = AnswerDTO(
-                answer="File is being processed, please try again later in a few minutes.",
-                location=["file_location_placeholder"]  
-            )
-            
-            response_dto = AskResponseDTO(
-                status="processing",
-                message="File is being processed, please try again later.",
-                data=[answer_dto]
-            )
-            
-            return jsonify(response_dto.__dict__), 200
-        
-        # Check if the file exists in the database
-        file_exists = rag_service.file_exists(request_dto.fileID)
-        if not file_exists:
-            logger.error(f"File with ID {request_dto.fileID} does not exist. Processing the file now, please try again later in a few minutes.")
-            
-            redis_client.set(redis_key, 'processing', ex=600)  # Set a 10m expiration for the processing key
-            task = process_file_task.apply_async(args=[request_dto.fileID])
-            
-            answer_dto = AnswerDTO(
-                answer="File does not exist, please try again later in a few minutes.",
-                location=["file_location_placeholder"]  
-            )
-            
-            response_dto = AskResponseDTO(
-                status="error",
-                message="File does not exist, please try again later.",
-                task_id=task.id,
-                data=[answer_dto]
-            )
-            
-            return jsonify(response_dto.__dict__), 200        
+        not_ready = file_not_ready_response(request_dto.fileID)
+        if not_ready is not None:
+            return not_ready
 
-        answer = rag_service.run_chain(
+        answer, locations = rag_service.run_chain_with_sources(
             file_id=request_dto.fileID,
             question=request_dto.question
         )
         
         answer_dto = AnswerDTO(
             answer=answer,
-            location=["file_location_placeholder"]  
+            location=locations or ["file_location_placeholder"]  
         )
         
         logger.info(f"Answer generated: {answer_dto}")
@@ -78,6 +162,115 @@ def ask():
         )
         
         return jsonify(response_dto.__dict__), 200
+    except (DeadlineExceeded, CircuitOpen):
+        raise
     except Exception as e:
+        if current_deadline_expired():
+            raise DeadlineExceeded("response")
         logger.error(f"Error processing ask request: {e}")
+        return jsonify({"error": "Invalid request format"}), 400
+
+@chat_blueprint.route('/ask/batch', methods=['POST'])
+@admission_controlled
+def ask_batch():
+    """Answer several questions about one file, sharing the embedding call, chunk hydration and model concurrency."""
+    logger = current_app.logger
+    rag_service: RAGService = current_app.rag_service
+    try:
+        data = request.get_json()
+        request_dto = AskBatchRequestDTO(**data)
+        logger.info(f"Received batch ask request: {request_dto}")
+        
+        max_questions = rag_service.sql_service.settings.batch_max_questions
+        if not request_dto.questions or not all(isinstance(question, str) and question.strip() for question in request_dto.questions):
+            return jsonify({"error": "questions must be a non-empty list of questions"}), 400
+        if len(request_dto.questions) > max_questions:
+            return jsonify({"error": f"At most {max_questions} questions per batch"}), 400
+        
+        not_ready = file_not_ready_response(request_dto.fileID)
+        if not_ready is not None:
+            return not_ready
+        
+        batch = rag_service.run_batch(
+            file_id=request_dto.fileID,
+            questions=request_dto.questions
+        )
+        
+        answer_dtos = [
+            BatchAnswerDTO(
+                question=result["question"],
+                answer=result["answer"],
+                location=result["location"] or ["file_location_placeholder"],
+                path=result["path"],
+                timings=result["timings"]
+            )
+            for result in batch["results"]
+        ]
+        
+        logger.info(f"Batch of {len(answer_dtos)} answers generated, timings: {batch['timings']}")
+        
+        response_dto = AskResponseDTO(
+            status="success",
+            message="Batch ask request received successfully",
+            data=answer_dtos
+        )
+        
+        return jsonify({**response_dto.__dict__, "timings": batch["timings"]}), 200
+    except (DeadlineExceeded, CircuitOpen):
+        raise
+    except Exception as e:
+        if current_deadline_expired():
+            raise DeadlineExceeded("response")
+        logger.error(f"Error processing batch ask request: {e}")
+        return jsonify({"error": "Invalid request format"}), 400
+
+@chat_blueprint.route('/ask/stats', methods=['GET'])
+def ask_stats():
+    """How questions were answered since the process started: hit rate and latency per path, load shedding and circuit states."""
+    rag_service: RAGService = current_app.rag_service
+    return jsonify({
+        **rag_service.path_stats.stats(),
+        "admission": current_app.admission.stats(),
+        "providers": rag_service.provider_stats(),
+    }), 200
+
+@chat_blueprint.route('/ask/documents', methods=['POST'])
+@admission_controlled
+def ask_documents():
+    """Answer one question from several documents: every document of chatID, or an explicit fileIDs list."""
+    logger = current_app.logger
+    rag_service: RAGService = current_app.rag_service
+    try:
+        data = request.get_json()
+        request_dto = AskDocumentsRequestDTO(**data)
+        logger.info(f"Received multi-document ask request: {request_dto}")
+        
+        if request_dto.chatID is None and not request_dto.fileIDs:
+            return jsonify({"error": "Either chatID or fileIDs is required"}), 400
+        
+        answer, locations = rag_service.run_chain_for_documents(
+            question=request_dto.question,
+            file_ids=request_dto.fileIDs,
+            chat_id=request_dto.chatID
+        )
+        
+        # Locations per file ID, each usable with that file's page image endpoint
+        answer_dto = DocumentsAnswerDTO(
+            answer=answer,
+            location=locations
+        )
+        
+        response_dto = AskResponseDTO(
+            status="success",
+            message="Ask request received successfully",
+            data=[answer_dto]
+        )
+        
+        return jsonify(response_dto.__dict__), 200
+    except (DeadlineExceeded, CircuitOpen):
+        raise
+    except Exception as e:
+        if current_deadline_expired():
+            raise DeadlineExceeded("response")
+        logger.error(f"Error processing multi-document ask request: {e}")
         return jsonify({"error": "Invalid request format"}), 400
\ No newline at end of file
@@ -1,7 +1,10 @@
-from flask import Blueprint, jsonify, current_app
-from app.celery.tasks import process_file_task
+import io
+from flask import Blueprint, jsonify, current_app, request, send_file
+from app.celery.tasks import process_file_task, reingest_file_task
 from app.services.SQLService import SQLService
 from app.redis.redis import redis_client
+from app.redis.lock import ProcessingLock
+from app.helpers.locations import parse_location
 
 file_blueprint = Blueprint('file_blueprint', __name__)
 
@@ -29,9 +32,9 @@ def process(id: int):
     sql_service: SQLService = current_app.sql_service
     
     # Check if the file is already being processed
-    redis_key = f"processing:{id}"
+    lock = ProcessingLock(redis_client, id)
     
-    if redis_client.get(redis_key):
+    if lock.is_locked():
         logger.info(f"File {id} is already being processed.")
         return jsonify({"message": f"File {id} is already being processed"}), 202
     
@@ -43,9 +46,17 @@ def process(id: int):
     
     try:
         logger.info(f"Received process request for file ID: {id}")
-        redis_client.set(redis_key, 'processing', ex=600)  # Set a 10m expiration for the processing key
+        # Only the request that wins the lock enqueues the task
+        lock_token = lock.acquire()
+        if lock_token is None:
+            logger.info(f"File {id} is already being processed.")
+            return jsonify({"message": f"File {id} is already being processed"}), 202
         
-        task = process_file_task.apply_async(args=[id])
+        try:
+            task = process_file_task.apply_async(args=[id, lock_token])
+        except Exception:
+            lock.release()
+            raise
         
         return jsonify({
             "message": f"File processing started for file ID {id}",
@@ -56,6 +67,61 @@ def process(id: int):
         logger.error(f"Error processing file with ID {id}: {e}")
         return jsonify({"error": "File processing failed"}), 500
 
+@file_blueprint.route('/reingest/<int:id>', methods=['GET'])
+def reingest(id: int):
+    logger = current_app.logger
+    
+    # Only the request that wins the lock enqueues the task
+    lock = ProcessingLock(redis_client, id)
+    lock_token = lock.acquire()
+    if lock_token is None:
+        logger.info(f"File {id} is already being processed.")
+        return jsonify({"message": f"File {id} is already being processed"}), 202
+    
+    try:
+        logger.info(f"Received re-ingest request for file ID: {id}")
+        task = reingest_file_task.apply_async(args=[id, lock_token])
+        
+        return jsonify({
+            "message": f"File re-ingest started for file ID {id}",
+            "task_id": task.id
+        }), 202
+    except Exception as e:
+        lock.release()
+        logger.error(f"Error re-ingesting file with ID {id}: {e}")
+        return jsonify({"error": "File re-ingest failed"}), 500
+
+@file_blueprint.route('/<int:id>/pages/<int:page>/image', methods=['GET'])
+def page_image(id: int, page: int):
+    """Rendered page with highlight boxes.
+
+    Boxes come as box=x0,y0,x1,y1 (fractions of the page) or as answer
+    locations, location=page 2: x0,y0,x1,y1; both may be repeated.
+    """
+    logger = current_app.logger
+    try:
+        boxes = [tuple(float(value) for value in box.split(",")) for box in request.args.getlist("box")]
+        for location in request.args.getlist("location"):
+            location_page, box = parse_location(location)
+            if location_page == page and box:
+                boxes.append(box)
+        if any(len(box) != 4 for box in boxes):
+            raise ValueError("A box needs four values")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid box: {e}"}), 400
+    
+    try:
+        png = current_app.file_service.render_page_image(id, page, boxes)
+    except (FileNotFoundError, IndexError) as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error rendering page {page} of file ID {id}: {e}")
+        return jsonify({"error": "Page rendering failed"}), 500
+    
+    response = send_file(io.BytesIO(png), mimetype="image/png")
+    response.headers["Cache-Control"] = "private, max-age=300"
+    return response
+
 @file_blueprint.route('/process/status/<task_id>', methods=['GET'])
 def check_for_processing_status(task_id: str):
     logger = current_app.logger
@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from app.helpers import metrics
+
+metrics_blueprint = Blueprint('metrics_blueprint', __name__)
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def scrape():
+    """Prometheus exposition of this process, or of every process sharing PROMETHEUS_MULTIPROC_DIR."""
+    if not metrics.enabled():
+        return Response("Metrics are disabled, set METRICS=true\n", status=404, mimetype="text/plain")
+    payload, content_type = metrics.render()
+    return Response(payload, content_type=content_type)
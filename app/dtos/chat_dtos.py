@@ -5,11 +5,35 @@ class AskRequestDTO:
     fileID: int
     question: str
 
+@dataclass
+class AskDocumentsRequestDTO:
+    question: str
+    chatID: int = None
+    fileIDs: list[int] = None
+
+@dataclass
+class AskBatchRequestDTO:
+    fileID: int
+    questions: list[str]
+
 @dataclass
 class AnswerDTO:
     answer: str
     location: list[str]
 
+@dataclass
+class DocumentsAnswerDTO:
+    answer: str
+    location: dict[str, list[str]]
+
+@dataclass
+class BatchAnswerDTO:
+    question: str
+    answer: str
+    location: list[str]
+    path: str
+    timings: dict
+
 @dataclass
 class AskResponseDTO:
     status: str
@@ -1,8 +1,4 @@
 from celery import Celery
-from app.services.SQLService import SQLService
-from app.services.RAGService import RAGService
-from app.services.FileService import FileService
-from app.helpers.logger import Logger
 
 # Global instances
 celery = Celery(
@@ -18,10 +14,12 @@ file_service = None
 
 def init_services():
     global logger, sql_service, rag_service, file_service
-    logger = Logger().get_logger()
-    sql_service = SQLService(logger)
-    rag_service = RAGService(logger, sql_service)
-    file_service = FileService(logger, sql_service, rag_service)
+    # Services are built by the lazy registry, model clients and layout models load on first use
+    from app.service_instances import registry
+    logger = registry.logger
+    sql_service = registry.sql_service
+    rag_service = registry.rag_service
+    file_service = registry.file_service
 
     return {
         'logger': logger,
@@ -37,10 +35,95 @@ def init_extensions(app):
     app.sql_service = services['sql_service']
     app.rag_service = services['rag_service']
     app.file_service = services['file_service']
+    from app.service_instances import registry
+    app.admission = registry.admission
+    registry.tracer
+    init_tracing(app)
+    if registry.metrics:
+        init_metrics(app)
     
     # Initialize Celery
     init_celery(app)
 
+def init_tracing(app):
+    """One span per request, joined to the caller's trace when it sends a traceparent header."""
+    from contextlib import ExitStack
+    from flask import g, request
+    from app.helpers.tracing import continue_trace, enabled, span
+    if not enabled():
+        return
+
+    @app.before_request
+    def start_request_span():
+        g.trace_stack = ExitStack()
+        g.trace_stack.enter_context(continue_trace({key.lower(): value for key, value in request.headers.items()}))
+        g.request_span = g.trace_stack.enter_context(span(
+            f"http {request.method} {request.url_rule.rule if request.url_rule else request.path}",
+            method=request.method,
+            path=request.path,
+            request_bytes=request.content_length or 0,
+        ))
+
+    @app.after_request
+    def record_response(response):
+        request_span = g.get("request_span")
+        if request_span is not None:
+            request_span.set_attributes({"status_code": response.status_code, "response_bytes": response.calculate_content_length() or 0})
+        return response
+
+    @app.teardown_request
+    def end_request_span(error=None):
+        stack = g.pop("trace_stack", None)
+        if stack is not None:
+            stack.close()
+
+def init_metrics(app):
+    """Request latency and database statements per request, /ask latency by outcome, component stats read at scrape time."""
+    import time
+    from contextlib import ExitStack
+    from flask import g, request
+    from app.helpers import metrics
+    from app.helpers.logger import stats as log_stats
+    from app.redis.redis import redis_client
+    from app.service_instances import registry
+
+    rag_service = registry.rag_service
+    metrics.register_stats("ask_paths", rag_service.path_stats.stats)
+    metrics.register_stats("admission", app.admission.stats)
+    metrics.register_stats("providers", rag_service.provider_stats)
+    metrics.register_stats("vector_cache", lambda: rag_service.vector_cache.stats() if rag_service.vector_cache is not None else {})
+    metrics.register_stats("page_renders", lambda: registry.file_service.page_renders.stats())
+    metrics.register_stats("logging", log_stats)
+    # Tasks waiting in the default Celery queue, a Redis list named after it
+    metrics.register_stats("celery_queue", lambda: {"depth": redis_client.llen("celery")})
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_stack = ExitStack()
+        g.db_queries = g.metrics_stack.enter_context(metrics.count_queries())
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get("metrics_start")
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe_request(endpoint, request.method, response.status_code, seconds, g.db_queries[0])
+        if request.method == "POST" and "/ask" in endpoint:
+            # The ask endpoints answer 200 with a status of processing, error or success, 503 with busy
+            payload = response.get_json(silent=True) if response.is_json else None
+            outcome = payload.get("status") if isinstance(payload, dict) and "status" in payload else "error"
+            metrics.observe_ask(endpoint, outcome, seconds)
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(error=None):
+        stack = g.pop("metrics_stack", None)
+        if stack is not None:
+            stack.close()
+
 def init_celery(app):
     celery.conf.update(
         task_serializer='json',
@@ -0,0 +1,140 @@
+import contextvars
+import functools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before a stage could start, its answer would arrive after the client gave up."""
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded before {stage}")
+        self.stage = stage
+
+class Overloaded(Exception):
+    """The request was shed at admission: the wait queue is full or no slot freed up in time."""
+    def __init__(self, reason: str):
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+class Deadline:
+    """Absolute point in time by which a request has to be answered, on the monotonic clock."""
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str):
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+    @contextmanager
+    def scope(self):
+        """Make this the deadline of the current context, read by check_deadline and the services."""
+        token = _current_deadline.set(self)
+        try:
+            yield self
+        finally:
+            _current_deadline.reset(token)
+
+def current_deadline() -> Deadline:
+    return _current_deadline.get()
+
+def check_deadline(stage: str):
+    """Raise DeadlineExceeded if the current request has no time left, a no-op outside a request."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+def bind_context(fn):
+    """Wrap fn so it runs in a copy of the caller's context (deadline, current span), for work handed to a thread pool."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, each call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+class AdmissionController:
+    """Caps the requests being answered at once, with a bounded queue of waiting ones.
+
+    A request waits at most max_wait seconds (less if its deadline is closer)
+    for a slot. It is shed straight away when max_queue requests are already
+    waiting, and after waiting when no slot freed up or when less than
+    min_remaining seconds of its deadline would be left to do the work.
+    """
+    def __init__(self, max_concurrent: int, max_queue: int, max_wait: float, min_remaining: float = 0.0):
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.min_remaining = min_remaining
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.admitted = 0
+        self.shed = Counter()
+        self.expired = Counter()  # stage -> admitted requests that ran out of time before it
+        self._wait_seconds = 0.0
+
+    def _shed(self, reason: str):
+        self.shed[reason] += 1
+        raise Overloaded(reason)
+
+    @contextmanager
+    def admit(self, deadline: Deadline = None):
+        start = time.monotonic()
+        with self._condition:
+            if self.in_flight >= self.max_concurrent or self.waiting:
+                if self.waiting >= self.max_queue:
+                    self._shed("queue_full")
+                self.waiting += 1
+                self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+                try:
+                    wait = self.max_wait if deadline is None else min(self.max_wait, deadline.remaining() - self.min_remaining)
+                    wait_until = start + max(wait, 0.0)
+                    while self.in_flight >= self.max_concurrent:
+                        timeout = wait_until - time.monotonic()
+                        if timeout <= 0:
+                            self._shed("wait_timeout")
+                        self._condition.wait(timeout)
+                finally:
+                    self.waiting -= 1
+            if deadline is not None and deadline.remaining() < self.min_remaining:
+                self._shed("deadline")
+            self.in_flight += 1
+            self.admitted += 1
+            self._wait_seconds += time.monotonic() - start
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify()
+
+    def record_expired(self, stage: str):
+        with self._condition:
+            self.expired[stage] += 1
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "max_queue_depth_seen": self.max_waiting_seen,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "shed_total": sum(self.shed.values()),
+                "expired": dict(self.expired),
+                "mean_wait_ms": round(self._wait_seconds / self.admitted * 1000, 3) if self.admitted else None,
+            }
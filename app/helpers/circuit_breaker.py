@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import Counter, deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpen(Exception):
+    """The provider is failing or too slow, the call was refused without being made."""
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit {name} is open, retrying the provider in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Stops calling a provider (chat model, embeddings) once it fails or slows down, and probes it until it recovers.
+
+    The outcome of the last window calls is kept. Once there are at least
+    min_calls of them and the share of errors reaches error_rate, or the
+    share of calls slower than slow_call_seconds reaches slow_rate, the
+    circuit opens: calls raise CircuitOpen at once for open_seconds. Then it
+    is half open: up to probes calls go through, and closes the circuit if
+    they all succeed in time, while any failure opens it again.
+    """
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_call_seconds: float = 15.0, slow_rate: float = 0.8, open_seconds: float = 30.0, probes: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probes = max(probes, 1)
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque(maxlen=window)  # (failed, slow)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.calls = Counter()  # succeeded / failed / rejected
+        self.transitions = Counter()
+
+    def _transition(self, state: str):
+        self.state = state
+        self.transitions[state] += 1
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def _before_call(self) -> bool:
+        """Reserve the call, True when it is a half-open probe. Raise CircuitOpen when it is refused."""
+        with self._lock:
+            if self.state == OPEN:
+                retry_in = self._opened_at + self.open_seconds - time.monotonic()
+                if retry_in > 0:
+                    self.calls["rejected"] += 1
+                    raise CircuitOpen(self.name, retry_in)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    self.calls["rejected"] += 1
+                    raise CircuitOpen(self.name, 0.0)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def _after_call(self, probe: bool, failed: bool, seconds: float):
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            self.calls["failed" if failed else "succeeded"] += 1
+            if probe and self.state == HALF_OPEN:
+                self._probes_in_flight -= 1
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self._transition(CLOSED)
+                return
+            if self.state != CLOSED:
+                return
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+            if failures / len(self._outcomes) >= self.error_rate or slow_calls / len(self._outcomes) >= self.slow_rate:
+                self._transition(OPEN)
+
+    def call(self, fn, *args, **kwargs):
+        probe = self._before_call()
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._after_call(probe, True, time.monotonic() - start)
+            raise
+        self._after_call(probe, False, time.monotonic() - start)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                "state": self.state,
+                "window_calls": len(outcomes),
+                "window_error_rate": round(sum(1 for failed, _ in outcomes if failed) / len(outcomes), 4) if outcomes else 0.0,
+                "window_slow_rate": round(sum(1 for _, slow in outcomes if slow) / len(outcomes), 4) if outcomes else 0.0,
+                "calls": dict(self.calls),
+                "transitions": dict(self.transitions),
+            }
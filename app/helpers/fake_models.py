@@ -0,0 +1,91 @@
+"""Deterministic local stand-ins for the chat model and the embeddings, with injectable latency and failures.
+
+Used with FAKE_MODELS=true to run the service offline, and to exercise the
+circuit breakers: the Faults object shared by a model can be changed at run
+time to take the "provider" down, slow it down and bring it back.
+"""
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable
+
+class ProviderError(Exception):
+    """Injected provider failure, standing in for a 5xx or a connection error."""
+
+@dataclass
+class Faults:
+    latency: float = 0.0  # seconds per call
+    jitter: float = 0.0  # extra uniform random seconds per call
+    error_rate: float = 0.0  # share of calls that raise ProviderError
+    down: bool = False  # every call fails
+    seed: int = 0
+    calls: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _rng: random.Random = field(default=None, repr=False)
+
+    def apply(self):
+        with self._lock:
+            if self._rng is None:
+                self._rng = random.Random(self.seed)
+            self.calls += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.down or (self.error_rate > 0 and self._rng.random() < self.error_rate)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ProviderError("Injected provider failure")
+
+def _message_text(message) -> str:
+    content = message.content if isinstance(message, BaseMessage) else message
+    if isinstance(content, str):
+        return content
+    # Multimodal content: keep the text parts, images have nothing to echo
+    return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+class FakeChatModel(Runnable):
+    """Answers with the start of the last prompt message, after the injected latency and failures."""
+    def __init__(self, faults: Faults = None, answer_chars: int = 200):
+        self.faults = faults or Faults()
+        self.answer_chars = answer_chars
+
+    def invoke(self, input, config: dict = None, **kwargs) -> AIMessage:
+        self.faults.apply()
+        if isinstance(input, PromptValue):
+            messages = input.to_messages()
+        elif isinstance(input, (list, tuple)):
+            messages = list(input)
+        else:
+            messages = [input]
+        text = " ".join(_message_text(messages[-1]).split()) if messages else ""
+        return AIMessage(content=f"Fake answer: {text[:self.answer_chars]}")
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: texts sharing words are close, the same text always gets the same vector."""
+    def __init__(self, dimensions: int = 3072, faults: Faults = None):
+        self.dimensions = dimensions
+        self.faults = faults or Faults()
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # One provider call per batch, like the OpenAI client
+        self.faults.apply()
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.faults.apply()
+        return self._embed(text)
@@ -0,0 +1,172 @@
+import re
+from dataclasses import dataclass, asdict
+
+AMOUNT = r"(?:[A-Z]{3}\s*)?[$€£¥]?\s*-?\d[\d,]*(?:\.\d{1,2})?"
+DATE = (r"(?:\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}"
+        r"|[A-Z][a-z]{2,8}\.? \d{1,2}(?:st|nd|rd|th)?,? \d{4}|\d{1,2}(?:st|nd|rd|th)? [A-Z][a-z]{2,8}\.?,? \d{4})")
+IDENTIFIER = r"(?i:[A-Z0-9][A-Z0-9\-/_.]{2,})"
+NAME = r"[A-Z][^\n:]{1,78}?(?=\s{2,}|\n|$| (?:Invoice|Date|Address|Tel|Phone|Email)\b)"
+
+# field -> [(label pattern, value pattern, confidence)], most specific label first
+FIELD_PATTERNS = {
+    "invoice_number": [
+        (r"invoice\s*(?:no\b\.?|number\b|num\b|#|id\b)\s*[:#.]?", IDENTIFIER, 1.0),
+        (r"(?:reference|ref\b\.?)\s*(?:no\b\.?|number\b|#)?\s*[:#]", IDENTIFIER, 0.6),
+    ],
+    "invoice_date": [
+        (r"(?:invoice\s+date|date\s+of\s+issue|issue\s+date|issued\s+on)\s*[:.]?", DATE, 1.0),
+        (r"(?<![a-z] )date\s*[:.]", DATE, 0.6),
+    ],
+    "due_date": [
+        (r"(?:due\s+date|payment\s+due(?:\s+date)?|due\s+by|due\s+on|pay\s+by)\s*[:.]?", DATE, 1.0),
+    ],
+    "subtotal": [
+        (r"sub\s*-?\s*total\s*[:.]?", AMOUNT, 1.0),
+    ],
+    "tax": [
+        (r"(?:sales\s+tax|tax|vat|gst)(?:\s*\(?\s*\d+(?:\.\d+)?\s*%\s*\)?)?\s*[:.]?", AMOUNT, 1.0),
+    ],
+    "total": [
+        (r"(?:grand\s+total|total\s+(?:amount\s+)?due|amount\s+due|balance\s+due|total\s+amount)\s*[:.]?", AMOUNT, 1.0),
+        (r"(?<![a-z])(?<!sub )(?<!sub-)total\s*[:.]?", AMOUNT, 0.7),
+    ],
+    "vendor": [
+        (r"(?:vendor|supplier|seller|sold\s+by|bill\s+from|issued\s+by|from)\s*:", NAME, 0.8),
+    ],
+}
+
+# Intents match the whole question, so "the total number of pages" or "the tax ID of the vendor" are not
+# mistaken for the total or the tax: anything beyond the field's value goes to the full chain.
+_ASK = r"(?:(?:what|which|who) (?:is|was|are|were) |what's |whats |who's |tell me |give me |show me |find )?"
+_THE = r"(?:the |this |its |our |my )?"
+_OF_DOC = r"(?: (?:on|of|in|for|from) (?:the |this |that |my |our )?(?:invoice|bill|receipt|document))?"
+_DOC = r"(?:the |this )?(?:invoice|bill|receipt)"
+
+def _intent(*questions: str) -> re.Pattern:
+    return re.compile("|".join(f"^(?:{question})$" for question in questions))
+
+INTENTS = [
+    ("invoice_number", _intent(
+        _ASK + _THE + r"(?:invoice|bill|reference|ref) (?:no|number|num|#|id)" + _OF_DOC,
+    )),
+    ("invoice_date", _intent(
+        _ASK + _THE + r"(?:invoice date|date of (?:the )?(?:invoice|issue)|issue date|issuing date)" + _OF_DOC,
+        r"when (?:was|is) " + _DOC + r" (?:issued|dated|sent)",
+    )),
+    ("due_date", _intent(
+        _ASK + _THE + r"(?:due date|payment due date|payment deadline)" + _OF_DOC,
+        r"when is " + _DOC + r" due",
+        r"when is (?:the )?payment due" + _OF_DOC,
+        r"when (?:do|should|must) (?:i|we) pay(?: " + _DOC + r")?",
+    )),
+    ("subtotal", _intent(
+        _ASK + _THE + r"sub ?-?total(?: amount)?" + _OF_DOC,
+    )),
+    ("tax", _intent(
+        _ASK + _THE + r"(?:total )?(?:tax|vat|gst|sales tax)(?: amount| total)?" + _OF_DOC,
+        r"how much (?:tax|vat|gst|sales tax) (?:is|was) (?:charged|applied|due|there)" + _OF_DOC,
+    )),
+    ("total", _intent(
+        _ASK + _THE + r"(?:invoice total|total|grand total|total amount|total amount due|total due|amount due|balance due)" + _OF_DOC,
+        r"how much (?:do|did|should|must) (?:i|we) (?:owe|pay)" + _OF_DOC,
+        r"how much is " + _DOC,
+    )),
+    ("vendor", _intent(
+        _ASK + _THE + r"(?:vendor|supplier|seller)(?: name)?" + _OF_DOC,
+        r"who (?:issued|sent) " + _DOC,
+        r"who is " + _DOC + r" from",
+    )),
+]
+# Several questions in one ("the total and the payment schedule") need the full chain
+COMPOUND_QUESTION = re.compile(r"\b(?:and|or|including|plus|as well as|also|with)\b|[,;&]")
+
+# The fields are only answered for documents that look like invoices
+INVOICE_MARKERS = re.compile(r"\b(?:invoice|bill to|amount due|balance due)\b", re.IGNORECASE)
+INVOICE_FIELDS = {"invoice_number", "invoice_date", "due_date", "total"}
+# Weaker label matches ("Date:", "Ref:") are kept, but not answered without retrieval
+MIN_ANSWER_CONFIDENCE = 0.7
+
+ANSWER_TEMPLATES = {
+    "invoice_number": "The invoice number is {value}.",
+    "invoice_date": "The invoice date is {value}.",
+    "due_date": "The invoice is due on {value}.",
+    "subtotal": "The subtotal is {value}.",
+    "tax": "The tax amount is {value}.",
+    "total": "The invoice total is {value}.",
+    "vendor": "The invoice is from {value}.",
+}
+
+@dataclass
+class ExtractedField:
+    field: str
+    value: str
+    raw_text: str
+    page_number: int
+    coordinates: dict
+    confidence: float
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def _compiled():
+    return {
+        # Labels match in any case, values keep their own case rules (names and months start upper case)
+        field: [(re.compile(r"(?i:" + label + r")\s*(" + value + r")"), confidence)
+                for label, value, confidence in patterns]
+        for field, patterns in FIELD_PATTERNS.items()
+    }
+
+_PATTERNS = None
+
+def extract_fields(elements: list) -> dict[str, ExtractedField]:
+    """Pull the common invoice fields out of partitioned elements, with the page and box of the element they come from.
+
+    A label and its value may be split over two consecutive elements
+    ("Total" | "$120.00"), so each element is matched together with the
+    next one. The most confident match wins; among equally confident totals
+    the last one (the bottom line) wins, for other fields the first.
+    """
+    global _PATTERNS
+    if _PATTERNS is None:
+        _PATTERNS = _compiled()
+
+    texts = [(el.text or "").strip() for el in elements]
+    found: dict[str, ExtractedField] = {}
+    for index, el in enumerate(elements):
+        text = texts[index]
+        if not text:
+            continue
+        window = text if index + 1 >= len(elements) else f"{text}\n{texts[index + 1]}"
+        for field, patterns in _PATTERNS.items():
+            for pattern, confidence in patterns:
+                match = pattern.search(window)
+                # The label has to be in this element, the next one is only allowed to carry the value
+                if match is None or match.start() >= len(text):
+                    continue
+                current = found.get(field)
+                if current and (current.confidence > confidence or (current.confidence == confidence and field != "total")):
+                    break
+                metadata = el.metadata.to_dict()
+                found[field] = ExtractedField(
+                    field=field,
+                    value=" ".join(match.group(1).split()).rstrip(".,;"),
+                    raw_text=" ".join(match.group(0).split()),
+                    page_number=metadata.get("page_number"),
+                    coordinates=metadata.get("coordinates", {}),
+                    confidence=confidence,
+                )
+                break
+    return found
+
+def looks_like_invoice(elements: list, fields: dict[str, ExtractedField]) -> bool:
+    """An invoice marker in the text and at least two of the core invoice fields found."""
+    if len(INVOICE_FIELDS & set(fields)) < 2:
+        return False
+    return any(INVOICE_MARKERS.search(el.text or "") for el in elements)
+
+def match_intent(question: str) -> str:
+    """The field a question asks for when it asks for nothing else, None if it needs the full chain."""
+    question = re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?!.")
+    if COMPOUND_QUESTION.search(question):
+        return None
+    return next((field for field, pattern in INTENTS if pattern.match(question)), None)
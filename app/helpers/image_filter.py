@@ -0,0 +1,101 @@
+import base64
+import hashlib
+import io
+import math
+from dataclasses import dataclass
+
+def decode_image(image_base64: str):
+    # Pillow comes with unstructured, imported here so the web process does not load it
+    from PIL import Image
+    image = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+    image.load()
+    return image
+
+def dhash(image, hash_size: int = 8) -> str:
+    """Difference hash: 64 bits, near-identical images (re-encoded, rescaled) differ in a few bits."""
+    from PIL import Image
+    pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+def hamming(hash_a: str, hash_b: str) -> int:
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+def entropy(image) -> float:
+    """Shannon entropy of the grayscale histogram in bits, 0 for a flat colour, 8 at most."""
+    histogram = image.convert("L").histogram()
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    return -sum(count / total * math.log2(count / total) for count in histogram if count)
+
+def content_hash(image) -> str:
+    """sha256 of the decoded pixels: equal only for the same image, whatever its encoding metadata.
+
+    Unlike dhash, two different charts or forms with the same layout never
+    share it, so it is safe to key summaries shared between documents on.
+    """
+    digest = hashlib.sha256(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def image_content_hash(image_base64: str) -> str:
+    return content_hash(decode_image(image_base64))
+
+@dataclass
+class ImageDecision:
+    keep: bool
+    reason: str  # 'unique', 'too_small', 'low_entropy', 'duplicate' or 'unreadable'
+    hash: str = None  # dhash, near-duplicates within the document
+    content_hash: str = None  # exact pixels, summaries shared across documents
+    duplicate_of: int = None  # index of the kept image this one duplicates
+
+class ImageFilter:
+    """Drops images not worth a vision call before summarize_images.
+
+    Icons, rules and separators (either side under min_side pixels), flat or
+    near-flat images (histogram entropy under min_entropy) and near-identical
+    repeats (dHash within max_distance bits of an image already kept) are
+    filtered out. Repeats are typically the same logo or signature on every
+    page of an invoice.
+    """
+    def __init__(self, min_side: int = 40, min_entropy: float = 1.5, max_distance: int = 4):
+        self.min_side = min_side
+        self.min_entropy = min_entropy
+        self.max_distance = max_distance
+
+    def plan(self, images_base64: list[str]) -> list[ImageDecision]:
+        decisions = []
+        kept = []  # (index, hash)
+        for index, image_base64 in enumerate(images_base64):
+            try:
+                image = decode_image(image_base64)
+            except Exception:
+                decisions.append(ImageDecision(False, "unreadable"))
+                continue
+            if min(image.size) < self.min_side:
+                decisions.append(ImageDecision(False, "too_small"))
+                continue
+            if entropy(image) < self.min_entropy:
+                decisions.append(ImageDecision(False, "low_entropy"))
+                continue
+            image_dhash = dhash(image)
+            duplicate_of = next((i for i, kept_hash in kept if hamming(image_dhash, kept_hash) <= self.max_distance), None)
+            if duplicate_of is not None:
+                decisions.append(ImageDecision(False, "duplicate", image_dhash, duplicate_of=duplicate_of))
+                continue
+            kept.append((index, image_dhash))
+            decisions.append(ImageDecision(True, "unique", image_dhash, content_hash(image)))
+        return decisions
+
+    @staticmethod
+    def stats(decisions: list[ImageDecision]) -> dict:
+        counts = {"images": len(decisions), "kept": 0, "too_small": 0, "low_entropy": 0, "duplicate": 0, "unreadable": 0}
+        for decision in decisions:
+            counts["kept" if decision.keep else decision.reason] += 1
+        return counts
@@ -0,0 +1,50 @@
+import re
+
+LOCATION_PATTERN = re.compile(r"^page (\d+)(?:: ([\d.]+),([\d.]+),([\d.]+),([\d.]+))?$")
+
+def bounding_box(coordinates: dict) -> tuple[float, float, float, float]:
+    """(x0, y0, x1, y1) of an element's coordinates as fractions of the page size, None without a layout size."""
+    points = (coordinates or {}).get("points")
+    width = (coordinates or {}).get("layout_width")
+    height = (coordinates or {}).get("layout_height")
+    if not points or not width or not height:
+        return None
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return min(xs) / width, min(ys) / height, max(xs) / width, max(ys) / height
+
+def format_location(page_number: int, coordinates: dict) -> str:
+    """'page 2' or 'page 2: x0,y0,x1,y1' with the box in fractions of the page, usable as a highlight box."""
+    box = bounding_box(coordinates)
+    if box is None:
+        return f"page {page_number}"
+    return f"page {page_number}: " + ",".join(f"{value:.4f}" for value in box)
+
+def parse_location(location: str) -> tuple[int, tuple]:
+    """Inverse of format_location: (page_number, box or None)."""
+    match = LOCATION_PATTERN.match(location.strip())
+    if match is None:
+        raise ValueError(f"Invalid location {location}")
+    box = tuple(float(value) for value in match.groups()[1:]) if match.group(2) else None
+    return int(match.group(1)), box
+
+def locations_from_documents(docs: list, limit: int = 20) -> list[str]:
+    """Distinct locations of retrieved element Documents, in retrieval order."""
+    locations = []
+    for doc in docs:
+        page_number = doc.metadata.get("page_number")
+        if not page_number:
+            continue
+        location = format_location(page_number, doc.metadata.get("coordinates"))
+        if location not in locations:
+            locations.append(location)
+        if len(locations) == limit:
+            break
+    return locations
+
+def locations_by_document(docs: list, limit: int = 20) -> dict[str, list[str]]:
+    """locations_from_documents per document_id of documents retrieved from several files."""
+    by_document = {}
+    for doc in docs:
+        by_document.setdefault(str(doc.metadata.get("document_id")), []).append(doc)
+    return {document_id: locations_from_documents(document_docs, limit) for document_id, document_docs in by_document.items()}
@@ -1,9 +1,14 @@
+import atexit
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import os
+import queue
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List
-import os
 
 @dataclass
 class LogRecord:
@@ -12,40 +17,174 @@ class LogRecord:
     message: str
 
 class LogCapture(logging.Handler):
-    def __init__(self):
+    """The last `capacity` records in memory, older ones are dropped. None keeps everything."""
+    def __init__(self, capacity: int = 1000):
         super().__init__()
-        self.logs: List[LogRecord] = []
-    
+        self._records = deque(maxlen=capacity)
+
+    @property
+    def logs(self) -> List[LogRecord]:
+        return list(self._records)
+
     def emit(self, record: logging.LogRecord):
         log_entry = LogRecord(
             timestamp=datetime.fromtimestamp(record.created),
             level=record.levelname,
             message=record.getMessage()
         )
-        self.logs.append(log_entry)
-    
+        # deque.append is atomic, no handler lock needed for a single append
+        self._records.append(log_entry)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if self.filter(record):
+            self.emit(record)
+        return True
+
     def clear(self):
         """Clear all captured logs."""
-        self.logs = []
+        self._records.clear()
+
+_exception_formatter = logging.Formatter()
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the listener thread, dropping (and counting) them when its bounded queue is full.
+
+    A burst of logging then never blocks the request thread on disk or
+    console I/O, nor grows memory without bound.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, they may change before the listener runs, but leave formatting
+        # to its handlers instead of formatting and copying every record on the calling thread
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # The traceback would keep the frames of the caller alive until the record is written
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue, so the records already queued are written."""
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the exception when there is one."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
 
 def get_current_log_name(base_dir: str, base_name: str) -> str:
     """Generate current log filename with date."""
     base_filename, ext = os.path.splitext(base_name)
     date_str = datetime.now().strftime("%Y-%m-%d")
-    
+
     # Create a directory for the current year and month if it doesn't exist. For example, "logs/202310"
     year_month = datetime.now().strftime("%Y%m")
     year_month_dir = os.path.join(base_dir, year_month)
     os.makedirs(year_month_dir, exist_ok=True)
-    
+
     return os.path.join(year_month_dir, f"{base_filename}_{date_str}{ext}")
 
+@dataclass
+class _Setup:
+    config: tuple
+    log_capture: LogCapture
+    queue_handler: DroppingQueueHandler = None
+    listener: QueueListener = None
+
+# logger name -> handlers installed on it, so every Logger() with the same configuration shares them
+_setups: dict[str, _Setup] = {}
+_setup_lock = threading.Lock()
+
+def _stop(setup: _Setup):
+    if setup.listener is not None:
+        setup.listener.stop()
+        for handler in setup.listener.handlers:
+            handler.close()
+
+def _restart_listeners_in_child():
+    # A forked child (Celery prefork pool) inherits the queue but not the listener thread, and possibly
+    # a queue lock held by that thread at fork time: give it a fresh queue and listener.
+    for setup in _setups.values():
+        if setup.listener is None:
+            continue
+        fresh = queue.Queue(setup.queue_handler.queue.maxsize)
+        setup.queue_handler.queue = fresh
+        setup.listener.queue = fresh
+        setup.listener._thread = None
+        setup.listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners_in_child)
+
+@atexit.register
+def _flush_on_exit():
+    # Write out what is still queued before the interpreter exits
+    for setup in list(_setups.values()):
+        _stop(setup)
+
+def stats() -> dict:
+    """Queued, dropped and captured records of every configured logger."""
+    return {
+        name: {
+            "queued": setup.queue_handler.queue.qsize() if setup.queue_handler else 0,
+            "dropped": setup.queue_handler.dropped if setup.queue_handler else 0,
+            "captured": len(setup.log_capture._records),
+        }
+        for name, setup in _setups.items()
+    }
+
 class Logger:
-    def __init__(self, log_dir='logs', level=logging.DEBUG):
-        """Initialize the enhanced logger with daily rotating file logging and capture capability."""
+    def __init__(self, log_dir='logs', level=logging.DEBUG, capture_size: int = 1000, log_format: str = 'text',
+                 async_handlers: bool = True, queue_size: int = 10000):
+        """Initialize the enhanced logger with daily rotating file logging and capture capability.
+
+        Handlers are installed once per configuration: constructing Logger()
+        again with the same arguments reuses them (and the captured logs).
+        With async_handlers, file and console writes happen on a listener
+        thread fed by a bounded queue of queue_size records. log_format is
+        'text' or 'json' (one JSON object per line).
+        """
         self.logger = logging.getLogger(__name__)
+        config = (os.path.abspath(log_dir), level, capture_size, log_format, async_handlers, queue_size)
+        with _setup_lock:
+            setup = _setups.get(self.logger.name)
+            if setup is None or setup.config != config:
+                if setup is not None:
+                    _stop(setup)
+                setup = self._install(config)
+                _setups[self.logger.name] = setup
+        self.log_capture = setup.log_capture
+        self.queue_handler = setup.queue_handler
+
+    def _install(self, config: tuple) -> _Setup:
+        log_dir, level, capture_size, log_format, async_handlers, queue_size = config
         self.logger.setLevel(level)
-        
+
         # Clear any existing handlers
         self.logger.handlers = []
 
@@ -54,7 +193,7 @@ class Logger:
 
         # Get current log filename with date
         current_log_file = get_current_log_name(log_dir, "app.log")
-        
+
         # Create a TimedRotatingFileHandler for daily log rotation
         file_handler = TimedRotatingFileHandler(
             filename=current_log_file,
@@ -63,12 +202,12 @@ class Logger:
             backupCount=30,
             encoding='utf-8'
         )
-        
+
         # Custom rotation function
         def rotator(source, dest):
             # Don't need to do anything as we're already using dated filenames
             pass
-        
+
         file_handler.rotator = rotator
         file_handler.namer = lambda x: x  # Identity namer as we handle naming elsewhere
         file_handler.setLevel(logging.DEBUG)
@@ -76,27 +215,40 @@ class Logger:
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
 
-        self.log_capture = LogCapture()
-        self.log_capture.setLevel(logging.DEBUG)
+        log_capture = LogCapture(capture_size)
+        log_capture.setLevel(logging.DEBUG)
 
         # Create a logging format
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        if log_format == 'json':
+            formatter = JsonFormatter()
+        elif log_format == 'text':
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        else:
+            raise ValueError(f"Unknown log format {log_format}, expected 'text' or 'json'")
         file_handler.setFormatter(formatter)
         console_handler.setFormatter(formatter)
 
-        # Add handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-        self.logger.addHandler(self.log_capture)
+        # The capture stays on the calling thread so get_captured_logs() sees every record right away
+        self.logger.addHandler(log_capture)
+        if not async_handlers:
+            self.logger.addHandler(file_handler)
+            self.logger.addHandler(console_handler)
+            return _Setup(config, log_capture)
+
+        queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+        listener = DrainingQueueListener(queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        self.logger.addHandler(queue_handler)
+        return _Setup(config, log_capture, queue_handler, listener)
 
     def get_logger(self) -> logging.Logger:
         """Return the logger instance."""
         return self.logger
 
     def get_captured_logs(self) -> List[LogRecord]:
-        """Return all captured logs."""
+        """Return the captured logs, at most capture_size of the latest."""
         return self.log_capture.logs
 
     def refresh(self):
         """Clear captured logs while maintaining file logging."""
-        self.log_capture.clear()
\ No newline at end of file
+        self.log_capture.clear()
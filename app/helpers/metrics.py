@@ -0,0 +1,175 @@
+"""Prometheus metrics shared by the Flask app and the Celery workers.
+
+Disabled by default (settings.metrics): every record function is then a
+single flag check, and prometheus_client is never imported. Once configure()
+has run, the services record into module level metrics and the Flask app
+serves them at /metrics.
+
+Counters and histograms are recorded where the work happens. Component
+stats the services already keep (path stats, admission, circuit breakers,
+vector cache...) are read at scrape time by register_stats(), so they cost
+nothing per request.
+
+With PROMETHEUS_MULTIPROC_DIR set before the process starts (required for
+Celery's prefork pool and for gunicorn), every process writes its samples
+to that directory and the /metrics endpoint aggregates all of them, so the
+ingest metrics of the workers are scraped from the Flask app.
+"""
+import contextvars
+import logging
+import os
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_enabled = False
+_metrics = {}
+_stats_sources = {}  # component -> callable returning a dict of numbers
+_queries = contextvars.ContextVar("db_queries", default=None)
+
+def configure(enabled: bool, logger=None):
+    """Create the metrics of this process. Call once, before any request or task is handled."""
+    global _enabled
+    if not enabled or _metrics:
+        _enabled = bool(enabled and _metrics)
+        return
+    try:
+        from prometheus_client import Counter, Histogram
+    except ImportError:
+        # An optional dependency: a missing package must not keep the service from starting
+        _enabled = False
+        (logger or logging.getLogger(__name__)).warning("METRICS is on but prometheus_client is not installed, metrics are disabled")
+        return
+    _metrics.update({
+        "request_seconds": Histogram(
+            "rag_http_request_seconds", "Flask request latency", ["endpoint", "method", "status_code"], buckets=LATENCY_BUCKETS
+        ),
+        "ask_seconds": Histogram(
+            "rag_ask_seconds", "Ask endpoint latency by outcome (success, processing, error, busy)", ["endpoint", "outcome"], buckets=LATENCY_BUCKETS
+        ),
+        "db_queries": Histogram(
+            "rag_db_queries_per_request", "Database statements executed per request or task", ["endpoint"], buckets=QUERY_BUCKETS
+        ),
+        "stage_seconds": Histogram(
+            "rag_stage_seconds", "Duration of a pipeline stage", ["pipeline", "stage"], buckets=STAGE_BUCKETS
+        ),
+        "ingest": Counter("rag_ingest_total", "Finished ingest tasks", ["task", "status"]),
+        "provider_calls": Counter("rag_provider_calls_total", "Chat model and embedding calls", ["provider", "outcome"]),
+        "provider_seconds": Histogram("rag_provider_call_seconds", "Chat model and embedding call latency", ["provider"], buckets=LATENCY_BUCKETS),
+        "provider_tokens": Counter("rag_provider_tokens_total", "Tokens sent to and received from the providers", ["provider", "direction"]),
+        "cache": Counter("rag_cache_lookups_total", "Cache lookups by result", ["cache", "result"]),
+    })
+    _enabled = True
+
+def enabled() -> bool:
+    return _enabled
+
+def observe_request(endpoint: str, method: str, status_code: int, seconds: float, db_queries: int = None):
+    if not _enabled:
+        return
+    _metrics["request_seconds"].labels(endpoint, method, str(status_code)).observe(seconds)
+    if db_queries is not None:
+        _metrics["db_queries"].labels(endpoint).observe(db_queries)
+
+def observe_ask(endpoint: str, outcome: str, seconds: float):
+    if _enabled:
+        _metrics["ask_seconds"].labels(endpoint, outcome).observe(seconds)
+
+def observe_stages(pipeline: str, timings: dict[str, float]):
+    if not _enabled:
+        return
+    for stage, seconds in timings.items():
+        _metrics["stage_seconds"].labels(pipeline, stage).observe(seconds)
+
+def count_ingest(task: str, status: str, db_queries: int = None):
+    if not _enabled:
+        return
+    _metrics["ingest"].labels(task, status).inc()
+    if db_queries is not None:
+        _metrics["db_queries"].labels(task).observe(db_queries)
+
+def observe_provider_call(provider: str, outcome: str, seconds: float = None, input_tokens: int = 0, output_tokens: int = 0):
+    if not _enabled:
+        return
+    _metrics["provider_calls"].labels(provider, outcome).inc()
+    if seconds is not None:
+        _metrics["provider_seconds"].labels(provider).observe(seconds)
+    if input_tokens:
+        _metrics["provider_tokens"].labels(provider, "input").inc(input_tokens)
+    if output_tokens:
+        _metrics["provider_tokens"].labels(provider, "output").inc(output_tokens)
+
+def record_cache(cache: str, result: str, count: int = 1):
+    """A cache lookup: result is hit or miss (or a finer level such as memory/disk/render)."""
+    if _enabled and count:
+        _metrics["cache"].labels(cache, result).inc(count)
+
+@contextmanager
+def count_queries():
+    """Count the database statements of a request or task, yields a one-item list holding the count."""
+    counter = [0]
+    token = _queries.set(counter)
+    try:
+        yield counter
+    finally:
+        _queries.reset(token)
+
+def record_query():
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+def register_stats(component: str, source):
+    """Expose the numeric values of source() (e.g. a stats() method) as rag_component_stat gauges at scrape time."""
+    _stats_sources[component] = source
+
+def _flatten(prefix: str, value, out: dict):
+    if isinstance(value, bool):
+        out[prefix] = float(value)
+    elif isinstance(value, (int, float)):
+        out[prefix] = float(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}_{key}" if prefix else str(key), item, out)
+
+class StatsCollector:
+    """prometheus_client collector reading the registered component stats when scraped."""
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+        family = GaugeMetricFamily("rag_component_stat", "Numeric stats kept by the service components", labels=["component", "stat"])
+        for component, source in list(_stats_sources.items()):
+            try:
+                values = {}
+                _flatten("", source(), values)
+            except Exception:
+                # A broken source (e.g. Redis down) must not fail the whole scrape
+                continue
+            for stat, value in values.items():
+                family.add_metric([component, stat], value)
+        yield family
+
+_stats_collector = None
+
+def render() -> tuple[bytes, str]:
+    """The exposition payload and its content type, aggregated over all processes in multiprocess mode."""
+    global _stats_collector
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+    if _stats_collector is None:
+        _stats_collector = StatsCollector()
+        if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            REGISTRY.register(_stats_collector)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_stats_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int):
+    """Drop the live gauges of an exited worker process in multiprocess mode."""
+    if _enabled and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from app.helpers.metrics import record_cache
+
+BOX_COLOR = (255, 64, 0)
+
+class PageRenderCache:
+    """Rendered PDF pages, one PyMuPDF render per (file, page, dpi) and file version.
+
+    Renders are kept as pixmaps in a small in-memory LRU and as PNGs on disk,
+    where usage is bounded by max_bytes with least recently used (mtime)
+    eviction like PartitionCache. Highlight boxes are drawn on a copy of the
+    cached pixmap, so the render itself is never repeated for a new answer.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int, dpi: int = 110, memory_pages: int = 32):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.memory_pages = memory_pages
+        if max_bytes > 0:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, object]" = OrderedDict()
+        self._size = self._disk_usage() if max_bytes > 0 else 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+        self.evictions = 0
+
+    def _key(self, pdf_path: str, page_number: int) -> str:
+        # The file's size and mtime stand in for its version, a re-downloaded update renders again
+        stat = os.stat(pdf_path)
+        raw = f"{os.path.abspath(pdf_path)}:{stat.st_size}:{stat.st_mtime_ns}:{page_number}:{self.dpi}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _remember(self, key: str, pixmap):
+        with self._lock:
+            self._memory[key] = pixmap
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_pages:
+                self._memory.popitem(last=False)
+
+    def get_page(self, pdf_path: str, page_number: int):
+        """Pixmap of a 1-based page, from memory, disk or a fresh render. Do not modify it, copy first."""
+        import fitz
+        key = self._key(pdf_path, page_number)
+        with self._lock:
+            pixmap = self._memory.get(key)
+            if pixmap is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                record_cache("page_render", "memory")
+                return pixmap
+
+        path = self._path(key)
+        if self.max_bytes > 0 and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    pixmap = fitz.Pixmap(f.read())
+                os.utime(path)  # mark as recently used
+                with self._lock:
+                    self.disk_hits += 1
+                record_cache("page_render", "disk")
+                self._remember(key, pixmap)
+                return pixmap
+            except (FileNotFoundError, RuntimeError, ValueError):
+                pass
+
+        with fitz.open(pdf_path) as pdf:
+            if not 1 <= page_number <= pdf.page_count:
+                raise IndexError(f"Page {page_number} out of range, document has {pdf.page_count} pages")
+            pixmap = pdf.load_page(page_number - 1).get_pixmap(dpi=self.dpi, alpha=False)
+        with self._lock:
+            self.renders += 1
+        record_cache("page_render", "render")
+        self._remember(key, pixmap)
+        if self.max_bytes > 0:
+            self._store(path, pixmap.tobytes("png"))
+        return pixmap
+
+    def _store(self, path: str, payload: bytes):
+        if len(payload) > self.max_bytes:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            f.write(payload)
+            tmp_path = f.name
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(payload)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used renders until usage is back under 90% of the limit."""
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+
+    def highlighted_png(self, pdf_path: str, page_number: int, boxes: list[tuple[float, float, float, float]], width: int = 3) -> bytes:
+        """PNG of a page with box outlines, boxes as (x0, y0, x1, y1) fractions of the page width and height."""
+        import fitz
+        pixmap = fitz.Pixmap(self.get_page(pdf_path, page_number))
+        for x0, y0, x1, y1 in boxes:
+            left, top = int(x0 * pixmap.width), int(y0 * pixmap.height)
+            right, bottom = int(x1 * pixmap.width), int(y1 * pixmap.height)
+            # Four filled strips are the outline, no drawing library needed
+            for edge in (
+                (left, top, right, top + width),
+                (left, bottom - width, right, bottom),
+                (left, top, left + width, bottom),
+                (right - width, top, right, bottom),
+            ):
+                pixmap.set_rect(fitz.IRect(*edge) & pixmap.irect, BOX_COLOR)
+        return pixmap.tobytes("png")
+
+    def stats(self) -> dict:
+        return {
+            "memory_pages": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "renders": self.renders,
+            "evictions": self.evictions,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from app.helpers.metrics import record_cache
+
+def group_by_page(elements: list, page_map: dict[int, int]) -> tuple[dict[int, list], bool]:
+    """Elements partitioned from a subset of pages, grouped by their page in the original document.
+
+    page_map maps subset page numbers to original ones. An element without a
+    page number stays with the element before it (or the first element with
+    a page when it leads). The second value is False when no element had a
+    page number, the grouping is then unknown and should not be cached.
+    """
+    by_page = defaultdict(list)
+    leading = []
+    current = None
+    for el in elements:
+        if el.metadata.page_number in page_map:
+            current = page_map[el.metadata.page_number]
+        if current is None:
+            leading.append(el)
+        else:
+            by_page[current].append(el)
+    if leading and current is not None:
+        first = next(iter(by_page))
+        by_page[first][:0] = leading
+    return by_page, not leading or current is not None
+
+class PartitionCache:
+    """On-disk cache of partition_pdf output per page, keyed by the page content hash.
+
+    Entries are gzipped element dicts. Disk usage is bounded by max_bytes and
+    the least recently used entries (by mtime, refreshed on every hit) are
+    evicted first. Safe to share between processes: writes are atomic renames
+    and eviction re-scans the directory.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int, namespace: str = ""):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Partition settings are part of the key, changing them invalidates old entries
+        self.namespace = namespace
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._size = self._disk_usage()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, page_hash: str) -> str:
+        key = hashlib.sha256(f"{self.namespace}:{page_hash}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json.gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def get(self, page_hash: str):
+        """Return the cached elements of a page or None."""
+        from unstructured.staging.base import elements_from_dicts
+        path = self._path(page_hash)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                element_dicts = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            record_cache("partition", "miss")
+            return None
+        with self._lock:
+            self.hits += 1
+        record_cache("partition", "hit")
+        return elements_from_dicts(element_dicts)
+
+    def put(self, page_hash: str, elements: list):
+        path = self._path(page_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = gzip.compress(json.dumps([el.to_dict() for el in elements]).encode("utf-8"))
+        if len(payload) > self.max_bytes:
+            return
+
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            f.write(payload)
+            tmp_path = f.name
+        with self._lock:
+            # An overwritten entry no longer counts
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self._size += len(payload) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until usage is back under 90% of the limit."""
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
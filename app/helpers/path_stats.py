@@ -0,0 +1,44 @@
+import threading
+from collections import Counter, deque
+
+class PathStats:
+    """Share of questions answered by each path (fields, tables, chain...) and their latency.
+
+    Latencies are kept for the last window answers per path; counts are
+    cumulative for the life of the process. A miss is a path that was tried
+    but could not answer, the question then fell through to the next path.
+    """
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque] = {}
+        self._answers = Counter()
+        self._misses = Counter()
+
+    def record(self, path: str, seconds: float):
+        with self._lock:
+            self._answers[path] += 1
+            self._latencies.setdefault(path, deque(maxlen=self.window)).append(seconds)
+
+    def miss(self, path: str):
+        with self._lock:
+            self._misses[path] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._answers.values())
+            paths = {}
+            for path in set(self._answers) | set(self._misses):
+                latencies = sorted(self._latencies.get(path, ()))
+                answered = self._answers[path]
+                tried = answered + self._misses[path]
+                paths[path] = {
+                    "answered": answered,
+                    "misses": self._misses[path],
+                    "share": round(answered / total, 4) if total else 0.0,
+                    "hit_rate": round(answered / tried, 4) if tried else 0.0,
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else None,
+                    "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 3) if latencies else None,
+                    "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+                }
+            return {"questions": total, "paths": paths}
@@ -0,0 +1,34 @@
+import hashlib
+
+def page_fingerprints(pdf_path: str, include_drawing: bool = False) -> list[str]:
+    """Return one content hash per page (index 0 is page 1).
+
+    The hash covers the page size, its text and the raw bytes of the images it
+    shows, so re-saving an unchanged document keeps the fingerprints stable.
+    include_drawing also hashes the page content stream (lines, boxes, layout),
+    for callers that must not reuse results across visually different pages.
+    """
+    import fitz
+    fingerprints = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            digest = hashlib.sha256()
+            digest.update(repr(tuple(page.rect)).encode("utf-8"))
+            digest.update(page.get_text("text").encode("utf-8"))
+            for image in page.get_images(full=True):
+                digest.update(doc.xref_stream_raw(image[0]) or b"")
+            if include_drawing:
+                digest.update(page.read_contents())
+            fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+def extract_pages(pdf_path: str, page_numbers: list[int], output_path: str) -> dict[int, int]:
+    """Write the given 1-based pages to a new PDF, returning {page in new pdf: page in original}."""
+    import fitz
+    page_map = {}
+    with fitz.open(pdf_path) as source, fitz.open() as target:
+        for new_index, page_number in enumerate(sorted(page_numbers), start=1):
+            target.insert_pdf(source, from_page=page_number - 1, to_page=page_number - 1)
+            page_map[new_index] = page_number
+        target.save(output_path)
+    return page_map
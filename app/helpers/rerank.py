@@ -0,0 +1,96 @@
+import math
+import re
+import time
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class Reranker:
+    """Rescores retrieved candidates against their original content.
+
+    Candidates are scored in batches in the order the vector search returned
+    them. Once the latency budget is spent the remaining (lowest ranked)
+    candidates are kept unscored after the scored ones.
+    """
+    batch_size = 16
+
+    def score(self, question: str, texts: list[str]) -> list[float]:
+        raise NotImplementedError
+
+    def rerank(self, question: str, candidates: list[tuple], top_n: int, budget_seconds: float = None) -> list:
+        """candidates: [(key, text)] best vector match first. Returns the top_n keys, best first."""
+        deadline = time.perf_counter() + budget_seconds if budget_seconds else None
+        scored, unscored = [], []
+        for start in range(0, len(candidates), self.batch_size):
+            batch = candidates[start:start + self.batch_size]
+            if deadline is not None and scored and time.perf_counter() >= deadline:
+                unscored.extend(batch)
+                continue
+            scores = self.score(question, [text for _, text in batch])
+            scored.extend((score, start + i, key) for i, ((key, _), score) in enumerate(zip(batch, scores)))
+        # Ties keep the vector order
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return ([key for _, _, key in scored] + [key for key, _ in unscored])[:top_n]
+
+class LexicalReranker(Reranker):
+    """BM25 over the candidate set itself, no model and no extra dependency."""
+    batch_size = 256
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, question: str, texts: list[str]) -> list[float]:
+        terms = set(tokenize(question))
+        documents = [Counter(tokenize(text)) for text in texts]
+        if not terms or not documents:
+            return [0.0] * len(texts)
+        average_length = sum(sum(doc.values()) for doc in documents) / len(documents) or 1.0
+        idf = {
+            term: math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            for term in terms
+            for df in [sum(1 for doc in documents if term in doc)]
+        }
+        scores = []
+        for doc in documents:
+            length = sum(doc.values())
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    score += idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average_length))
+            scores.append(score)
+        return scores
+
+class CrossEncoderReranker(Reranker):
+    """Local sentence-transformers cross-encoder, loaded on first use."""
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 16, max_length: int = 512):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def score(self, question: str, texts: list[str]) -> list[float]:
+        if not texts:
+            return []
+        return [float(score) for score in self.model.predict([(question, text) for text in texts], batch_size=self.batch_size)]
+
+def get_reranker(name: str, model_name: str = None) -> Reranker:
+    """Reranker configured by name ('lexical' or 'cross-encoder'), None for 'none'."""
+    if not name or name == "none":
+        return None
+    if name == "lexical":
+        return LexicalReranker()
+    if name == "cross-encoder":
+        return CrossEncoderReranker(model_name) if model_name else CrossEncoderReranker()
+    raise ValueError(f"Unknown reranker {name}, expected 'none', 'lexical' or 'cross-encoder'")
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from logging import Logger
+from typing import Any, Callable, Hashable, Optional
+from redis.exceptions import RedisError
+from app.helpers.admission import DeadlineExceeded, current_deadline
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivially different questions coalesce."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight computation (threads in one process)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            # A follower waits no longer than its own request may take, the leader may have more time
+            deadline = current_deadline()
+            if not call.event.wait(deadline.remaining() if deadline is not None else None):
+                raise DeadlineExceeded("coalesced answer")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def invalidate(self):
+        """Forget results computed before a document changed. In process nothing outlives its call."""
+
+class RedisSingleFlight(SingleFlight):
+    """Coalesce identical calls across processes (e.g. Flask workers) through Redis.
+
+    Threads inside one process are coalesced locally first, so only one of them
+    talks to Redis. The leader stores its JSON-serializable result under a short
+    lived key; followers poll for it and compute themselves if the leader dies.
+    Keys carry a generation that invalidate() bumps when a document is ingested,
+    so no follower is handed an answer computed from the previous chunks. When
+    Redis fails the call is still coalesced in process.
+    """
+    def __init__(self, redis_client, prefix: str = "singleflight", lock_ttl: int = 120, result_ttl: int = 10, poll_interval: float = 0.1, logger: Logger = None):
+        super().__init__()
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.generation_key = f"{prefix}:generation"
+        from app.redis.lock import RELEASE_SCRIPT, RENEW_SCRIPT
+        self._renew = redis_client.register_script(RENEW_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+
+    def _redis_key(self, key: Hashable, generation: int) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{generation}:{digest}"
+
+    def invalidate(self):
+        # Orphan the results (and locks) of the current generation, they expire on their own
+        try:
+            self.redis_client.incr(self.generation_key)
+        except RedisError as e:
+            self.logger.warning(f"Could not invalidate the coalesced answers, they may be stale for {self.result_ttl}s: {e}")
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        return super().do(key, lambda: self._do_distributed(key, fn))
+
+    def _do_distributed(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        token = str(uuid.uuid4())
+        try:
+            base_key = self._redis_key(key, int(self.redis_client.get(self.generation_key) or 0))
+            lock_key = f"{base_key}:lock"
+            result_key = f"{base_key}:result"
+            role, cached = self._wait_for_turn(lock_key, result_key, token)
+        except RedisError as e:
+            self.logger.warning(f"Redis failed, coalescing in process only: {e}")
+            return fn()
+
+        if role == "cached":
+            return cached
+        if role == "compute":
+            return fn()
+
+        stop = self._start_heartbeat(lock_key, token)
+        try:
+            result = fn()
+            self.redis_client.set(result_key, json.dumps(result), ex=self.result_ttl)
+            return result
+        except RedisError as e:
+            # fn succeeded, only sharing its result failed
+            self.logger.warning(f"Could not share the coalesced answer: {e}")
+            return result
+        finally:
+            stop.set()
+            try:
+                self._release(keys=[lock_key], args=[token])
+            except RedisError:
+                pass  # The lock expires after lock_ttl
+
+    def _wait_for_turn(self, lock_key: str, result_key: str, token: str) -> tuple[str, Any]:
+        """("leader", None) once the lock is ours, ("cached", result) when a leader stored its result,
+        or ("compute", None) when the leader ran out of time."""
+        deadline = time.monotonic() + self.lock_ttl
+        request_deadline = current_deadline()
+        while True:
+            # A leader that just finished shares its result, check it before taking the lock
+            cached = self.redis_client.get(result_key)
+            if cached is not None:
+                return "cached", json.loads(cached)
+            if self.redis_client.set(lock_key, token, nx=True, ex=self.lock_ttl):
+                return "leader", None
+
+            # Another worker is computing, wait for its result
+            if time.monotonic() > deadline:
+                return "compute", None
+            if request_deadline is not None:
+                request_deadline.check("coalesced answer")
+                time.sleep(min(self.poll_interval, request_deadline.remaining()))
+                continue
+            time.sleep(self.poll_interval)
+
+    def _start_heartbeat(self, lock_key: str, token: str) -> threading.Event:
+        """Renew the leader's lock while fn runs, like ProcessingLock.start_heartbeat. Set the event to stop."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lock_ttl / 3):
+                try:
+                    if not self._renew(keys=[lock_key], args=[token, self.lock_ttl * 1000]):
+                        break
+                except RedisError:
+                    break
+
+        threading.Thread(target=beat, name=f"singleflight-heartbeat-{lock_key}", daemon=True).start()
+        return stop
+
+def get_single_flight(logger: Logger = None) -> SingleFlight:
+    # Set RAG_COALESCE_BACKEND=redis to coalesce identical questions across Flask workers
+    if os.getenv("RAG_COALESCE_BACKEND", "local") == "redis":
+        from app.redis.redis import redis_client
+        return RedisSingleFlight(redis_client, logger=logger)
+    return SingleFlight()
@@ -0,0 +1,43 @@
+import re
+from dataclasses import dataclass
+
+WORD_PATTERN = re.compile(r"\S+")
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for English and numbers."""
+    return (len(text) + 3) // 4
+
+def numeric_ratio(text: str) -> float:
+    """Share of words without any letter (amounts, dates, codes, ids)."""
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return 0.0
+    return sum(1 for word in words if not LETTER_PATTERN.search(word)) / len(words)
+
+@dataclass
+class SummaryDecision:
+    summarize: bool
+    reason: str  # 'compressible', 'short' or 'numeric'
+    tokens: int
+
+class SummaryPolicy:
+    """Decides which chunks are worth an LLM summary before embedding.
+
+    Chunks under min_tokens, and text that is mostly numbers, are embedded as
+    they are: their summary is about as long as the input and adds nothing
+    for retrieval. min_tokens=0 summarizes everything.
+    """
+    def __init__(self, min_tokens: int = 256, max_numeric_ratio: float = 0.5):
+        self.min_tokens = min_tokens
+        self.max_numeric_ratio = max_numeric_ratio
+
+    def decide(self, text: str, check_numeric: bool = True) -> SummaryDecision:
+        tokens = estimate_tokens(text)
+        if not self.min_tokens:
+            return SummaryDecision(True, "compressible", tokens)
+        if tokens < self.min_tokens:
+            return SummaryDecision(False, "short", tokens)
+        if check_numeric and numeric_ratio(text) >= self.max_numeric_ratio:
+            return SummaryDecision(False, "numeric", tokens)
+        return SummaryDecision(True, "compressible", tokens)
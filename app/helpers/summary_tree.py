@@ -0,0 +1,57 @@
+import re
+from dataclasses import dataclass, field
+from app.helpers.summary_policy import estimate_tokens
+
+SECTION_LEVEL = 1
+DOCUMENT_LEVEL = 2
+
+# Whole-document questions, answered from the upper levels of the tree instead of retrieved fragments. They
+# match the whole question: "what does the executive summary say about Q3 revenue" or "an overview of the
+# termination clause" ask about one part of the document and need retrieval.
+_PLEASE = r"(?:(?:can|could|would) you |please )?"
+_GIVE = r"(?:(?:give|show|tell) me |(?:what is|what's|whats|what are) )?"
+_DOC = r"(?:the |this |that |my |our )?(?:document|doc|contract|file|report|paper|agreement|invoice|pdf|text)"
+_OF_DOC = rf"(?: (?:of|in|for|from) {_DOC})?"
+
+def _broad(*questions: str) -> re.Pattern:
+    return re.compile("|".join(f"^(?:{question})$" for question in questions))
+
+BROAD_QUESTION = _broad(
+    _PLEASE + rf"(?:summari[sz]e|outline|sum up)(?: {_DOC})?(?: for me)?(?: briefly)?",
+    _PLEASE + _GIVE + rf"(?:an? |the )?(?:short |brief |quick |high-level )?(?:summary|overview|outline|gist|tl;?dr){_OF_DOC}",
+    r"tl;?dr",
+    _PLEASE + _GIVE + rf"(?:the )?(?:main|key) (?:points|topics|ideas|takeaways|terms){_OF_DOC}",
+    rf"what (?:is|'s) {_DOC} about",
+    rf"what does {_DOC} (?:say|cover|describe|contain)",
+)
+# Several questions in one ("the summary and the payment schedule") need retrieval
+COMPOUND_QUESTION = re.compile(r"\b(?:and|or|including|plus|as well as|also|with)\b|[,&]|;(?!dr\b)")
+
+def is_broad_question(question: str) -> bool:
+    question = re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?!.")
+    if COMPOUND_QUESTION.search(question):
+        return False
+    return bool(BROAD_QUESTION.match(question))
+
+@dataclass
+class SummaryNode:
+    level: int
+    position: int
+    summary: str
+    page_start: int = None
+    page_end: int = None
+    children: list[str] = field(default_factory=list)  # chunk ids for sections, section positions for the document
+
+def group_sections(chunks: list[tuple], max_tokens: int = 2000) -> list[list[tuple]]:
+    """Split (chunk_id, summary, page) rows, in document order, into consecutive sections of about max_tokens of summaries."""
+    sections, current, current_tokens = [], [], 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk[1])
+        if current and current_tokens + tokens > max_tokens:
+            sections.append(current)
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += tokens
+    if current:
+        sections.append(current)
+    return sections
@@ -0,0 +1,210 @@
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+import numpy as np
+
+NUMBER_PATTERN = re.compile(r"^\(?-?[$€£¥]?\s*-?[\d,]*\.?\d+\s*%?\)?$")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Rows that already aggregate the line items, excluded before computing
+SUMMARY_ROW_PATTERN = re.compile(r"\b(sub ?total|total|tax|vat|gst|balance|amount due|discount)\b", re.IGNORECASE)
+STOPWORDS = {"the", "a", "an", "of", "for", "in", "on", "is", "are", "was", "were", "what", "which", "how", "much", "many", "me", "show",
+             "give", "tell", "all", "and", "to", "with", "by", "per", "item", "items", "line", "row", "rows", "table", "value"}
+# Header abbreviations, mapped so "quantity" in a question matches a "Qty" column
+SYNONYMS = {"qty": "quantity", "amt": "amount", "desc": "description", "px": "price", "pcs": "quantity", "units": "quantity", "prices": "price", "amounts": "amount", "costs": "cost"}
+MONEY_COLUMNS = {"amount", "total", "price", "cost", "value", "sum", "subtotal", "net", "gross"}
+MONEY_WORDS = MONEY_COLUMNS | {"expensive", "cheap", "cheapest", "spend", "spent", "paid", "pay", "charged", "owed"}
+
+AGGREGATES = [
+    ("count", re.compile(r"\b(how many|count|number of)\b")),
+    ("mean", re.compile(r"\b(average|mean)\b")),
+    ("max", re.compile(r"\b(max|maximum|highest|largest|biggest|most expensive)\b")),
+    ("min", re.compile(r"\b(min|minimum|lowest|smallest|cheapest)\b")),
+    ("sum", re.compile(r"\b(sum|total|add up|altogether|combined)\b")),
+]
+
+def words(text: str) -> set[str]:
+    return {SYNONYMS.get(word, word) for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS}
+
+def parse_number(cell: str):
+    """'$1,234.50' -> 1234.5, '(12)' -> -12.0, '15%' -> 15.0, anything else -> None."""
+    cell = cell.strip()
+    if not cell or not NUMBER_PATTERN.match(cell):
+        return None
+    negative = cell.startswith("(") and cell.endswith(")")
+    try:
+        value = float(re.sub(r"[^\d.\-]", "", cell))
+    except ValueError:
+        return None
+    return -abs(value) if negative else value
+
+class _TableParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.rows: list[list[str]] = []
+        self.header_rows = 0
+        self._cell = None
+        self._row = None
+        self._row_has_th = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row, self._row_has_th = [], False
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+            self._row_has_th |= tag == "th"
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if self._row:
+                self.rows.append(self._row)
+                if self._row_has_th and len(self.rows) == self.header_rows + 1:
+                    self.header_rows += 1
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+@dataclass
+class TableFrame:
+    """A table as typed columns: numeric columns hold floats (None for blanks), the rest strings."""
+    columns: list[str]
+    types: list[str]  # 'number' or 'text' per column
+    data: list[list] = field(default_factory=list)  # one list per column
+
+    @property
+    def row_count(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def to_dict(self) -> dict:
+        return {"columns": self.columns, "types": self.types, "data": self.data}
+
+    @classmethod
+    def from_dict(cls, value: dict) -> "TableFrame":
+        return cls(value["columns"], value["types"], value["data"])
+
+    @classmethod
+    def from_html(cls, html: str, min_numeric_share: float = 0.8) -> "TableFrame":
+        """Parse text_as_html. The <th> rows, or else the first row, are the header. None if nothing tabular."""
+        parser = _TableParser()
+        parser.feed(html or "")
+        rows = parser.rows
+        if len(rows) < 2:
+            return None
+        header_rows = max(parser.header_rows, 1)
+        width = max(len(row) for row in rows)
+        headers = [" ".join(filter(None, parts)) for parts in zip(*[row + [""] * (width - len(row)) for row in rows[:header_rows]])]
+        columns = [header or f"column {i + 1}" for i, header in enumerate(headers)]
+        body = [row + [""] * (width - len(row)) for row in rows[header_rows:]]
+
+        types, data = [], []
+        for i in range(width):
+            cells = [row[i] for row in body]
+            filled = [cell for cell in cells if cell.strip()]
+            numbers = [parse_number(cell) for cell in cells]
+            numeric = filled and sum(1 for n in numbers if n is not None) >= min_numeric_share * len(filled)
+            types.append("number" if numeric else "text")
+            data.append(numbers if numeric else cells)
+        return cls(columns, types, data)
+
+    def numeric(self, column: int) -> np.ndarray:
+        return np.array([np.nan if value is None else value for value in self.data[column]], dtype=np.float64)
+
+    def line_item_mask(self) -> np.ndarray:
+        """False for rows labelled total, tax, balance... in any text column."""
+        mask = np.ones(self.row_count, dtype=bool)
+        for column, column_type in enumerate(self.types):
+            if column_type == "text":
+                mask &= np.array([not SUMMARY_ROW_PATTERN.search(cell) for cell in self.data[column]], dtype=bool)
+        return mask
+
+@dataclass
+class TableAnswer:
+    operation: str  # 'sum', 'mean', 'max', 'min', 'count' or 'lookup'
+    column: str
+    value: object
+    rows_used: int
+    row: dict = None  # the matched row for lookups and max/min
+
+def _best_column(frame: TableFrame, question_words: set[str], column_type: str = None, exclude: int = None) -> int:
+    best, best_score = None, 0
+    for i, column in enumerate(frame.columns):
+        if i == exclude or (column_type and frame.types[i] != column_type):
+            continue
+        score = len(words(column) & question_words)
+        if score > best_score:
+            best, best_score = i, score
+    return best
+
+def _money_column(frame: TableFrame) -> int:
+    # Rightmost money-like column, invoices put the line amount last
+    candidates = [i for i, column in enumerate(frame.columns) if frame.types[i] == "number" and words(column) & MONEY_COLUMNS]
+    return candidates[-1] if candidates else None
+
+def _row(frame: TableFrame, index: int) -> dict:
+    return {column: frame.data[i][index] for i, column in enumerate(frame.columns)}
+
+def answer_table_question(question: str, frame: TableFrame) -> TableAnswer:
+    """Answer an aggregate or lookup question from one frame with array operations, None if it does not apply."""
+    if frame.row_count == 0:
+        return None
+    question_lower = question.lower()
+    question_words = words(question)
+    operation = next((name for name, pattern in AGGREGATES if pattern.search(question_lower)), None)
+
+    # Lookup: a text cell names the row ("price of widget A"), a header names the column
+    label_column, label_row, label_score = None, None, 0
+    for i, column_type in enumerate(frame.types):
+        if column_type != "text":
+            continue
+        for row, cell in enumerate(frame.data[i]):
+            score = len(words(cell) & question_words - words(frame.columns[i]))
+            if score > label_score:
+                label_column, label_row, label_score = i, row, score
+            elif score == label_score and score and row != label_row:
+                label_row = None  # ambiguous between rows
+    if operation in (None, "sum") and label_row is not None and label_score > 0:
+        target = _best_column(frame, question_words, exclude=label_column)
+        if target is None and operation == "sum" and question_words <= words(frame.data[label_column][label_row]) | MONEY_WORDS:
+            # "the total" names the Total row, "the total of widget B" the widget: read their amount
+            target = _money_column(frame)
+        if target is None:
+            if operation is None:
+                return TableAnswer("lookup", frame.columns[label_column], _row(frame, label_row), 1, _row(frame, label_row))
+            # A row is named but not what to read from it ("the date of the total"), summing a column would be a guess
+            return None
+        if frame.data[target][label_row] is not None:
+            return TableAnswer("lookup", frame.columns[target], frame.data[target][label_row], 1, _row(frame, label_row))
+        if operation is None:
+            return None
+        # "the total quantity" matched the Total row, which leaves the quantity blank: sum the column instead
+
+    if operation is None:
+        return None
+    mask = frame.line_item_mask()
+    if operation == "count":
+        # Only when the question is about this table ("how many items/products"), not "how many pages"
+        header_words = set().union(*(words(column) for column in frame.columns))
+        if not (question_words & header_words or re.search(r"\b(items?|lines?|rows?|entries|products)\b", question_lower)):
+            return None
+        return TableAnswer("count", "rows", int(mask.sum()), int(mask.sum()))
+
+    column = _best_column(frame, question_words, column_type="number")
+    if column is None and question_words & MONEY_WORDS:
+        column = _money_column(frame)
+    if column is None:
+        return None
+    values = frame.numeric(column)
+    values = np.where(mask, values, np.nan)
+    used = int(np.count_nonzero(~np.isnan(values)))
+    if used == 0:
+        return None
+    if operation == "sum":
+        return TableAnswer("sum", frame.columns[column], round(float(np.nansum(values)), 6), used)
+    if operation == "mean":
+        return TableAnswer("mean", frame.columns[column], round(float(np.nanmean(values)), 6), used)
+    index = int(np.nanargmax(values) if operation == "max" else np.nanargmin(values))
+    return TableAnswer(operation, frame.columns[column], float(values[index]), used, _row(frame, index))
@@ -0,0 +1,21 @@
+import time
+from contextlib import contextmanager
+from app.helpers.tracing import span
+
+class StageTimer:
+    """Accumulates wall time per named stage of an invocation."""
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str, **attributes):
+        """Time a stage, also recorded as a stage.<name> span. Yields the span for counts and sizes."""
+        start = time.perf_counter()
+        try:
+            with span(f"stage.{name}", **attributes) as current:
+                yield current
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: round(seconds, 4) for name, seconds in self.timings.items()}
@@ -0,0 +1,211 @@
+"""Spans around the stages of the ask and ingest pipelines.
+
+    with span("rag.search", k=k) as current:
+        ...
+        current.set("results", len(rows))
+
+The backend is chosen once per process with configure() (settings.tracing):
+  - "none" (default): span() returns a shared no-op object, nothing is recorded.
+  - "log": every finished span is logged as one JSON line with its trace id,
+    parent, duration and attributes, no extra dependency.
+  - "otel": spans go to the OpenTelemetry tracer. The SDK and its exporter are
+    set up the usual OpenTelemetry way (opentelemetry-instrument, OTEL_*
+    environment variables), this module only creates the spans.
+
+Trace context crosses process boundaries (Flask request -> Celery task) as a
+W3C traceparent header, see inject() and continue_trace().
+"""
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+
+SERVICE_NAME = "hyper_aigent_rag"
+
+class NoopSpan:
+    trace_id = None
+    span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key: str, value):
+        pass
+
+    def set_attributes(self, attributes: dict):
+        pass
+
+NOOP_SPAN = NoopSpan()
+
+_current_span = contextvars.ContextVar("span", default=None)
+
+class LogSpan:
+    """A span of the "log" backend: ids, timing and attributes, logged as JSON when it ends."""
+    def __init__(self, tracer: "LogTracer", name: str, attributes: dict, trace_id: str = None, parent_id: str = None):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes)
+        parent = _current_span.get()
+        self.trace_id = trace_id or (parent.trace_id if parent else os.urandom(16).hex())
+        self.parent_id = parent_id or (parent.span_id if parent else None)
+        self.span_id = os.urandom(8).hex()
+        self._token = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        record = {
+            "event": "span",
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "duration_ms": round(duration * 1000, 3),
+            "status": "error" if exc_type else "ok",
+            "attributes": self.attributes,
+        }
+        if exc_type:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.emit(record)
+        return False
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        self.attributes.update(attributes)
+
+class LogTracer:
+    def __init__(self, logger):
+        self.logger = logger
+
+    def span(self, name: str, attributes: dict) -> LogSpan:
+        return LogSpan(self, name, attributes)
+
+    def emit(self, record: dict):
+        self.logger.info(json.dumps(record, default=str))
+
+    def inject(self) -> dict:
+        current = _current_span.get()
+        if current is None:
+            return {}
+        return {"traceparent": f"00-{current.trace_id}-{current.span_id}-01"}
+
+    @contextmanager
+    def continue_trace(self, carrier: dict):
+        parts = (carrier.get("traceparent") or "").split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            yield
+            return
+        # A placeholder parent, so spans started inside join the remote trace
+        remote = LogSpan(self, "remote", {}, trace_id=parts[1])
+        remote.span_id = parts[2]
+        token = _current_span.set(remote)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+
+class OTelSpan:
+    def __init__(self, tracer, name: str, attributes: dict):
+        self._manager = tracer.start_as_current_span(name, attributes=_otel_attributes(attributes))
+        self._span = None
+
+    def __enter__(self):
+        self._span = self._manager.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._manager.__exit__(exc_type, exc, tb)
+
+    @property
+    def trace_id(self) -> str:
+        return format(self._span.get_span_context().trace_id, "032x")
+
+    @property
+    def span_id(self) -> str:
+        return format(self._span.get_span_context().span_id, "016x")
+
+    def set(self, key: str, value):
+        self._span.set_attributes(_otel_attributes({key: value}))
+
+    def set_attributes(self, attributes: dict):
+        self._span.set_attributes(_otel_attributes(attributes))
+
+def _otel_attributes(attributes: dict) -> dict:
+    # OpenTelemetry only takes primitives (and lists of them), anything else is recorded as text
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items() if value is not None
+    }
+
+class OTelTracer:
+    def __init__(self):
+        from opentelemetry import trace
+        self._tracer = trace.get_tracer(SERVICE_NAME)
+
+    def span(self, name: str, attributes: dict) -> OTelSpan:
+        return OTelSpan(self._tracer, name, attributes)
+
+    def inject(self) -> dict:
+        from opentelemetry.propagate import inject
+        carrier = {}
+        inject(carrier)
+        return carrier
+
+    @contextmanager
+    def continue_trace(self, carrier: dict):
+        from opentelemetry import context
+        from opentelemetry.propagate import extract
+        token = context.attach(extract(carrier))
+        try:
+            yield
+        finally:
+            context.detach(token)
+
+_tracer = None
+
+def configure(backend: str, logger=None):
+    """Select the span backend of this process: 'none', 'log' or 'otel'."""
+    global _tracer
+    if backend == "log":
+        _tracer = LogTracer(logger)
+    elif backend == "otel":
+        _tracer = OTelTracer()
+    elif backend in ("none", "", None):
+        _tracer = None
+    else:
+        raise ValueError(f"Unknown tracing backend {backend}, expected 'none', 'log' or 'otel'")
+    return _tracer
+
+def span(name: str, **attributes):
+    """Context manager timing a stage, yielding a span whose set()/set_attributes() add counts and sizes."""
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.span(name, attributes)
+
+def enabled() -> bool:
+    """True when spans are recorded, for attributes that cost something to compute."""
+    return _tracer is not None
+
+def inject() -> dict:
+    """Trace context of the current span as headers to send along, empty when tracing is off."""
+    return _tracer.inject() if _tracer is not None else {}
+
+@contextmanager
+def continue_trace(carrier: dict):
+    """Make the spans started inside children of the trace in carrier (e.g. the headers of a request or task)."""
+    if _tracer is None or not carrier:
+        yield
+        return
+    with _tracer.continue_trace(carrier):
+        yield
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+from app.helpers.metrics import record_cache
+
+@dataclass
+class DocumentVectors:
+    chunk_ids: list[str]
+    summaries: list[str]
+    matrix: np.ndarray  # (n_chunks, dims), rows L2-normalized, C-contiguous
+    loaded_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def search(self, query: np.ndarray, k: int) -> list[tuple[str, str, float]]:
+        """Brute-force cosine search: [(chunk_id, summary, cosine distance)], best first."""
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.matrix @ query.astype(self.matrix.dtype, copy=False)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunk_ids[i], self.summaries[i], float(1.0 - scores[i])) for i in top]
+
+class DocumentVectorCache:
+    """LRU cache of per-document embedding matrices for in-process vector search.
+
+    Only documents with at most max_chunks embeddings are cached; larger ones
+    are remembered as too large and keep going to Postgres. Total matrix
+    memory is capped at max_bytes, and entries expire after ttl seconds so
+    re-ingested documents are picked up by long-running web workers.
+    """
+    def __init__(self, max_bytes: int, max_chunks: int = 256, dtype: str = "float32", ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        self.dtype = np.dtype(dtype)
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, DocumentVectors]" = OrderedDict()
+        self._too_large: dict[str, float] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at > self.ttl
+
+    def is_too_large(self, file_id) -> bool:
+        loaded_at = self._too_large.get(str(file_id))
+        return loaded_at is not None and not self._expired(loaded_at)
+
+    def get(self, file_id) -> "DocumentVectors | None":
+        key = str(file_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry.loaded_at):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                record_cache("vector", "miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        record_cache("vector", "hit")
+        return entry
+
+    def put(self, file_id, rows: list[tuple[str, str, list[float]]]) -> "DocumentVectors | None":
+        """Cache a document from (chunk_id, summary, embedding) rows. Returns None if it has too many chunks.
+
+        A document under max_chunks whose matrix alone exceeds max_bytes is
+        returned for this query but not kept.
+        """
+        key = str(file_id)
+        if len(rows) > self.max_chunks:
+            with self._lock:
+                self._too_large[key] = time.monotonic()
+            return None
+
+        matrix = np.ascontiguousarray(np.array([row[2] for row in rows], dtype=np.float32))
+        if matrix.size:
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        entry = DocumentVectors(
+            chunk_ids=[row[0] for row in rows],
+            summaries=[row[1] for row in rows],
+            matrix=matrix.astype(self.dtype, copy=False),
+            loaded_at=time.monotonic(),
+        )
+        if entry.nbytes > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def invalidate(self, file_id):
+        with self._lock:
+            key = str(file_id)
+            if key in self._entries:
+                self._remove(key)
+            self._too_large.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "too_large": len(self._too_large),
+        }
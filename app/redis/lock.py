@@ -0,0 +1,118 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from redis import Redis
+
+# Only touch the key if we still own it (value == our fencing token)
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class LockLost(Exception):
+    """The lock expired or was taken over: the holder must not write anything more."""
+
+class ProcessingLock:
+    """Distributed single-flight lock for file processing.
+
+    Acquired with SET NX, the value is a monotonically increasing fencing
+    token so a worker that lost the lock can never renew or release the
+    lock of the worker that took over.
+    """
+    def __init__(self, redis_client: "Redis", file_id: int, ttl: int = 600, prefix: str = "processing"):
+        self.redis_client = redis_client
+        self.file_id = file_id
+        self.ttl = ttl  # seconds
+        self.key = f"{prefix}:{file_id}"
+        self.fence_key = f"{prefix}:{file_id}:fence"
+        self.token: Optional[str] = None
+
+        self._renew = redis_client.register_script(RENEW_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+        self._stop_event = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def is_locked(self) -> bool:
+        return bool(self.redis_client.exists(self.key))
+
+    def acquire(self) -> Optional[str]:
+        """Try to take the lock once. Returns the fencing token or None if it is held."""
+        token = str(self.redis_client.incr(self.fence_key))
+        if self.redis_client.set(self.key, token, nx=True, ex=self.ttl):
+            self.token = token
+            return token
+        return None
+
+    def adopt(self, token: str):
+        """Take over a lock acquired by another process (e.g. the enqueuing web request)."""
+        self.token = str(token)
+        return self
+
+    def take_over(self, token: Optional[str]) -> bool:
+        """Own the lock for a queued job: adopt the token of the enqueuing request, or acquire the lock
+        again if it expired while the job was queued. False when another process holds it."""
+        if token is not None:
+            self.adopt(token)
+            if self.renew():
+                return True
+            self.token = None
+        return self.acquire() is not None
+
+    def renew(self) -> bool:
+        if self.token is None:
+            return False
+        return bool(self._renew(keys=[self.key], args=[self.token, self.ttl * 1000]))
+
+    def ensure_held(self):
+        """Renew the lock, raising LockLost if it is no longer ours. Called before destructive writes, so a
+        job whose lock expired and was taken over stops instead of overwriting the new holder's work."""
+        if not self.renew():
+            raise LockLost(f"Lock {self.key} is no longer held with token {self.token}")
+
+    def release(self) -> bool:
+        self.stop_heartbeat()
+        if self.token is None:
+            return False
+        released = bool(self._release(keys=[self.key], args=[self.token]))
+        self.token = None
+        return released
+
+    def start_heartbeat(self, interval: Optional[float] = None):
+        """Renew the TTL in the background so long running jobs keep the lock."""
+        interval = interval or self.ttl / 3
+        self._stop_event.clear()
+
+        def beat():
+            while not self._stop_event.wait(interval):
+                if not self.renew():
+                    # Lock expired or was taken over, nothing left to renew
+                    break
+
+        self._heartbeat_thread = threading.Thread(target=beat, name=f"lock-heartbeat-{self.key}", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        self._stop_event.set()
+        if self._heartbeat_thread and self._heartbeat_thread is not threading.current_thread():
+            self._heartbeat_thread.join(timeout=1)
+        self._heartbeat_thread = None
+
+    def __enter__(self):
+        if self.token is None and self.acquire() is None:
+            raise RuntimeError(f"Lock {self.key} is already held")
+        self.start_heartbeat()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
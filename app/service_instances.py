@@ -0,0 +1,109 @@
+import threading
+
+class ServiceRegistry:
+    """Lazily built, process-wide service instances.
+
+    Nothing is imported or constructed until a service is first requested, so
+    the Flask process never pays for the ingestion stack (unstructured, layout
+    models) and Celery workers can warm it up explicitly with preload().
+    """
+    def __init__(self, settings_factory=None):
+        self._lock = threading.RLock()
+        self._services = {}
+        self._settings_factory = settings_factory
+
+    @property
+    def settings(self):
+        def build():
+            from app.settings import ServiceSettings
+            return (self._settings_factory or ServiceSettings.local)()
+        return self._get('settings', build)
+
+    def _get(self, name: str, factory):
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    @property
+    def logger(self):
+        def build():
+            from app.helpers.logger import Logger
+            settings = self.settings
+            return Logger(
+                log_dir=settings.log_dir,
+                capture_size=settings.log_capture_size,
+                log_format=settings.log_format,
+                async_handlers=settings.log_async,
+                queue_size=settings.log_queue_size,
+            ).get_logger()
+        return self._get('logger', build)
+
+    @property
+    def tracer(self):
+        """Configure the span backend of this process once from settings.tracing, returns its name."""
+        def build():
+            from app.helpers import tracing
+            tracing.configure(self.settings.tracing, self.logger)
+            return self.settings.tracing
+        return self._get('tracer', build)
+
+    @property
+    def metrics(self):
+        """Create the Prometheus metrics of this process once when settings.metrics is on, returns whether they are."""
+        def build():
+            from app.helpers import metrics
+            metrics.configure(self.settings.metrics, self.logger)
+            return metrics.enabled()
+        return self._get('metrics', build)
+
+    @property
+    def sql_service(self):
+        def build():
+            from app.services.SQLService import SQLService
+            return SQLService(self.logger, self.settings)
+        return self._get('sql_service', build)
+
+    @property
+    def rag_service(self):
+        def build():
+            from app.services.RAGService import RAGService
+            from app.helpers.single_flight import get_single_flight
+            return RAGService(self.logger, self.sql_service, get_single_flight(self.logger))
+        return self._get('rag_service', build)
+
+    @property
+    def file_service(self):
+        def build():
+            from app.services.FileService import FileService
+            return FileService(self.logger, self.sql_service, self.rag_service)
+        return self._get('file_service', build)
+
+    @property
+    def admission(self):
+        """Caps the questions answered at once by this process, see app.helpers.admission."""
+        def build():
+            from app.helpers.admission import AdmissionController
+            settings = self.settings
+            return AdmissionController(
+                max_concurrent=settings.ask_max_concurrent,
+                max_queue=settings.ask_max_queue,
+                max_wait=settings.ask_max_wait_ms / 1000,
+                min_remaining=settings.ask_min_remaining_ms / 1000,
+            )
+        return self._get('admission', build)
+
+    def preload(self):
+        """Warm up everything an ingestion worker needs before it takes its first task."""
+        self.rag_service.preload()
+        self.file_service.preload_models()
+
+    def reset(self):
+        with self._lock:
+            self._services = {}
+
+registry = ServiceRegistry()
@@ -0,0 +1,226 @@
+from logging import Logger
+from typing import List
+from langchain.schema.document import Document
+from psycopg2.extras import Json, execute_values
+from app.services.SQLService import DEADLINE_ERRORS, SQLService
+from app.helpers.tracing import span
+
+def to_vector_literal(embedding: list[float]) -> str:
+    return "[" + ",".join(str(x) for x in embedding) + "]"
+
+# ann_type -> (column type, SQL expression building it from the full vector, distance operator, HNSW opclass).
+# Truncation keeps the leading (Matryoshka) dimensions and re-normalizes them.
+ANN_TYPES = {
+    "vector": ("vector({dims})", "l2_normalize(subvector({source}, 1, {dims}))::vector({dims})", "<=>", "vector_cosine_ops"),
+    "halfvec": ("halfvec({dims})", "l2_normalize(subvector({source}, 1, {dims}))::halfvec({dims})", "<=>", "halfvec_cosine_ops"),
+    # pgvector has no int8 type, binary quantization is its compact quantized form
+    "bit": ("bit({dims})", "binary_quantize(subvector({source}, 1, {dims}))::bit({dims})", "<~>", "bit_hamming_ops"),
+}
+
+class EmbeddingStore:
+    """All summary embeddings in one table keyed by document_id, instead of one PGVector collection per file.
+
+    The table is hash-partitioned on document_id, so a per-document search or
+    delete only touches one partition and its (document_id, chunk_id) index.
+
+    With ann_dimensions set, a compact generated column (truncated and/or
+    halfvec/bit quantized) is used for the nearest neighbour pass, and the
+    ann_oversample * k best candidates are rescored with the full vectors.
+    """
+    def __init__(self, logger: Logger, sql_service: SQLService, embeddings, dimensions: int = 3072, partitions: int = 16,
+                 table: str = "public.rag_embeddings", id_key: str = "chunk_id",
+                 ann_dimensions: int = 0, ann_type: str = "halfvec", ann_oversample: int = 4, ann_index: bool = False):
+        if ann_dimensions and ann_type not in ANN_TYPES:
+            raise ValueError(f"Unknown ann_type {ann_type}, expected one of {list(ANN_TYPES)}")
+        self.logger = logger
+        self.sql_service = sql_service
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+        self.partitions = partitions
+        self.table = table
+        self.id_key = id_key
+        self.ann_dimensions = min(ann_dimensions, dimensions)
+        self.ann_type = ann_type
+        self.ann_oversample = ann_oversample
+        self.ann_index = ann_index
+        self._ready = False
+
+    @property
+    def ann_column(self) -> str:
+        # Settings are part of the name so changing them adds a new column instead of mismatching types
+        return f"ann_{self.ann_type}_{self.ann_dimensions}" if self.ann_dimensions else None
+
+    def ensure_table(self):
+        if self._ready:
+            return
+        partition_clause = "PARTITION BY HASH (document_id)" if self.partitions > 0 else ""
+        with self.sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                        document_id BIGINT NOT NULL,
+                        chunk_id TEXT NOT NULL,
+                        content TEXT,
+                        metadata JSONB,
+                        embedding vector({self.dimensions}) NOT NULL,
+                        PRIMARY KEY (document_id, chunk_id)
+                    ) {partition_clause}
+                """)
+                for remainder in range(self.partitions):
+                    cur.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {self.table}_p{remainder}
+                        PARTITION OF {self.table}
+                        FOR VALUES WITH (MODULUS {self.partitions}, REMAINDER {remainder})
+                    """)
+                if self.ann_column:
+                    column_type, expression, _, opclass = ANN_TYPES[self.ann_type]
+                    # Generated, so inserts and existing rows (backfilled by the ALTER) stay in sync
+                    cur.execute(f"""
+                        ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS {self.ann_column}
+                        {column_type.format(dims=self.ann_dimensions)}
+                        GENERATED ALWAYS AS ({expression.format(source="embedding", dims=self.ann_dimensions)}) STORED
+                    """)
+                    if self.ann_index:
+                        index_name = f"{self.table.replace('.', '_')}_{self.ann_column}_hnsw"
+                        cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {self.table} USING hnsw ({self.ann_column} {opclass})")
+        self._ready = True
+
+    def add_embeddings(self, file_id: int, docs: List[Document], vectors: list[list[float]]):
+        self.ensure_table()
+        rows = [
+            (int(file_id), doc.metadata[self.id_key], doc.page_content, Json(doc.metadata), to_vector_literal(vector))
+            for doc, vector in zip(docs, vectors)
+        ]
+        with self.sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, f"""
+                    INSERT INTO {self.table} (document_id, chunk_id, content, metadata, embedding)
+                    VALUES %s
+                    ON CONFLICT (document_id, chunk_id) DO UPDATE
+                    SET content = EXCLUDED.content, metadata = EXCLUDED.metadata, embedding = EXCLUDED.embedding
+                """, rows, template="(%s, %s, %s, %s, %s::vector)")
+
+    def add_documents(self, file_id: int, docs: List[Document]) -> list[str]:
+        if not docs:
+            return []
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in docs])
+        self.add_embeddings(file_id, docs, vectors)
+        return [doc.metadata[self.id_key] for doc in docs]
+
+    def search(self, file_ids: list, query_embedding: list[float], k: int) -> list[tuple]:
+        """Filtered nearest neighbour search: [(chunk_id, content, cosine distance)], best first."""
+        self.ensure_table()
+        document_ids = [int(file_id) for file_id in file_ids]
+        try:
+            with self.sql_service.connection(vector_db=True) as conn, span("db.vector_search", documents=len(document_ids), k=k, ann=self.ann_column):
+                with conn.cursor() as cur:
+                    if not self.ann_column:
+                        cur.execute(f"""
+                            SELECT chunk_id, content, embedding <=> %s::vector AS distance
+                            FROM {self.table}
+                            WHERE document_id = ANY(%s)
+                            ORDER BY distance
+                            LIMIT %s
+                        """, (to_vector_literal(query_embedding), document_ids, k))
+                        return cur.fetchall()
+                    
+                    # Compact ANN pass, then full precision rescoring of the candidates
+                    _, expression, operator, _ = ANN_TYPES[self.ann_type]
+                    ann_query = expression.format(source="%s::vector", dims=self.ann_dimensions)
+                    cur.execute(f"""
+                        WITH candidates AS (
+                            SELECT chunk_id, content, embedding
+                            FROM {self.table}
+                            WHERE document_id = ANY(%s)
+                            ORDER BY {self.ann_column} {operator} {ann_query}
+                            LIMIT %s
+                        )
+                        SELECT chunk_id, content, embedding <=> %s::vector AS distance
+                        FROM candidates
+                        ORDER BY distance
+                        LIMIT %s
+                    """, (document_ids, to_vector_literal(query_embedding), k * self.ann_oversample, to_vector_literal(query_embedding), k))
+                    return cur.fetchall()
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error searching consolidated embeddings for {len(file_ids)} documents: {e}")
+            return []
+
+    def get_document_embeddings(self, file_id, limit: int) -> list[tuple]:
+        """Up to limit rows of one document: [(chunk_id, content, embedding as a float list)]."""
+        self.ensure_table()
+        with self.sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT chunk_id, content, embedding::real[]
+                    FROM {self.table}
+                    WHERE document_id = %s
+                    LIMIT %s
+                """, (int(file_id), limit))
+                return cur.fetchall()
+
+    def get_document_summaries(self, file_id) -> list[tuple]:
+        """[(chunk_id, content)] of one document."""
+        self.ensure_table()
+        with self.sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT chunk_id, content FROM {self.table} WHERE document_id = %s", (int(file_id),))
+                return cur.fetchall()
+
+    def storage_bytes(self) -> int:
+        """Total size of the table, its partitions, TOAST and indexes."""
+        self.ensure_table()
+        with self.sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT COALESCE(SUM(pg_total_relation_size(inhrelid)), 0) + pg_total_relation_size(%s::regclass)
+                    FROM pg_inherits WHERE inhparent = %s::regclass
+                """, (self.table, self.table))
+                return int(cur.fetchone()[0])
+
+    def delete_document(self, file_id: int, chunk_ids: list[str] = None):
+        self.ensure_table()
+        with self.sql_service.connection(vector_db=True) as conn:
+            self.sql_service.delete_consolidated_embeddings(file_id, conn, chunk_ids, table=self.table)
+
+    def migrate_collection(self, collection_name: str, drop_collection: bool = True) -> int:
+        """Copy one per-file PGVector collection into the consolidated table. Returns the rows moved."""
+        self.ensure_table()
+        with self.sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    INSERT INTO {self.table} (document_id, chunk_id, content, metadata, embedding)
+                    SELECT %s, e.cmetadata->>%s, e.document, e.cmetadata, e.embedding
+                    FROM public.langchain_pg_embedding e
+                    JOIN public.langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = %s
+                    ON CONFLICT (document_id, chunk_id) DO NOTHING
+                """, (int(collection_name), self.id_key, collection_name))
+                moved = cur.rowcount
+            if drop_collection:
+                self.sql_service.delete_langchain_data(collection_name, conn)
+        return moved
+
+    def for_document(self, file_id) -> "DocumentVectorStore":
+        return DocumentVectorStore(self, file_id)
+
+class DocumentVectorStore:
+    """The subset of the PGVector interface RAGService uses, scoped to one document of an EmbeddingStore."""
+    def __init__(self, store: EmbeddingStore, file_id):
+        self.store = store
+        self.file_id = file_id
+
+    def add_documents(self, docs: List[Document]) -> list[str]:
+        return self.store.add_documents(self.file_id, docs)
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.store.embeddings.embed_query(query), k=k)
+
+    def similarity_search_with_score_by_vector(self, embedding: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        rows = self.store.search([self.file_id], embedding, k)
+        return [
+            (Document(page_content=content or "", metadata={self.store.id_key: chunk_id}), distance)
+            for chunk_id, content, distance in rows
+        ]
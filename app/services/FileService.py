@@ -4,10 +4,29 @@ import os
 from logging import Logger
 from app.services.SQLService import SQLService
 from app.services.RAGService import RAGService
-from unstructured.partition.pdf import partition_pdf
+from app.helpers.timing import StageTimer
+from app.helpers import metrics
+from app.helpers.tracing import span
+from app.helpers.pdf_pages import page_fingerprints, extract_pages
 import base64
-from IPython.display import Image, display
 import json
+from app.helpers.partition_cache import PartitionCache, group_by_page
+from app.helpers.image_filter import ImageFilter
+from app.helpers.field_extraction import extract_fields, looks_like_invoice
+from app.helpers.page_render import PageRenderCache
+
+PARTITION_KWARGS = dict(
+    infer_table_structure=True,  # extract tables
+    strategy="hi_res",  # use high resolution for better quality
+    extract_image_block_types=["Image"],  # extract table as image
+    extract_image_block_to_payload=True,  # extract image as payload in base64
+)
+
+CHUNKING_KWARGS = dict(
+    max_characters=10000,  # defaults to 500
+    combine_text_under_n_chars=2000,  # defaults to 0
+    new_after_n_chars=6000,
+)
 
 class FileService:
     def __init__(self, logger: Logger, sql_service: SQLService, rag_service: RAGService):
@@ -15,7 +34,28 @@ class FileService:
         self.sql_service = sql_service
         self.rag_service = rag_service
         
+        settings = sql_service.settings if sql_service else None
+        self._page_renders = None
+        self.image_filter = ImageFilter(
+            min_side=settings.image_min_side if settings else 40,
+            min_entropy=settings.image_min_entropy if settings else 1.5,
+            max_distance=settings.image_max_distance if settings else 4,
+        )
+        self.partition_cache = None
+        if settings and settings.partition_cache_max_bytes > 0:
+            self.partition_cache = PartitionCache(
+                settings.partition_cache_dir,
+                settings.partition_cache_max_bytes,
+                namespace=json.dumps(PARTITION_KWARGS, sort_keys=True),
+            )
+        
     def doc_to_pdf(self, file_bytes: bytes) -> bytes:
+        with span("ingest.convert_to_pdf", input_bytes=len(file_bytes)) as current:
+            pdf_bytes = self._doc_to_pdf(file_bytes)
+            current.set("output_bytes", len(pdf_bytes))
+            return pdf_bytes
+        
+    def _doc_to_pdf(self, file_bytes: bytes) -> bytes:
         try:
             # 1. Save file_bytes to a temp .docx file
             with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as input_file:
@@ -77,51 +117,158 @@ class FileService:
     
     def get_chunks(self, file_path: str) -> list:
         self.logger.info(f"Chunking file: {file_path}...")
-        chunks = partition_pdf(
-            filename=file_path,
-            infer_table_structure=True,  # extract tables
-            strategy="hi_res",  # use high resolution for better quality
-            extract_image_block_types=["Image"],  # extract table as image
-            extract_image_block_to_payload=True,  # extract image as payload in base64
-            chunking_strategy="by_title",  # or 'basic'
-            max_characters=10000,  # defaults to 500
-            combine_text_under_n_chars=2000,  # defaults to 0
-            new_after_n_chars=6000,
-        )
-        return chunks
+        # Imported lazily, unstructured pulls in torch and the layout models
+        from unstructured.chunking.title import chunk_by_title
+        elements = self.get_elements(file_path)
+        return chunk_by_title(elements, **CHUNKING_KWARGS)
+    
+    def get_elements(self, file_path: str) -> list:
+        """Partition a file into elements, reusing cached per-page results for pages seen before."""
+        from unstructured.partition.pdf import partition_pdf
+        if self.partition_cache is None or not file_path.endswith(".pdf"):
+            return partition_pdf(filename=file_path, **PARTITION_KWARGS)
+        
+        page_hashes = page_fingerprints(file_path, include_drawing=True)
+        pages = {page_number: self.partition_cache.get(page_hash) for page_number, page_hash in enumerate(page_hashes, start=1)}
+        missing = [page_number for page_number, elements in pages.items() if elements is None]
+        
+        if missing:
+            # Layout detection and OCR only run on the pages we have never seen
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                subset_path = os.path.join(tmp_dir, "pages.pdf")
+                page_map = extract_pages(file_path, missing, subset_path)
+                elements = partition_pdf(filename=subset_path, **PARTITION_KWARGS)
+            
+            by_page, paged = group_by_page(elements, page_map)
+            if not paged:
+                by_page = {missing[0]: elements}
+            for page_number in missing:
+                pages[page_number] = by_page.get(page_number, [])
+                if paged:
+                    self.partition_cache.put(page_hashes[page_number - 1], pages[page_number])
+        
+        self.logger.info(f"Partition cache: {len(pages) - len(missing)}/{len(pages)} pages reused, stats: {self.partition_cache.stats()}")
+        
+        elements = []
+        for page_number in sorted(pages):
+            for el in pages[page_number]:
+                el.metadata.page_number = page_number
+                elements.append(el)
+        return elements
+    
+    @property
+    def page_renders(self) -> PageRenderCache:
+        if self._page_renders is None:
+            settings = self.sql_service.settings
+            self._page_renders = PageRenderCache(
+                settings.page_render_dir,
+                settings.page_render_max_bytes,
+                dpi=settings.page_render_dpi,
+                memory_pages=settings.page_render_memory_pages,
+            )
+        return self._page_renders
+    
+    def render_page_image(self, file_id: int, page_number: int, boxes: list[tuple] = None) -> bytes:
+        """PNG of a document page with the given (x0, y0, x1, y1) page-fraction boxes outlined."""
+        file_path = os.path.join(self.sql_service.settings.download_dir, f"{file_id}.pdf")
+        if not os.path.exists(file_path):
+            downloaded = self.sql_service.download_file_by_id(file_id)
+            if not downloaded:
+                raise FileNotFoundError(f"File with ID {file_id} not found")
+            file_path = downloaded[0]
+        if not file_path.endswith(".pdf"):
+            raise ValueError(f"Only PDF pages can be rendered, got {file_path}")
+        return self.page_renders.highlighted_png(file_path, page_number, boxes or [])
+    
+    def preload_models(self):
+        """Load the hi_res layout model into memory so the first partition does not pay for it."""
+        from unstructured.partition.pdf import partition_pdf  # noqa: F401
+        from unstructured_inference.models.base import get_model
+        get_model()
+        self.logger.info("Layout detection model preloaded.")
     
     def display_base64_image(self, base64_code):
+        from IPython.display import Image, display
         # Decode the base64 string to binary
         image_data = base64.b64decode(base64_code)
         # Display the image
         display(Image(data=image_data))
     
-    def prepare_data_for_rag(self, file_id: int) -> bool:
+    def prepare_data_for_rag(self, file_id: int, timer: StageTimer = None, before_write=None) -> bool:
+        """Ingest a document. before_write() runs before every write stage and may raise to stop it (e.g. LockLost)."""
+        timer = timer or StageTimer()
+        with span("ingest.prepare_data_for_rag", file_id=file_id) as current:
+            ok = self._prepare_data_for_rag(file_id, timer, before_write)
+            current.set("ok", ok)
+        metrics.observe_stages("ingest", timer.timings)
+        return ok
+    
+    def _prepare_data_for_rag(self, file_id: int, timer: StageTimer, before_write=None) -> bool:
         try:
             # Download the file from the database
-            file_path, file_name = self.sql_service.download_file_by_id(file_id)
+            with timer.stage("download") as current:
+                file_path, file_name = self.sql_service.download_file_by_id(file_id)
+                current.set("bytes", os.path.getsize(file_path))
             self.logger.info(f"File downloaded: {file_path}, Name: {file_name}")
             
-            chunks = self.get_chunks(file_path)
-            
-            tables, texts = self.get_tables_and_texts(chunks)
-            images = self.get_images(chunks)
-            
-            self.logger.info(f"Tables found: {len(tables)}, Texts found: {len(texts)}, Images found: {len(images)}")
+            with timer.stage("partition") as current:
+                chunks = self.get_chunks(file_path)
+                current.set("chunks", len(chunks))
             
-            # Summarize and save to vector database
-            self.logger.info("Saving data to vector database...")
-            result = self.rag_service.summarize_and_save_to_vector_db(file_id, tables, texts, images)
-            
-            if not result:
-                self.logger.error("Failed to summarize and save data to vector database.")
+            summary_stats = self.save_chunks(file_id, chunks, timer, before_write)
+            if summary_stats is None:
                 return False
+            if self.sql_service.settings.summary_tree:
+                if before_write is not None:
+                    before_write()
+                summary_stats["summary_tree_calls"] = self.rag_service.build_summary_tree(file_id, timer)
             
-            # Save original chunks to the database
+            # Remember what every page looked like so a re-ingest only redoes changed pages
+            if file_path.endswith(".pdf"):
+                if before_write is not None:
+                    before_write()
+                self.sql_service.save_page_fingerprints(file_id, page_fingerprints(file_path))
+            self.logger.info(f"Ingest stats for file {file_id}: summaries {summary_stats}, timings {timer.as_dict()}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error preparing data for RAG: {e}")
+            return False
+    
+    def save_chunks(self, file_id: int, chunks: list, timer: StageTimer = None, before_write=None) -> dict:
+        """Summarize, embed and store chunks. Returns the summarization stats, or None on failure.
+
+        before_write() runs before the embeddings and before the chunks are stored.
+        """
+        timer = timer or StageTimer()
+        tables, texts = self.get_tables_and_texts(chunks)
+        images = self.get_images(chunks)
+        
+        # Icons, separators and repeated logos never reach the vision model
+        with timer.stage("image_filter", images=len(images)) as current:
+            decisions = self.image_filter.plan([image.metadata.image_base64 for image in images])
+            current.set("kept", sum(1 for decision in decisions if decision.keep))
+        image_stats = ImageFilter.stats(decisions)
+        images = [image for image, decision in zip(images, decisions) if decision.keep]
+        
+        self.logger.info(f"Tables found: {len(tables)}, Texts found: {len(texts)}, Images found: {len(images)}, image filter: {image_stats}")
+        
+        # Summarize and save to vector database
+        self.logger.info("Saving data to vector database...")
+        result = self.rag_service.summarize_and_save_to_vector_db(file_id, tables, texts, images, timer, before_write)
+        
+        if not result:
+            self.logger.error("Failed to summarize and save data to vector database.")
+            return None
+        
+        # Save original chunks to the database
+        if before_write is not None:
+            before_write()
+        with timer.stage("persist", tables=len(tables), texts=len(texts), images=len(images)):
             # Save tables
             if tables:
                 self.logger.info(f"Saving {len(tables)} tables to the database.")
                 self.sql_service.save_original_tables(file_id, tables, result['table_ids'])
+                self.save_table_frames(file_id, tables, result['table_ids'])
             # Save texts
             if texts:
                 self.logger.info(f"Saving {len(texts)} texts to the database.")
@@ -130,7 +277,143 @@ class FileService:
             if images:
                 self.logger.info(f"Saving {len(images)} images to the database.")
                 self.sql_service.save_original_images(file_id, images, result['image_ids'])
-            return True
+            fields = self.save_document_fields(file_id, chunks)
+        return {**result['summary_stats'], "image_filter": image_stats, "fields_extracted": sorted(fields)}
+    
+    def save_document_fields(self, file_id: int, chunks: list) -> dict:
+        """Extract the common invoice fields (total, due date...) so they are answered without retrieval."""
+        elements = []
+        for chunk in chunks:
+            elements.extend(chunk.metadata.orig_elements or [chunk])
+        fields = extract_fields(elements)
+        if not looks_like_invoice(elements, fields):
+            # "Total" or "Tax" labels in a report or a contract are not an invoice's bottom line
+            fields = {}
+        self.sql_service.save_document_fields(file_id, [field.to_dict() for field in fields.values()])
+        return fields
+    
+    def save_table_frames(self, file_id: int, tables: list, table_ids: list):
+        """Store tables as typed columns so numeric questions can be computed instead of read from HTML."""
+        from app.helpers.table_frames import TableFrame
+        frames = []
+        for table, table_id in zip(tables, table_ids):
+            frame = TableFrame.from_html(table.metadata.text_as_html)
+            if frame is not None:
+                frames.append((table_id, table.metadata.page_number, frame.to_dict()))
+        self.logger.info(f"Parsed {len(frames)} of {len(tables)} tables into frames.")
+        self.sql_service.save_table_frames(file_id, frames)
+    
+    def get_chunks_for_pages(self, file_path: str, page_numbers: set[int]) -> list:
+        """Partition only the given 1-based pages, with page numbers mapped back to the original document."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            subset_path = os.path.join(tmp_dir, "pages.pdf")
+            page_map = extract_pages(file_path, page_numbers, subset_path)
+            chunks = self.get_chunks(subset_path)
+        
+        for chunk in chunks:
+            if chunk.metadata.page_number is not None:
+                chunk.metadata.page_number = page_map.get(chunk.metadata.page_number, chunk.metadata.page_number)
+            for el in chunk.metadata.orig_elements or []:
+                if el.metadata.page_number is not None:
+                    el.metadata.page_number = page_map.get(el.metadata.page_number, el.metadata.page_number)
+        return chunks
+    
+    def reingest(self, file_id: int, timer: StageTimer = None, before_write=None) -> dict:
+        """Re-ingest an updated document, redoing only the pages whose fingerprint changed.
+
+        Chunks that touch a changed or removed page are replaced: every page
+        they covered is partitioned, summarized and embedded again, and they
+        are deleted with their embeddings once the new chunks are stored. Returns a report of the work done and
+        skipped, or None on failure. before_write() runs before every write stage.
+        """
+        timer = timer or StageTimer()
+        with span("ingest.reingest", file_id=file_id) as current:
+            report = self._reingest(file_id, timer, before_write)
+            if report is not None:
+                current.set_attributes({"pages_processed": report["pages_processed"], "chunks_added": report["chunks_added"]})
+        metrics.observe_stages("reingest", timer.timings)
+        return report
+    
+    def _reingest(self, file_id: int, timer: StageTimer, before_write=None) -> dict:
+        try:
+            with timer.stage("download"):
+                file_path, file_name = self.sql_service.download_file_by_id(file_id)
+            self.logger.info(f"File downloaded for re-ingest: {file_path}, Name: {file_name}")
+            
+            if not file_path.endswith(".pdf"):
+                raise ValueError(f"Only PDF documents can be re-ingested incrementally, got {file_path}")
+            
+            with timer.stage("fingerprint"):
+                fingerprints = page_fingerprints(file_path)
+                stored = self.sql_service.get_page_fingerprints(file_id)
+                chunk_pages = self.sql_service.get_chunk_pages(file_id)
+            
+            page_count = len(fingerprints)
+            changed = {page for page, fingerprint in enumerate(fingerprints, start=1) if stored.get(page) != fingerprint}
+            removed = {page for page in stored if page > page_count}
+            
+            # Whole chunks are rebuilt, so every page of a stale chunk is reprocessed, and every chunk
+            # touching one of those pages is stale in turn: expand until the set stops growing
+            pages_to_process = set(changed)
+            stale_chunk_ids = set()
+            while True:
+                stale = {chunk_id for chunk_id, pages in chunk_pages.items() if pages & (pages_to_process | removed)}
+                expanded = pages_to_process | {page for chunk_id in stale for page in chunk_pages[chunk_id] if page <= page_count}
+                if stale == stale_chunk_ids and expanded == pages_to_process:
+                    break
+                stale_chunk_ids, pages_to_process = stale, expanded
+            stale_chunk_ids = sorted(stale_chunk_ids)
+            
+            self.logger.info(f"Re-ingesting file {file_id}: {len(changed)} changed, {len(removed)} removed, {len(pages_to_process)} of {page_count} pages to process.")
+            
+            # Partition first: a document that no longer parses keeps its current chunks and fields
+            new_chunks = []
+            if pages_to_process:
+                with timer.stage("partition"):
+                    new_chunks = self.get_chunks_for_pages(file_path, pages_to_process)
+            
+            # Store the new chunks before deleting the stale ones: a failed summary or embedding call then
+            # leaves the document answering from its previous version instead of missing those pages
+            summary_stats = None
+            if new_chunks:
+                summary_stats = self.save_chunks(file_id, new_chunks, timer, before_write)
+                if summary_stats is None:
+                    return None
+            
+            if before_write is not None:
+                before_write()
+            with timer.stage("delete"):
+                self.sql_service.delete_chunks(file_id, stale_chunk_ids)
+                # Fields found again were just overwritten, the others no longer exist on those pages
+                self.sql_service.delete_document_fields(
+                    file_id, pages_to_process | removed, keep_fields=(summary_stats or {}).get("fields_extracted")
+                )
+            self.rag_service.invalidate_vector_cache(file_id)
+            if (pages_to_process or removed) and self.sql_service.settings.summary_tree:
+                if before_write is not None:
+                    before_write()
+                summary_stats = summary_stats or {}
+                summary_stats["summary_tree_calls"] = self.rag_service.build_summary_tree(file_id, timer)
+            
+            if before_write is not None:
+                before_write()
+            self.sql_service.save_page_fingerprints(file_id, fingerprints)
+            
+            report = {
+                "file_id": file_id,
+                "pages_total": page_count,
+                "pages_changed": len(changed),
+                "pages_removed": len(removed),
+                "pages_processed": len(pages_to_process),
+                "pages_skipped": page_count - len(pages_to_process),
+                "chunks_deleted": len(stale_chunk_ids),
+                "chunks_kept": len(chunk_pages) - len(stale_chunk_ids),
+                "chunks_added": len(new_chunks),
+                "summaries": summary_stats,
+                "timings": timer.as_dict(),
+            }
+            self.logger.info(f"Re-ingest report: {report}")
+            return report
         except Exception as e:
-            self.logger.error(f"Error preparing data for RAG: {e}")
-            return False
+            self.logger.error(f"Error re-ingesting file with ID {file_id}: {e}")
+            return None
@@ -2,20 +2,40 @@ import os
 from app.services.SQLService import SQLService
 from logging import Logger
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_anthropic import ChatAnthropic
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import OpenAIEmbeddings
-from langchain_postgres import PGVector
 from langchain.schema.document import Document
 import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.runnables import Runnable
-from typing import List
+from typing import List, TYPE_CHECKING
 import json
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.messages import HumanMessage
+from langchain_core.embeddings import Embeddings
 # from app.services.utils import render_page
 from collections import defaultdict
-from app.config import ANTHROPIC_API_KEY, OPENAI_API_KEY, TOP_K, PG_VECTOR_CONNECTION_STRING
+from app.helpers.single_flight import SingleFlight, normalize_question
+from app.helpers.timing import StageTimer
+from app.helpers.rerank import Reranker, get_reranker
+from app.helpers.summary_policy import SummaryDecision, SummaryPolicy, estimate_tokens
+from app.helpers.image_filter import image_content_hash
+from app.helpers.field_extraction import ANSWER_TEMPLATES, MIN_ANSWER_CONFIDENCE, match_intent
+from app.helpers.locations import format_location, locations_by_document, locations_from_documents
+from app.helpers.path_stats import PathStats
+from app.helpers.admission import DeadlineExceeded, bind_context, check_deadline
+from app.helpers.circuit_breaker import CircuitBreaker, CircuitOpen
+from app.helpers.tracing import span
+from app.helpers import metrics
+from app.helpers.summary_tree import DOCUMENT_LEVEL, SECTION_LEVEL, SummaryNode, group_sections, is_broad_question
+from app.services.EmbeddingStore import EmbeddingStore
+from app.config import ANTHROPIC_API_KEY, OPENAI_API_KEY, TOP_K
+
+if TYPE_CHECKING:
+    # Provider SDKs and SQLAlchemy are imported on first use, see RAGService.model/embeddings
+    from langchain_openai import OpenAIEmbeddings
+    from langchain_postgres import PGVector
+    from app.helpers.vector_cache import DocumentVectorCache
 
 def parse_docs(retriever_results: dict) -> dict:
     images = []
@@ -37,6 +57,22 @@ def parse_docs(retriever_results: dict) -> dict:
                 texts.append(type_and_text)
     return {"images": images, "texts": texts}
 
+def extractive_answer(docs: List[Document], max_passages: int = 3, max_chars: int = 400) -> str:
+    """Degraded answer without the chat model: the best retrieved text passages, quoted with their page."""
+    passages = []
+    for doc in docs:
+        text = " ".join(doc.page_content.split())
+        if doc.metadata.get("type") == "Image" or not text:
+            continue
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit(" ", 1)[0] + "..."
+        passages.append(f"- Page {doc.metadata.get('page_number')}: {text}")
+        if len(passages) == max_passages:
+            break
+    if not passages:
+        return "The answer service is temporarily unavailable and no matching passage was found, please try again later."
+    return "The answer service is temporarily unavailable. The most relevant passages of the document are:\n" + "\n".join(passages)
+
 def build_prompt(kwargs):
     docs_by_type = kwargs["context"]
     user_question = kwargs["question"]
@@ -109,100 +145,488 @@ def build_prompt(kwargs):
             HumanMessage(content=prompt_content),
         ]
     )
+TABLE_ANSWER_PROMPT = """You are a document analysis assistant. The answer to the question was computed from a table in the document.
+Phrase it as a short, direct answer using only the computed result below. Do not recompute or add information.
+
+QUESTION:
+{question}
+
+COMPUTED RESULT (page {page_number}):
+{result}
+
+RESPONSE:"""
+
+SECTION_SUMMARY_PROMPT = """You are an assistant summarizing one section of a document.
+Below are the summaries of the consecutive parts of the section (pages {page_start} to {page_end}).
+Write one concise summary of the section that keeps names, figures, dates and obligations.
+Respond only with the summary.
+
+PART SUMMARIES:
+{summaries}
+"""
+
+DOCUMENT_SUMMARY_PROMPT = """You are an assistant summarizing a whole document from the summaries of its sections, in order.
+Write a concise overview: what the document is, who is involved, and its main points, figures and dates.
+Respond only with the summary.
+
+SECTION SUMMARIES:
+{summaries}
+"""
+
+BROAD_ANSWER_PROMPT = """You are a document analysis assistant. Answer the question about the whole document using ONLY the overview and section summaries below.
+Be concise and structured. If the summaries do not contain the information, say "Information not available in provided context".
+
+DOCUMENT OVERVIEW:
+{document_summary}
+
+SECTIONS:
+{sections}
+
+QUESTION:
+{question}
+
+RESPONSE:"""
+
+def chunk_to_documents(chunk_type: str, content: str) -> List[Document]:
+    """Turn a stored rag_original_chunks row back into one Document per original element."""
+    if chunk_type == "image":
+        elm = json.loads(content)
+        
+        metadata = elm["metadata"]
+        
+        return [Document(
+            page_content=metadata.get("image_base64", ""),
+            metadata={
+                "type": "Image",
+                "coordinates": metadata.get("coordinates", {}),
+                "page_number": metadata.get("page_number", 0)
+            }
+        )]
+    
+    docs = []
+    elememnts = json.loads(content)
+    for elm in elememnts:
+        metadata = elm["metadata"]
+        
+        type = elm["type"]
+        page_content = elm.get("text", "")
+        
+        if type == "Image":
+            page_content = metadata.get("image_base64", "")
+        
+        docs.append(Document(
+            page_content=page_content,
+            metadata={
+                "type": type,
+                "coordinates": metadata.get("coordinates", {}),
+                "page_number": metadata.get("page_number", 0)
+            }
+        ))
+    return docs
+
+def rerank_chunks(reranker: Reranker, question: str, chunk_ids: list[str], chunks: dict, summaries: dict, top_n: int, budget_seconds: float = None) -> list[str]:
+    """Reorder hydrated chunks by relevance of their original content and keep the best top_n."""
+    candidates = []
+    for chunk_id in chunk_ids:
+        if chunk_id not in chunks:
+            continue
+        _, chunk_type, content = chunks[chunk_id]
+        # Images are scored on their summary, base64 has nothing to match
+        texts = [doc.page_content for doc in chunk_to_documents(chunk_type, content) if doc.metadata["type"] != "Image"]
+        candidates.append((chunk_id, "\n".join(texts) or summaries.get(chunk_id, "")))
+    return reranker.rerank(question, candidates, top_n, budget_seconds)
+
 class CustomRetriever(Runnable):
-    def __init__(self, file_id, embeddings: OpenAIEmbeddings, sql_service: SQLService, vector_store: PGVector, threshold=0.5, id_key="chunk_id"):
+    def __init__(self, file_id, embeddings: "OpenAIEmbeddings", sql_service: SQLService, vector_store: "PGVector", threshold=0.5, id_key="chunk_id",
+                 reranker: Reranker = None, rerank_top_n: int = 3, overfetch: int = 3, rerank_budget: float = None):
         self.file_id = file_id
         self.embeddings = embeddings
         self.sql_service = sql_service
         self.vector_store = vector_store
         self.threshold = threshold
         self.id_key = id_key
+        self.reranker = reranker
+        self.rerank_top_n = rerank_top_n
+        self.overfetch = overfetch
+        self.rerank_budget = rerank_budget
 
-    def invoke(self, input: str, config: dict = None) -> List[Document]:
-        # Step 1: Search vector DB
-        retrieved = self.vector_store.similarity_search_with_score(input, k=TOP_K)
-        filtered = [doc for doc, score in retrieved if score >= self.threshold]
-        chunk_ids = [doc.metadata[self.id_key] for doc in filtered]
+    def search(self, input: str, query_embedding: list[float] = None) -> list[Document]:
+        """Summaries above the threshold, over-fetching when a reranker picks the final few."""
+        check_deadline("retrieval")
+        k = TOP_K * self.overfetch if self.reranker else TOP_K
+        with span("rag.search", file_id=self.file_id, k=k, embedded=query_embedding is not None) as current:
+            if query_embedding is None:
+                retrieved = self.vector_store.similarity_search_with_score(input, k=k)
+            else:
+                retrieved = self.vector_store.similarity_search_with_score_by_vector(query_embedding, k=k)
+            filtered = [doc for doc, score in retrieved if score >= self.threshold]
+            current.set_attributes({"results": len(retrieved), "above_threshold": len(filtered)})
+        return filtered
 
-        # Step 2: Get full original content
+    def assemble(self, input: str, filtered: list[Document], chunks: dict) -> dict:
+        """Group the hydrated chunks of the search results by page, reranked on their original content."""
+        chunk_ids = [doc.metadata[self.id_key] for doc in filtered]
         result = defaultdict(list)  # page_number -> List[Document]
+        if self.reranker:
+            summaries = {doc.metadata[self.id_key]: doc.page_content for doc in filtered}
+            with span("rag.rerank", candidates=len(chunk_ids), top_n=self.rerank_top_n):
+                chunk_ids = rerank_chunks(self.reranker, input, chunk_ids, chunks, summaries, self.rerank_top_n, self.rerank_budget)
         
         for chunk_id in chunk_ids:
-            db_result = self.sql_service.execute_query(
-                f"SELECT * FROM public.rag_original_chunks WHERE chunk_id = %s",
-                (chunk_id,),
-                fetchone=True
-            )
-            
-            if not db_result:
+            if chunk_id not in chunks:
                 continue
-            
-            
-            content = db_result[4]
-            chunk_type = db_result[3]
-            
-            if chunk_type == "image":
-                elm = json.loads(content)
-                
-                metadata = elm["metadata"]
-                
-                page_content = metadata.get("image_base64", "")
-                coordinates = metadata.get("coordinates", {})
-                page_number = metadata.get("page_number", 0)
-                
-                doc = Document(
-                    page_content=page_content,
-                    metadata={
-                        "type": "Image",
-                        "coordinates": coordinates,
-                        "page_number": page_number
-                    }
-                )
-                result[page_number].append(doc)
-            else:
-                elememnts = json.loads(content)
-                for elm in elememnts:
-                    metadata = elm["metadata"]
-                    
-                    type = elm["type"]
-                    page_content = elm.get("text", "")
-                    coordinates = metadata.get("coordinates", {})
-                    page_number = metadata.get("page_number", 0)
-                    
-                    if type == "Image":
-                        page_content = metadata.get("image_base64", "")
-                    
-                    doc = Document(
-                        page_content=page_content,
-                        metadata={
-                            "type": type,
-                            "coordinates": coordinates,
-                            "page_number": page_number
-                        }
-                    )
-                    result[page_number].append(doc)
+            _, chunk_type, content = chunks[chunk_id]
+            for doc in chunk_to_documents(chunk_type, content):
+                result[doc.metadata["page_number"]].append(doc)
         return {"result": dict(result), "file_id": self.file_id}
+
+    def invoke(self, input: str, config: dict = None) -> List[Document]:
+        # Step 1: Search vector DB
+        filtered = self.search(input)
+        
+        # Step 2: Get full original content, one query for all chunks
+        check_deadline("hydration")
+        with span("rag.hydrate", chunk_ids=len(filtered)) as current:
+            chunks = self.sql_service.get_original_chunks([doc.metadata[self.id_key] for doc in filtered])
+            current.set_attributes({"chunks": len(chunks), "bytes": sum(len(content or "") for _, _, content in chunks.values())})
+        
+        # Step 3: Rescore against the original content instead of the summaries
+        return self.assemble(input, filtered, chunks)
+
+class CachedVectorStore:
+    """similarity_search_with_score(_by_vector) over an in-process matrix of the document's embeddings.
+
+    Small documents are loaded from Postgres on the first query and then
+    searched with a dot product; documents with more than the cache's
+    max_chunks, and any load error, go to the Postgres vector store.
+    """
+    def __init__(self, file_id, cache: "DocumentVectorCache", embeddings: "OpenAIEmbeddings", load, fallback, logger: Logger, id_key="chunk_id"):
+        self.file_id = file_id
+        self.cache = cache
+        self.embeddings = embeddings
+        # (file_id, limit) -> [(chunk_id, summary, embedding)]
+        self.load = load
+        self.fallback = fallback
+        self.logger = logger
+        self.id_key = id_key
+
+    def _entry(self):
+        entry = self.cache.get(self.file_id)
+        if entry is not None or self.cache.is_too_large(self.file_id):
+            return entry
+        try:
+            rows = self.load(self.file_id, self.cache.max_chunks + 1)
+        except Exception as e:
+            self.logger.error(f"Error loading embeddings of file {self.file_id} into the vector cache: {e}")
+            return None
+        if not rows:
+            return None
+        entry = self.cache.put(self.file_id, rows)
+        stats = self.cache.stats()
+        if entry is None:
+            self.logger.info(f"File {self.file_id} has more than {self.cache.max_chunks} chunks, searching in Postgres")
+        else:
+            self.logger.info(
+                f"Cached {len(entry.chunk_ids)} embeddings of file {self.file_id} ({entry.nbytes} bytes), "
+                f"vector cache at {stats['bytes']}/{stats['max_bytes']} bytes in {stats['entries']} documents"
+            )
+        return entry
+
+    def add_documents(self, docs: List[Document]) -> list[str]:
+        ids = self.fallback.add_documents(docs)
+        self.cache.invalidate(self.file_id)
+        return ids
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        entry = self._entry()
+        if entry is None:
+            return self.fallback.similarity_search_with_score(query, k=k)
+        return self._search(entry, self.embeddings.embed_query(query), k)
+
+    def similarity_search_with_score_by_vector(self, embedding: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        entry = self._entry()
+        if entry is None:
+            return self.fallback.similarity_search_with_score_by_vector(embedding, k=k)
+        return self._search(entry, embedding, k)
+
+    def _search(self, entry, query_embedding: list[float], k: int) -> list[tuple[Document, float]]:
+        return [
+            (Document(page_content=summary or "", metadata={self.id_key: chunk_id}), distance)
+            for chunk_id, summary, distance in entry.search(query_embedding, k)
+        ]
+
+class MultiDocumentRetriever(Runnable):
+    """Retrieve across several documents (e.g. every attachment of a chat) with a single ANN query.
+
+    Matches from all collections are ranked together by cosine similarity,
+    duplicate summaries (the same content uploaded twice) keep only their best
+    score, and the winners are hydrated in one batch.
+    """
+    def __init__(self, file_ids: list, embeddings: "OpenAIEmbeddings", sql_service: SQLService, threshold=0.3, k=TOP_K, id_key="chunk_id", search=None,
+                 reranker: Reranker = None, rerank_top_n: int = 3, overfetch: int = 3, rerank_budget: float = None):
+        self.file_ids = [str(file_id) for file_id in file_ids]
+        self.embeddings = embeddings
+        self.sql_service = sql_service
+        # (file_ids, query_embedding, k) -> [(chunk_id, summary, distance)], PGVector collections by default
+        self.search = search or sql_service.search_embeddings
+        self.threshold = threshold
+        self.k = k
+        self.id_key = id_key
+        self.reranker = reranker
+        self.rerank_top_n = rerank_top_n
+        self.overfetch = overfetch
+        self.rerank_budget = rerank_budget
+
+    def invoke(self, input: str, config: dict = None) -> dict:
+        if not self.file_ids:
+            return {"result": {}, "file_id": self.file_ids}
+        
+        # Step 1: One filtered vector search over every collection, over-fetching to survive dedup
+        k = self.k * self.overfetch if self.reranker else self.k
+        query_embedding = self.embeddings.embed_query(input)
+        with span("rag.search", documents=len(self.file_ids), k=k * 2) as current:
+            rows = self.search(self.file_ids, query_embedding, k * 2)
+            current.set("results", len(rows))
+        
+        # Step 2: Global dedup by summary content, best score first
+        seen = {}  # summary -> chunk_id
+        chunk_ids = []
+        for chunk_id, summary, distance in rows:
+            similarity = 1 - distance
+            if similarity < self.threshold or summary in seen:
+                continue
+            seen[summary] = chunk_id
+            chunk_ids.append(chunk_id)
+            if len(chunk_ids) == k:
+                break
+        
+        # Step 3: Hydrate all winners in one query, then rerank them on their original content
+        check_deadline("hydration")
+        result = defaultdict(list)  # (document_id, page_number) -> List[Document]
+        with span("rag.hydrate", chunk_ids=len(chunk_ids)) as current:
+            chunks = self.sql_service.get_original_chunks(chunk_ids)
+            current.set_attributes({"chunks": len(chunks), "bytes": sum(len(content or "") for _, _, content in chunks.values())})
+        if self.reranker:
+            summaries = {chunk_id: summary for summary, chunk_id in seen.items()}
+            chunk_ids = rerank_chunks(self.reranker, input, chunk_ids, chunks, summaries, self.rerank_top_n, self.rerank_budget)
+        for chunk_id in chunk_ids:
+            if chunk_id not in chunks:
+                continue
+            document_id, chunk_type, content = chunks[chunk_id]
+            for doc in chunk_to_documents(chunk_type, content):
+                doc.metadata["document_id"] = document_id
+                result[(document_id, doc.metadata["page_number"])].append(doc)
+        return {"result": dict(result), "file_id": self.file_ids}
+
+class GuardedRunnable(Runnable):
+    """A chat model whose calls go through a circuit breaker, batch() included (one breaker call per input)."""
+    def __init__(self, runnable: Runnable, breaker: CircuitBreaker):
+        self.runnable = runnable
+        self.breaker = breaker
+
+    def invoke(self, input, config: dict = None, **kwargs):
+        with span("llm.chat", breaker=self.breaker.state) as current:
+            start = time.perf_counter()
+            try:
+                message = self.breaker.call(self.runnable.invoke, input, config, **kwargs)
+            except CircuitOpen:
+                metrics.observe_provider_call("chat", "rejected")
+                raise
+            except Exception:
+                metrics.observe_provider_call("chat", "error", time.perf_counter() - start)
+                raise
+            usage = getattr(message, "usage_metadata", None) or {}
+            metrics.observe_provider_call("chat", "ok", time.perf_counter() - start, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+            if usage:
+                current.set_attributes({"input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")})
+            current.set("output_chars", len(getattr(message, "content", "") or ""))
+            return message
+
+class GuardedEmbeddings(Embeddings):
+    """An embedding client whose calls go through a circuit breaker."""
+    def __init__(self, embeddings: Embeddings, breaker: CircuitBreaker):
+        self.embeddings = embeddings
+        self.breaker = breaker
+
+    def _call(self, fn, arg, texts: list[str]):
+        start = time.perf_counter()
+        try:
+            result = self.breaker.call(fn, arg)
+        except CircuitOpen:
+            metrics.observe_provider_call("embeddings", "rejected")
+            raise
+        except Exception:
+            metrics.observe_provider_call("embeddings", "error", time.perf_counter() - start)
+            raise
+        # The client does not report usage, tokens are estimated from the text
+        metrics.observe_provider_call("embeddings", "ok", time.perf_counter() - start, sum(estimate_tokens(text) for text in texts))
+        return result
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with span("embeddings.embed_documents", texts=len(texts), chars=sum(len(text) for text in texts)):
+            return self._call(self.embeddings.embed_documents, texts, texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        with span("embeddings.embed_query", texts=1, chars=len(text)):
+            return self._call(self.embeddings.embed_query, text, [text])
+
 class RAGService:
-    def __init__(self, logger: Logger, sql_service: SQLService):
+    def __init__(self, logger: Logger, sql_service: SQLService, single_flight: SingleFlight = None):
         self.logger = logger
         self.sql_service = sql_service
+        # Coalesces identical in-flight questions, in-process unless a RedisSingleFlight is passed in
+        self.single_flight = single_flight or SingleFlight()
         
-        self.model = ChatAnthropic(temperature=0.5, model="claude-3-5-haiku-20241022", api_key=ANTHROPIC_API_KEY)
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large", api_key=OPENAI_API_KEY)
+        self._model = None
+        self._embeddings = None
+        self._engine = None
+        self._embedding_store = None
+        self._vector_cache = None
+        settings = self.sql_service.settings
+        self.reranker = get_reranker(settings.reranker, settings.rerank_model)
+        self.summary_policy = SummaryPolicy(settings.summary_min_tokens, settings.summary_max_numeric_ratio)
+        # Which path answered each question (fields, tables, chain) and how fast
+        self.path_stats = PathStats()
+        breaker_options = {
+            "window": settings.breaker_window,
+            "min_calls": settings.breaker_min_calls,
+            "error_rate": settings.breaker_error_rate,
+            "slow_call_seconds": settings.breaker_slow_call_ms / 1000,
+            "slow_rate": settings.breaker_slow_rate,
+            "open_seconds": settings.breaker_open_seconds,
+        }
+        self.chat_breaker = CircuitBreaker("chat", **breaker_options)
+        self.embedding_breaker = CircuitBreaker("embeddings", **breaker_options)
         
         self.id_key = "chunk_id"
+    
+    @property
+    def model(self) -> Runnable:
+        """The chat model behind its circuit breaker."""
+        if self._model is None:
+            settings = self.sql_service.settings
+            if settings.fake_models:
+                from app.helpers.fake_models import Faults, FakeChatModel
+                model = FakeChatModel(Faults(latency=settings.fake_model_latency_ms / 1000, error_rate=settings.fake_model_error_rate))
+            else:
+                from langchain_anthropic import ChatAnthropic
+                model = ChatAnthropic(
+                    temperature=0.5,
+                    model="claude-3-5-haiku-20241022",
+                    api_key=ANTHROPIC_API_KEY,
+                    timeout=settings.llm_timeout,
+                    max_retries=settings.llm_max_retries,
+                )
+            self._model = GuardedRunnable(model, self.chat_breaker)
+        return self._model
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        """The embedding client behind its circuit breaker."""
+        if self._embeddings is None:
+            settings = self.sql_service.settings
+            if settings.fake_models:
+                from app.helpers.fake_models import Faults, FakeEmbeddings
+                embeddings = FakeEmbeddings(faults=Faults(latency=settings.fake_model_latency_ms / 1000, error_rate=settings.fake_model_error_rate))
+            else:
+                from langchain_openai import OpenAIEmbeddings
+                embeddings = OpenAIEmbeddings(
+                    model="text-embedding-3-large",
+                    api_key=OPENAI_API_KEY,
+                    timeout=settings.embedding_timeout,
+                    max_retries=settings.llm_max_retries,
+                )
+            self._embeddings = GuardedEmbeddings(embeddings, self.embedding_breaker)
+        return self._embeddings
+    
+    def provider_stats(self) -> dict:
+        return {"chat": self.chat_breaker.stats(), "embeddings": self.embedding_breaker.stats()}
+    
+    @property
+    def engine(self):
+        """SQLAlchemy engine shared by every PGVector store instead of one engine per request."""
+        if self._engine is None:
+            from sqlalchemy import create_engine
+            settings = self.sql_service.settings
+            self._engine = create_engine(
+                settings.vector_database_url,
+                pool_pre_ping=True,
+                pool_size=max(settings.vector_pool_size, 1),
+                max_overflow=2,
+            )
+        return self._engine
+    
+    @property
+    def embedding_store(self) -> EmbeddingStore:
+        if self._embedding_store is None:
+            settings = self.sql_service.settings
+            self._embedding_store = EmbeddingStore(
+                self.logger,
+                self.sql_service,
+                self.embeddings,
+                partitions=settings.embedding_partitions,
+                id_key=self.id_key,
+                ann_dimensions=settings.ann_dimensions,
+                ann_type=settings.ann_type,
+                ann_oversample=settings.ann_oversample,
+                ann_index=settings.ann_index,
+            )
+        return self._embedding_store
+    
+    @property
+    def vector_cache(self) -> "DocumentVectorCache | None":
+        """In-process embedding matrices of small documents, None when disabled."""
+        settings = self.sql_service.settings
+        if self._vector_cache is None and settings.vector_cache_max_bytes > 0:
+            from app.helpers.vector_cache import DocumentVectorCache
+            self._vector_cache = DocumentVectorCache(
+                max_bytes=settings.vector_cache_max_bytes,
+                max_chunks=settings.vector_cache_max_chunks,
+                dtype=settings.vector_cache_dtype,
+                ttl=settings.vector_cache_ttl,
+            )
+        return self._vector_cache
+    
+    def load_document_embeddings(self, file_id, limit: int) -> list[tuple]:
+        if self.sql_service.settings.vector_layout == 'consolidated':
+            return self.embedding_store.get_document_embeddings(file_id, limit)
+        return self.sql_service.get_collection_embeddings(str(file_id), limit)
+    
+    def invalidate_vector_cache(self, file_id):
+        if self._vector_cache is not None:
+            self._vector_cache.invalidate(file_id)
+        # Answers shared between workers were computed from the previous chunks too
+        self.single_flight.invalidate()
+    
+    def get_vector_store(self, file_id):
+        """Vector store of one document, a PGVector collection or a slice of the consolidated table."""
+        if self.sql_service.settings.vector_layout == 'consolidated':
+            return self.embedding_store.for_document(file_id)
         
-    def file_exists(self, file_id: int) -> bool:
+        from langchain_postgres import PGVector
+        return PGVector(
+            embeddings=self.embeddings,
+            collection_name=str(file_id),
+            connection=self.engine,
+        )
+    
+    def preload(self):
+        """Build the model clients up front (ingestion workers) instead of on the first request."""
+        self.model
+        self.embeddings
+        
+    def file_exists(self, file_id: int) -> bool | None:
+        """Whether the document has been ingested, None when the database could not tell."""
         self.logger.info(f"Checking if file with ID {file_id} exists in the database.")
         exists = self.sql_service.execute_query(
             "SELECT EXISTS(SELECT 1 FROM public.rag_original_chunks WHERE document_id = %s)",
             (file_id,),
             fetchone=True
         )
-        return exists[0] if exists else False
+        return exists[0] if exists is not None else None
         
         
-    def sumarize_tables_and_texts(self, tables, texts):
+    def sumarize_tables_and_texts(self, tables, texts, table_decisions: list[SummaryDecision] = None, text_decisions: list[SummaryDecision] = None):
         self.logger.info("Summarizing tables and texts...")
         
         prompt_text = """
@@ -220,16 +644,38 @@ class RAGService:
         prompt = ChatPromptTemplate.from_template(prompt_text)
         chain = {"element": lambda x: x} | prompt | self.model | StrOutputParser()
         
+        def batch_where(inputs, raw, decisions):
+            # Chunks the policy skipped keep their raw text as the "summary" that gets embedded
+            if decisions is None:
+                return chain.batch(inputs, {"max_concurrency": 5})
+            todo = [i for i, decision in enumerate(decisions) if decision.summarize]
+            summaries = list(raw)
+            if todo:
+                for i, summary in zip(todo, chain.batch([inputs[i] for i in todo], {"max_concurrency": 5})):
+                    summaries[i] = summary
+            return summaries
+        
         #Tables
         tables_html = [table.metadata.text_as_html for table in tables]
-        table_summaries = chain.batch(tables_html, {"max_concurrency": 5})
+        table_summaries = batch_where(tables_html, [table.text for table in tables], table_decisions)
         
         #Texts
-        text_summaries = chain.batch(texts, {"max_concurrency": 5})
+        text_summaries = batch_where(texts, [text.text for text in texts], text_decisions)
         
         return table_summaries, text_summaries
     
     def summarize_images(self, images):
+        return self.summarize_unique_images(images)[0]
+    
+    def summarize_unique_images(self, images) -> tuple[list[str], int]:
+        """Summarize images, reusing the stored summary of any image already described for another document.
+
+        Summaries are shared on the sha256 of the decoded pixels, never on the
+        perceptual hash: look-alike charts or forms with other values must get
+        their own summary.
+
+        Returns the summaries and the number of vision calls made.
+        """
         self.logger.info("Summarizing images...")
         
         prompt_text = """
@@ -251,30 +697,81 @@ class RAGService:
         ]
         
         images_base64 = [image.metadata.image_base64 for image in images]
+        content_hashes = []
+        for image_base64 in images_base64:
+            try:
+                content_hashes.append(image_content_hash(image_base64))
+            except Exception:
+                content_hashes.append(None)
+        cached = self.sql_service.get_image_summaries([h for h in content_hashes if h])
+        image_summaries = [cached.get(h) for h in content_hashes]
+        todo = [i for i, summary in enumerate(image_summaries) if summary is None]
         
-        prompt = ChatPromptTemplate.from_messages(messages)
-        chain = prompt | self.model | StrOutputParser()
-        image_summaries = chain.batch(images_base64, {"max_concurrency": 5})
+        if todo:
+            prompt = ChatPromptTemplate.from_messages(messages)
+            chain = prompt | self.model | StrOutputParser()
+            for i, summary in zip(todo, chain.batch([images_base64[i] for i in todo], {"max_concurrency": 5})):
+                image_summaries[i] = summary
+            self.sql_service.save_image_summaries({content_hashes[i]: image_summaries[i] for i in todo if content_hashes[i]})
         
-        return image_summaries
+        self.logger.info(f"Image summaries: {len(images) - len(todo)} reused, {len(todo)} vision calls.")
+        metrics.record_cache("image_summary", "hit", len(images) - len(todo))
+        metrics.record_cache("image_summary", "miss", len(todo))
+        return image_summaries, len(todo)
+
+    def summary_stats(self, decisions: list[SummaryDecision], summarize_seconds: float, image_calls: int, images: int = 0) -> dict:
+        """LLM calls made and skipped by the summary policy, with the wall time the skipped ones would have cost."""
+        made = sum(1 for decision in decisions if decision.summarize)
+        skipped = len(decisions) - made
+        # Average wall time per call at the batch concurrency actually used for this document
+        per_call = summarize_seconds / made if made else None
+        return {
+            "llm_calls": made + image_calls,
+            "llm_calls_saved": skipped,
+            "skipped_short": sum(1 for decision in decisions if decision.reason == "short"),
+            "skipped_numeric": sum(1 for decision in decisions if decision.reason == "numeric"),
+            "summarize_seconds": round(summarize_seconds, 4),
+            "estimated_seconds_saved": round(per_call * skipped, 4) if per_call is not None else None,
+            "vision_calls": image_calls,
+            "vision_calls_saved": images - image_calls,
+        }
 
-    def summarize_and_save_to_vector_db(self, file_id, tables, texts, images):
+    def summarize_and_save_to_vector_db(self, file_id, tables, texts, images, timer: StageTimer = None, before_write=None):
+        """Summarize the chunks and store the summaries' embeddings. before_write() runs before the first write."""
+        timer = timer or StageTimer()
+        
+        # Only chunks where a summary actually compresses go to the LLM, tables are never skipped for being numeric
+        table_decisions = [self.summary_policy.decide(table.metadata.text_as_html or table.text, check_numeric=False) for table in tables]
+        text_decisions = [self.summary_policy.decide(text.text) for text in texts]
+        
+        with timer.stage("summarize", tables=len(tables), texts=len(texts), images=len(images)) as current:
+            start = time.perf_counter()
+            table_summaries, text_summaries = self.sumarize_tables_and_texts(tables, texts, table_decisions, text_decisions)
+            text_seconds = time.perf_counter() - start
+            image_summaries, image_calls = self.summarize_unique_images(images)
+            current.set_attributes({
+                "llm_summaries": sum(1 for decision in table_decisions + text_decisions if decision.summarize),
+                "vision_calls": image_calls,
+            })
         
-        table_summaries, text_summaries = self.sumarize_tables_and_texts(tables, texts)
-        image_summaries = self.summarize_images(images)
+        summary_stats = self.summary_stats(table_decisions + text_decisions, text_seconds, image_calls, len(images))
+        self.logger.info(f"Summaries for file {file_id}: {summary_stats}")
         
         # Prepare documents for vector store
         
+        def summary_metadata(chunk_id, decision: SummaryDecision) -> dict:
+            return {self.id_key: chunk_id, "summary": "llm" if decision.summarize else "raw", "summary_reason": decision.reason}
+        
         # Texts
         text_ids = [str(uuid.uuid4()) for _ in texts]
         text_summary_docs = [
-            Document(page_content=summary, metadata={self.id_key: text_ids[i]}) for i, summary in enumerate(text_summaries)
+            Document(page_content=summary, metadata=summary_metadata(text_ids[i], text_decisions[i])) for i, summary in enumerate(text_summaries)
         ]
         
         # Tables
         table_ids = [str(uuid.uuid4()) for _ in tables]
         table_summary_docs = [
-            Document(page_content=summary, metadata={self.id_key: table_ids[i]}) for i, summary in enumerate(table_summaries)
+            Document(page_content=summary, metadata=summary_metadata(table_ids[i], table_decisions[i])) for i, summary in enumerate(table_summaries)
         ]
         
         # Images
@@ -286,32 +783,43 @@ class RAGService:
         # save to vector store
         self.logger.info("Saving documents to vector store...")
         
-        vector_store = PGVector(
-            embeddings=self.embeddings,
-            collection_name=str(file_id),  # Use file_id as collection name
-            connection=PG_VECTOR_CONNECTION_STRING,
-        )
+        vector_store = self.get_vector_store(file_id)  # Use file_id as collection name
+        if before_write is not None:
+            before_write()
         
-        if text_summary_docs:
-            vector_store.add_documents(text_summary_docs)
-        if table_summary_docs:
-            vector_store.add_documents(table_summary_docs)
-        if image_summary_docs:
-            vector_store.add_documents(image_summary_docs)
+        with timer.stage("embed", documents=len(text_summary_docs) + len(table_summary_docs) + len(image_summary_docs)):
+            if text_summary_docs:
+                vector_store.add_documents(text_summary_docs)
+            if table_summary_docs:
+                vector_store.add_documents(table_summary_docs)
+            if image_summary_docs:
+                vector_store.add_documents(image_summary_docs)
+        self.invalidate_vector_cache(file_id)
         self.logger.info("Documents saved to vector store.")
         
         return {
             "text_ids": text_ids,
             "table_ids": table_ids,
-            "image_ids": image_ids
+            "image_ids": image_ids,
+            "summary_stats": summary_stats,
         }
 
+    @property
+    def rerank_options(self) -> dict:
+        settings = self.sql_service.settings
+        return {
+            "reranker": self.reranker,
+            "rerank_top_n": settings.rerank_top_n,
+            "overfetch": settings.rerank_overfetch,
+            "rerank_budget": settings.rerank_budget_ms / 1000 if settings.rerank_budget_ms else None,
+        }
+    
     def get_retriever(self, file_id: str, threshold=0.3):
-        vector_store = PGVector(
-            embeddings=self.embeddings,
-            collection_name=str(file_id),
-            connection=PG_VECTOR_CONNECTION_STRING,
-        )
+        vector_store = self.get_vector_store(file_id)
+        if self.vector_cache is not None:
+            vector_store = CachedVectorStore(
+                file_id, self.vector_cache, self.embeddings, self.load_document_embeddings, vector_store, self.logger, self.id_key
+            )
         
         return CustomRetriever(
             file_id=file_id,
@@ -319,11 +827,23 @@ class RAGService:
             sql_service=self.sql_service,
             vector_store=vector_store,
             threshold=threshold,
-            id_key=self.id_key
+            id_key=self.id_key,
+            **self.rerank_options
+        )
+    
+    def get_multi_document_retriever(self, file_ids: list, threshold=0.3):
+        return MultiDocumentRetriever(
+            file_ids=file_ids,
+            embeddings=self.embeddings,
+            sql_service=self.sql_service,
+            threshold=threshold,
+            id_key=self.id_key,
+            search=self.embedding_store.search if self.sql_service.settings.vector_layout == 'consolidated' else None,
+            **self.rerank_options
         )
     
-    def get_chain(self, file_id: str) -> Runnable:
-        retriever = self.get_retriever(file_id)
+    def get_chain(self, file_id: str, retriever: Runnable = None) -> Runnable:
+        retriever = retriever or self.get_retriever(file_id)
         
         return (
             {
@@ -335,7 +855,303 @@ class RAGService:
             | StrOutputParser()
         )
         
+    def answer_from_tables(self, file_id, question: str) -> str:
+        """Answer lookup/aggregate questions over the parsed tables of a document, None if none applies.
+
+        The value is computed with array operations on the stored frames and
+        only that small result goes to the model for phrasing.
+        """
+        frames = self.sql_service.get_table_frames(file_id)
+        if not frames:
+            return None
+        from app.helpers.table_frames import TableFrame, answer_table_question
+        answers = []
+        for chunk_id, page_number, frame in frames:
+            answer = answer_table_question(question, TableFrame.from_dict(frame))
+            if answer is not None:
+                answers.append((answer, page_number))
+        if not answers:
+            return None
+        # A lookup names its row, prefer it over an aggregate from another table
+        answer, page_number = next((item for item in answers if item[0].operation == "lookup"), answers[0])
+        self.logger.info(f"Answering from table on page {page_number} of file {file_id}: {answer.operation} of {answer.column}")
+        
+        result = {"operation": answer.operation, "column": answer.column, "value": answer.value, "rows_used": answer.rows_used}
+        if answer.row:
+            result["row"] = answer.row
+        chain = ChatPromptTemplate.from_template(TABLE_ANSWER_PROMPT) | self.model | StrOutputParser()
+        return chain.invoke({"question": question, "page_number": page_number, "result": json.dumps(result, default=str)})
+    
+    def load_document_summaries(self, file_id) -> list[tuple]:
+        """[(chunk_id, summary)] of every chunk of a document, from the vector store."""
+        if self.sql_service.settings.vector_layout == 'consolidated':
+            return self.embedding_store.get_document_summaries(file_id)
+        return self.sql_service.get_collection_summaries(str(file_id))
+    
+    def build_summary_tree(self, file_id, timer: StageTimer = None) -> int:
+        """Summarize the chunk summaries of a document into sections, and the sections into one document summary.
+
+        Always rebuilt from every stored chunk, so a partial re-ingest leaves
+        a tree that matches the whole document. Returns the LLM calls made.
+        """
+        timer = timer or StageTimer()
+        try:
+            with timer.stage("summary_tree"):
+                summaries = dict(self.load_document_summaries(file_id))
+                chunk_pages = self.sql_service.get_chunk_pages(file_id)
+                chunks = sorted(
+                    ((chunk_id, summary, min(chunk_pages.get(chunk_id) or {0})) for chunk_id, summary in summaries.items() if summary),
+                    key=lambda chunk: chunk[2]
+                )
+                if not chunks:
+                    return 0
+                sections = group_sections(chunks, self.sql_service.settings.summary_section_tokens)
+            
+                section_chain = ChatPromptTemplate.from_template(SECTION_SUMMARY_PROMPT) | self.model | StrOutputParser()
+                section_summaries = section_chain.batch([
+                    {
+                        "page_start": section[0][2],
+                        "page_end": section[-1][2],
+                        "summaries": "\n".join(f"- {summary}" for _, summary, _ in section),
+                    }
+                    for section in sections
+                ], {"max_concurrency": 5})
+                calls = len(sections)
+            
+                # A single section already is the whole document
+                if len(sections) == 1:
+                    document_summary = section_summaries[0]
+                else:
+                    document_chain = ChatPromptTemplate.from_template(DOCUMENT_SUMMARY_PROMPT) | self.model | StrOutputParser()
+                    document_summary = document_chain.invoke({
+                        "summaries": "\n".join(f"{i + 1}. {summary}" for i, summary in enumerate(section_summaries))
+                    })
+                    calls += 1
+            
+                nodes = [
+                    SummaryNode(SECTION_LEVEL, i, summary, section[0][2], section[-1][2], [chunk_id for chunk_id, _, _ in section])
+                    for i, (section, summary) in enumerate(zip(sections, section_summaries))
+                ]
+                nodes.append(SummaryNode(DOCUMENT_LEVEL, 0, document_summary, chunks[0][2], chunks[-1][2], [str(i) for i in range(len(sections))]))
+                self.sql_service.save_summary_tree(file_id, nodes)
+            self.logger.info(f"Summary tree for file {file_id}: {len(chunks)} chunks, {len(sections)} sections, {calls} LLM calls.")
+            return calls
+        except Exception as e:
+            # The chunks are stored, whole-document questions fall back to the retrieval chain
+            self.logger.error(f"Error building summary tree for file {file_id}: {e}")
+            return 0
+    
+    def answer_from_summary_tree(self, file_id, question: str) -> str:
+        """Answer a whole-document question from the precomputed overview and section summaries, None otherwise."""
+        if not is_broad_question(question):
+            return None
+        rows = self.sql_service.get_summary_tree(file_id)
+        if not rows:
+            self.path_stats.miss("summary")
+            return None
+        document_summary = next((summary for level, _, _, _, summary in rows if level == DOCUMENT_LEVEL), "")
+        sections = "\n".join(
+            f"- Pages {page_start}-{page_end}: {summary}" for level, _, page_start, page_end, summary in rows if level == SECTION_LEVEL
+        )
+        chain = ChatPromptTemplate.from_template(BROAD_ANSWER_PROMPT) | self.model | StrOutputParser()
+        return chain.invoke({"document_summary": document_summary, "sections": sections, "question": question})
+    
+    def answer_from_fields(self, file_id, question: str) -> tuple[str, list[str]]:
+        """Instant answer to a common invoice question from the fields extracted at ingest, None otherwise."""
+        field = match_intent(question)
+        if field is None:
+            return None
+        row = self.sql_service.get_document_field(file_id, field)
+        if row is None or (row[3] or 0) < MIN_ANSWER_CONFIDENCE:
+            self.path_stats.miss("fields")
+            return None
+        value, page_number, coordinates, _ = row
+        return ANSWER_TEMPLATES[field].format(value=value), [format_location(page_number, coordinates)]
+    
+    def generate_answer(self, question: str, retrieved: dict) -> tuple[str, str]:
+        """(answer, path) from retrieved context: the chat model, or the extractive fallback while it is unavailable."""
+        check_deadline("generation")
+        with span("rag.build_prompt") as current:
+            context = parse_docs(retrieved)
+            inputs = {"context": context, "question": question}
+            # build_prompt returns a template, rendered with the same inputs like RunnableLambda does
+            prompt = build_prompt(inputs).invoke(inputs)
+            current.set_attributes({
+                "texts": len(context["texts"]),
+                "images": len(context["images"]),
+                "text_chars": sum(len(text) for text in context["texts"]),
+                "image_bytes": sum(len(image) for image in context["images"]),
+            })
+        generation = self.model | StrOutputParser()
+        try:
+            return generation.invoke(prompt), "chain"
+        except Exception as e:
+            if not self.sql_service.settings.extractive_fallback:
+                raise
+            self.logger.error(f"Chat model unavailable, answering with retrieved passages: {e}")
+            docs = [doc for page_docs in retrieved["result"].values() for doc in page_docs]
+            return extractive_answer(docs), "extractive"
+    
+    def answer_with_sources(self, file_id: str, question: str, retriever: Runnable = None) -> tuple[str, list[str], str]:
+        """The get_chain pipeline run in two steps, so the pages and boxes of the retrieved elements can be returned."""
+        retriever = retriever or self.get_retriever(file_id)
+        retrieved = retriever.invoke(question)
+        docs = [doc for page_docs in retrieved["result"].values() for doc in page_docs]
+        
+        answer, path = self.generate_answer(question, retrieved)
+        return answer, locations_from_documents(docs), path
+    
     def run_chain(self, file_id, question: str) -> str:
-        chain = self.get_chain(str(file_id))
-        response = chain.invoke(question)
-        return response
\ No newline at end of file
+        return self.run_chain_with_sources(file_id, question)[0]
+    
+    def answer_before_retrieval(self, file_id, question: str) -> tuple[str, list[str], str]:
+        """(answer, locations, path) from the fields, summary tree or tables, None when the question needs retrieval."""
+        settings = self.sql_service.settings
+        if settings.field_answers:
+            result = self.answer_from_fields(file_id, question)
+            if result is not None:
+                return result[0], result[1], "fields"
+        try:
+            if settings.summary_tree:
+                answer = self.answer_from_summary_tree(file_id, question)
+                if answer is not None:
+                    return answer, [], "summary"
+            if settings.table_engine:
+                answer = self.answer_from_tables(str(file_id), question)
+                if answer is not None:
+                    return answer, [], "tables"
+                self.path_stats.miss("tables")
+        except CircuitOpen as e:
+            # Both paths phrase their answer with the chat model, the chain still has the extractive fallback
+            self.logger.info(f"Skipping the summary and table paths: {e}")
+        return None
+    
+    def run_chain_with_sources(self, file_id, question: str) -> tuple[str, list[str]]:
+        """Answer and the source locations known for it, trying the cheap paths before the full chain."""
+        key = (str(file_id), normalize_question(question))
+        
+        def compute():
+            start = time.perf_counter()
+            with span("rag.answer", file_id=file_id, question_chars=len(question)) as current:
+                result = self.answer_before_retrieval(file_id, question)
+                if result is not None:
+                    answer, locations, path = result
+                else:
+                    answer, locations, path = self.answer_with_sources(str(file_id), question)
+                current.set_attributes({"path": path, "locations": len(locations), "answer_chars": len(answer or "")})
+            self.path_stats.record(path, time.perf_counter() - start)
+            return answer, locations
+        
+        answer, locations = self.single_flight.do(key, compute)
+        return answer, locations
+    
+    def run_batch(self, file_id, questions: list[str], max_concurrency: int = None) -> dict:
+        """Answer several questions about one document, sharing the embedding call, the hydration query and the model.
+
+        Questions answered by the cheap paths skip retrieval. The others are
+        embedded in one call, searched concurrently (one search per pooled
+        vector DB connection), the union of their chunks is hydrated in one
+        query, and answers are generated max_concurrency at a time.
+        Per-question timings are in milliseconds; shared stages (embed,
+        hydrate) are reported once for the batch.
+        """
+        if not questions:
+            return {"results": [], "timings": {}}
+        settings = self.sql_service.settings
+        max_concurrency = max(max_concurrency or settings.batch_max_concurrency, 1)
+        timer = StageTimer()
+        batch_start = time.perf_counter()
+        results = [{"question": question, "answer": None, "location": [], "path": None, "timings": {}} for question in questions]
+        
+        def elapsed_ms(start: float) -> float:
+            return round((time.perf_counter() - start) * 1000, 3)
+        
+        # Cheap paths first, concurrently since the summary and table paths still make a (small) model call
+        def before_retrieval(i):
+            start = time.perf_counter()
+            result = self.answer_before_retrieval(file_id, questions[i])
+            results[i]["timings"]["before_retrieval"] = elapsed_ms(start)
+            if result is not None:
+                results[i]["answer"], results[i]["location"], results[i]["path"] = result
+                self.path_stats.record(result[2], time.perf_counter() - start)
+        
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(questions))) as pool, timer.stage("before_retrieval"):
+            list(pool.map(bind_context(before_retrieval), range(len(questions))))
+        pending = [i for i, result in enumerate(results) if result["path"] is None]
+        
+        if pending:
+            retriever = self.get_retriever(str(file_id))
+            check_deadline("embedding")
+            with timer.stage("embed"):
+                query_embeddings = self.embeddings.embed_documents([questions[i] for i in pending])
+            
+            def search(item):
+                i, query_embedding = item
+                start = time.perf_counter()
+                filtered = retriever.search(questions[i], query_embedding)
+                results[i]["timings"]["search"] = elapsed_ms(start)
+                return filtered
+            
+            with ThreadPoolExecutor(max_workers=min(max(settings.vector_pool_size, 1), len(pending))) as pool, timer.stage("search"):
+                searched = list(pool.map(bind_context(search), zip(pending, query_embeddings)))
+            
+            check_deadline("hydration")
+            with timer.stage("hydrate"):
+                chunk_ids = {doc.metadata[self.id_key] for filtered in searched for doc in filtered}
+                chunks = self.sql_service.get_original_chunks(list(chunk_ids))
+            
+            def generate(item):
+                i, filtered = item
+                start = time.perf_counter()
+                retrieved = retriever.assemble(questions[i], filtered, chunks)
+                docs = [doc for page_docs in retrieved["result"].values() for doc in page_docs]
+                try:
+                    answer, path = self.generate_answer(questions[i], retrieved)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    # One failed generation does not fail the other answers of the batch
+                    self.logger.error(f"Error answering batch question {i} for file {file_id}: {e}")
+                    results[i]["path"] = "error"
+                    results[i]["timings"]["generate"] = elapsed_ms(start)
+                    return
+                results[i]["answer"], results[i]["location"], results[i]["path"] = answer, locations_from_documents(docs), path
+                results[i]["timings"]["generate"] = elapsed_ms(start)
+                # Chain latency of one question: its own search and generation plus the shared embed and hydrate stages
+                seconds = (results[i]["timings"]["search"] + results[i]["timings"]["generate"]) / 1000 + timer.timings["embed"] + timer.timings["hydrate"]
+                self.path_stats.record(path, seconds)
+            
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending))) as pool, timer.stage("generate"):
+                list(pool.map(bind_context(generate), zip(pending, searched)))
+        
+        metrics.observe_stages("batch", timer.timings)
+        shared_ms = sum(timer.timings.get(name, 0.0) for name in ("embed", "hydrate")) * 1000
+        for i, result in enumerate(results):
+            result["timings"]["total"] = round(sum(result["timings"].values()) + (shared_ms if i in pending else 0.0), 3)
+        self.logger.info(
+            f"Batch of {len(questions)} questions for file {file_id}: {len(pending)} retrieved, "
+            f"{len(questions) - len(pending)} answered before retrieval in {time.perf_counter() - batch_start:.2f}s"
+        )
+        return {
+            "results": results,
+            "timings": {name: round(seconds * 1000, 3) for name, seconds in timer.timings.items()},
+        }
+    
+    def run_chain_for_documents(self, question: str, file_ids: list = None, chat_id: int = None) -> tuple[str, dict[str, list[str]]]:
+        """Answer from several documents at once, either an explicit list or every document of a chat.
+
+        Returns the answer and the locations of the retrieved elements per document ID.
+        """
+        if file_ids is None:
+            file_ids = self.sql_service.get_chat_document_ids(chat_id)
+        file_ids = sorted({str(file_id) for file_id in file_ids})
+        key = (tuple(file_ids), normalize_question(question))
+        
+        def compute():
+            retrieved = self.get_multi_document_retriever(file_ids).invoke(question)
+            docs = [doc for page_docs in retrieved["result"].values() for doc in page_docs]
+            answer, _ = self.generate_answer(question, retrieved)
+            return answer, locations_by_document(docs)
+        
+        answer, locations = self.single_flight.do(key, compute)
+        return answer, locations
\ No newline at end of file
@@ -1,18 +1,110 @@
 from urllib.parse import urlparse
 import os 
+import threading
+from contextlib import contextmanager
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
 from logging import Logger
 from app.entities.DocumentEntity import DocumentEntity
+from app.settings import ServiceSettings
+from app.helpers.admission import DeadlineExceeded, current_deadline
+from app.helpers.tracing import span
+from app.helpers.metrics import record_query
 import json
-from app.config import DATABASE_URL, PG_VECTOR_CONNECTION_STRING
+
+# Out of time for the current request: propagated instead of logged and turned into an empty result,
+# which callers would otherwise take for "no rows"
+DEADLINE_ERRORS = (DeadlineExceeded, psycopg2.errors.QueryCanceled)
+
+PAGE_FINGERPRINTS_DDL = """
+    CREATE TABLE IF NOT EXISTS public.rag_page_fingerprints (
+        document_id BIGINT NOT NULL,
+        page_number INTEGER NOT NULL,
+        fingerprint CHAR(64) NOT NULL,
+        PRIMARY KEY (document_id, page_number)
+    )
+"""
+
+# Shared across documents, the same logo or signature is described once. Keyed on the sha256 of the
+# pixels: the first version keyed it on the dHash, which look-alike images share, and is dropped
+IMAGE_SUMMARIES_DDL = """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'rag_image_summaries' AND column_name = 'image_hash'
+        ) THEN
+            DROP TABLE public.rag_image_summaries;
+        END IF;
+    END $$;
+    CREATE TABLE IF NOT EXISTS public.rag_image_summaries (
+        content_hash CHAR(64) PRIMARY KEY,
+        summary TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+# Tables parsed into typed columns at ingest, see app.helpers.table_frames
+TABLE_FRAMES_DDL = """
+    CREATE TABLE IF NOT EXISTS public.rag_table_frames (
+        document_id BIGINT NOT NULL,
+        chunk_id TEXT NOT NULL,
+        page_number INTEGER,
+        frame JSONB NOT NULL,
+        PRIMARY KEY (document_id, chunk_id)
+    )
+"""
+
+# Common invoice fields extracted at ingest, answered without retrieval, see app.helpers.field_extraction
+DOCUMENT_FIELDS_DDL = """
+    CREATE TABLE IF NOT EXISTS public.rag_document_fields (
+        document_id BIGINT NOT NULL,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        raw_text TEXT,
+        page_number INTEGER,
+        coordinates JSONB,
+        confidence REAL,
+        PRIMARY KEY (document_id, field)
+    )
+"""
+
+# Section (level 1) and document (level 2) summaries built over the chunk summaries at ingest
+SUMMARY_TREE_DDL = """
+    CREATE TABLE IF NOT EXISTS public.rag_summary_tree (
+        document_id BIGINT NOT NULL,
+        level SMALLINT NOT NULL,
+        position INTEGER NOT NULL,
+        page_start INTEGER,
+        page_end INTEGER,
+        summary TEXT NOT NULL,
+        children JSONB,
+        PRIMARY KEY (document_id, level, position)
+    )
+"""
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Counts the statements of the current request or task for the rag_db_queries_per_request metric."""
+    def execute(self, query, vars=None):
+        record_query()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        record_query()
+        return super().executemany(query, vars_list)
 
 class SQLService:
-    def __init__(self, logger: Logger):
+    def __init__(self, logger: Logger, settings: ServiceSettings = None):
         self.logger = logger
-        self.db_config = self._get_db_config(DATABASE_URL)
-        print(f"Database config: {self.db_config}")
-        self.vector_db_config = self._get_db_config(PG_VECTOR_CONNECTION_STRING)
-        print(f"Vector database config: {self.vector_db_config}")
+        self.settings = settings or ServiceSettings.local()
+        self.db_config = self._get_db_config(self.settings.database_url)
+        self.vector_db_config = self._get_db_config(self.settings.vector_database_url)
+        
+        # Pools are created on first use so forked workers never share a socket
+        self._pools = {}
+        self._pools_lock = threading.Lock()
 
     def _get_db_config(self, conn_string: str):
         url = urlparse(conn_string)
@@ -21,12 +113,92 @@ class SQLService:
             "user": url.username,
             "password": url.password,
             "host": url.hostname,
-            "port": url.port
+            "port": url.port,
+            "cursor_factory": CountingCursor,
         }
 
+    def _get_pool(self, name: str, db_config: dict, pool_size: int):
+        if pool_size <= 0:
+            return None, None
+        entry = self._pools.get(name)
+        if entry is None:
+            with self._pools_lock:
+                entry = self._pools.get(name)
+                if entry is None:
+                    # The semaphore makes callers wait for a free connection instead of raising PoolError
+                    entry = (ThreadedConnectionPool(1, pool_size, **db_config), threading.BoundedSemaphore(pool_size))
+                    self._pools[name] = entry
+        return entry
+
+    @contextmanager
+    def connection(self, vector_db: bool = False):
+        """Yield a connection inside a transaction: committed on success, rolled back on error.
+
+        Connections come from a pool when settings allow it, otherwise a new
+        connection is opened and closed around the block.
+        """
+        if vector_db:
+            pool, slots = self._get_pool('vector', self.vector_db_config, self.settings.vector_pool_size)
+        else:
+            pool, slots = self._get_pool('db', self.db_config, self.settings.db_pool_size)
+        
+        if pool is None:
+            conn = psycopg2.connect(**(self.vector_db_config if vector_db else self.db_config))
+            try:
+                with conn:
+                    self._apply_deadline(conn)
+                    yield conn
+            finally:
+                conn.close()
+            return
+        
+        with slots:
+            conn = pool.getconn()
+            if conn.closed:
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            broken = False
+            try:
+                with conn:
+                    self._apply_deadline(conn)
+                    yield conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                # A statement cancelled by the deadline leaves a healthy connection
+                broken = not isinstance(e, psycopg2.errors.QueryCanceled)
+                raise
+            finally:
+                pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def _apply_deadline(self, conn):
+        """Bound the statements of this transaction by the time left to the current request, if it has a deadline."""
+        deadline = current_deadline()
+        if deadline is None:
+            return
+        deadline.check("database")
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (max(int(deadline.remaining() * 1000), 1),))
+
+    def validate_connection(self) -> bool:
+        """Round trip on a reused connection, dropping the pool if the server closed it."""
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            self.logger.info(f"Stale database connection, reconnecting: {e}")
+            self.close()
+            return False
+
+    def close(self):
+        with self._pools_lock:
+            for pool, _ in self._pools.values():
+                pool.closeall()
+            self._pools = {}
+
     def execute_query(self, query, params=None, commit=False, fetchone=False, fetchall=False):
         try:
-            with psycopg2.connect(**self.db_config) as connection:
+            with self.connection() as connection, span("db.query", statement=" ".join(query.split())[:120]) as current:
                 with connection.cursor() as cur:
                     cur.execute(query, params)
 
@@ -38,19 +210,23 @@ class SQLService:
                         return cur.fetchone()
 
                     if fetchall:
-                        return cur.fetchall()
+                        rows = cur.fetchall()
+                        current.set("rows", len(rows))
+                        return rows
+        except DEADLINE_ERRORS:
+            raise
         except Exception as e:
             self.logger.error(f"An error occurred while executing the query: {e}")
             return None
 
-    def test(self, query, params=None, commit=False):
-        return self.execute_query(query, params, commit)
+    def test(self, query, params=None, commit=False, fetchone=False, fetchall=False):
+        return self.execute_query(query, params, commit, fetchone, fetchall)
 
     def convert_to_pdf(self, file_id: int):
         from app.services.FileService import FileService
-        file_service = FileService(self.logger)
+        file_service = FileService(self.logger, self, None)
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self.connection() as conn:
                 conn.autocommit = False
                 with conn.cursor() as cur:
                     cur.execute("SELECT content FROM documents WHERE id = %s", (file_id,))
@@ -78,13 +254,15 @@ class SQLService:
                     """, (pdf_oid, file_id))
                 conn.commit()
                 return pdf_oid
+        except DEADLINE_ERRORS:
+            raise
         except Exception as e:
             self.logger.error(f"Error converting file with ID {file_id} to PDF: {e}")
             return None
 
     def download_file_by_id(self, file_id: int):
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT content, name, type FROM documents WHERE id = %s", (file_id,))
                     row = cur.fetchone()
@@ -97,19 +275,21 @@ class SQLService:
 
                     name = row[1]
                     type = row[2]
-                    path = os.path.join(os.getcwd(), 'downloads', f"{file_id}.{type}")
+                    path = os.path.join(self.settings.download_dir, f"{file_id}.{type}")
                     os.makedirs(os.path.dirname(path), exist_ok=True)
                     with open(path, 'wb') as f:
                         f.write(file_data)
                     self.logger.info(f"File with ID {file_id} downloaded to {path}")
                     return path, name
+        except DEADLINE_ERRORS:
+            raise
         except Exception as e:
             self.logger.error(f"Error downloading file with ID {file_id} to local storage: {e}")
             return None
 
     def get_file_by_id(self, file_id: int) -> DocumentEntity:
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT * FROM documents WHERE id = %s", (file_id,))
                     row = cur.fetchone()
@@ -122,10 +302,12 @@ class SQLService:
                     large_object.close()
 
                     from app.services.FileService import FileService
-                    file_service = FileService(self.logger)
+                    file_service = FileService(self.logger, self, None)
                     file_service.doc_to_pdf(file_data)
 
                     return entity
+        except DEADLINE_ERRORS:
+            raise
         except Exception as e:
             self.logger.error(f"Error retrieving file with ID {file_id}: {e}")
             return None
@@ -140,6 +322,8 @@ class SQLService:
                 """
                 params = (chunk_ids[idx], file_id, chunk_type, content_json)
                 self.execute_query(query, params, commit=True)
+            except DEADLINE_ERRORS:
+                raise
             except Exception as e:
                 self.logger.error(f"Error saving {chunk_type} chunk {idx} for file ID {file_id}: {e}")
                 continue
@@ -159,19 +343,320 @@ class SQLService:
                 """
                 params = (image_ids[idx], file_id, 'image', json.dumps(img_elm.to_dict()))
                 self.execute_query(query, params, commit=True)
+            except DEADLINE_ERRORS:
+                raise
             except Exception as e:
                 self.logger.error(f"Error saving image chunk {idx} for file ID {file_id}: {e}")
                 continue
             
+    def get_original_chunks(self, chunk_ids: list[str]) -> dict[str, tuple]:
+        """Fetch many chunks in one round trip: chunk_id -> (document_id, type, content)."""
+        if not chunk_ids:
+            return {}
+        # Compared as uuids, casting the column to text would rule out its primary key index
+        rows = self.execute_query(
+            "SELECT chunk_id::text, document_id, type, content FROM public.rag_original_chunks WHERE chunk_id = ANY(%s::uuid[])",
+            (list(chunk_ids),),
+            fetchall=True
+        )
+        return {row[0]: (row[1], row[2], row[3]) for row in rows or []}
+
+    def get_chat_document_ids(self, chat_id: int) -> list[int]:
+        rows = self.execute_query(
+            "SELECT id FROM public.documents WHERE chat_id = %s AND deleted_at IS NULL",
+            (chat_id,),
+            fetchall=True
+        )
+        return [row[0] for row in rows or []]
+
+    def search_embeddings(self, collection_names: list[str], query_embedding: list[float], k: int) -> list[tuple]:
+        """Single ANN query across several PGVector collections: [(chunk_id, summary, cosine distance)]."""
+        vector = "[" + ",".join(str(x) for x in query_embedding) + "]"
+        try:
+            with self.connection(vector_db=True) as conn, span("db.vector_search", collections=len(collection_names), k=k):
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT e.cmetadata->>'chunk_id', e.document, e.embedding <=> %s::vector AS distance
+                        FROM public.langchain_pg_embedding e
+                        JOIN public.langchain_pg_collection c ON c.uuid = e.collection_id
+                        WHERE c.name = ANY(%s)
+                        ORDER BY distance
+                        LIMIT %s
+                    """, (vector, list(collection_names), k))
+                    return cur.fetchall()
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error searching embeddings across {len(collection_names)} collections: {e}")
+            return []
+
+    def get_collection_embeddings(self, collection_name: str, limit: int) -> list[tuple]:
+        """Up to limit rows of one PGVector collection: [(chunk_id, summary, embedding as a float list)]."""
+        with self.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT e.cmetadata->>'chunk_id', e.document, e.embedding::real[]
+                    FROM public.langchain_pg_embedding e
+                    JOIN public.langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = %s
+                    LIMIT %s
+                """, (str(collection_name), limit))
+                return cur.fetchall()
+
+    def ensure_page_fingerprints_table(self):
+        if not getattr(self, "_page_fingerprints_ready", False):
+            self.execute_query(PAGE_FINGERPRINTS_DDL, commit=True)
+            self._page_fingerprints_ready = True
+
+    def save_page_fingerprints(self, file_id: int, fingerprints: list[str]):
+        """Replace the stored fingerprints of a document (fingerprints[0] is page 1)."""
+        self.ensure_page_fingerprints_table()
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM public.rag_page_fingerprints WHERE document_id = %s", (file_id,))
+                    cur.executemany(
+                        "INSERT INTO public.rag_page_fingerprints (document_id, page_number, fingerprint) VALUES (%s, %s, %s)",
+                        [(file_id, page_number, fingerprint) for page_number, fingerprint in enumerate(fingerprints, start=1)]
+                    )
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error saving page fingerprints for file ID {file_id}: {e}")
+
+    def get_page_fingerprints(self, file_id: int) -> dict[int, str]:
+        self.ensure_page_fingerprints_table()
+        rows = self.execute_query(
+            "SELECT page_number, fingerprint FROM public.rag_page_fingerprints WHERE document_id = %s",
+            (file_id,),
+            fetchall=True
+        )
+        return {row[0]: row[1] for row in rows or []}
+
+    def ensure_image_summaries_table(self):
+        if not getattr(self, "_image_summaries_ready", False):
+            self.execute_query(IMAGE_SUMMARIES_DDL, commit=True)
+            self._image_summaries_ready = True
+
+    def get_image_summaries(self, content_hashes: list[str]) -> dict[str, str]:
+        """Stored summaries by the sha256 content hash of their image."""
+        if not content_hashes:
+            return {}
+        self.ensure_image_summaries_table()
+        rows = self.execute_query(
+            "SELECT content_hash, summary FROM public.rag_image_summaries WHERE content_hash = ANY(%s)",
+            (list(content_hashes),),
+            fetchall=True
+        )
+        return {row[0]: row[1] for row in rows or []}
+
+    def save_image_summaries(self, summaries: dict[str, str]):
+        if not summaries:
+            return
+        self.ensure_image_summaries_table()
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        "INSERT INTO public.rag_image_summaries (content_hash, summary) VALUES (%s, %s) ON CONFLICT (content_hash) DO NOTHING",
+                        list(summaries.items())
+                    )
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error saving {len(summaries)} image summaries: {e}")
+
+    def ensure_table_frames_table(self):
+        if not getattr(self, "_table_frames_ready", False):
+            self.execute_query(TABLE_FRAMES_DDL, commit=True)
+            self._table_frames_ready = True
+
+    def save_table_frames(self, file_id: int, frames: list[tuple]):
+        """frames: [(chunk_id, page_number, frame dict)]."""
+        if not frames:
+            return
+        self.ensure_table_frames_table()
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO public.rag_table_frames (document_id, chunk_id, page_number, frame) VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (document_id, chunk_id) DO UPDATE SET page_number = EXCLUDED.page_number, frame = EXCLUDED.frame
+                        """,
+                        [(file_id, chunk_id, page_number, json.dumps(frame)) for chunk_id, page_number, frame in frames]
+                    )
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error saving table frames for file ID {file_id}: {e}")
+
+    def get_table_frames(self, file_id: int) -> list[tuple]:
+        """[(chunk_id, page_number, frame dict)] of a document."""
+        self.ensure_table_frames_table()
+        rows = self.execute_query(
+            "SELECT chunk_id, page_number, frame FROM public.rag_table_frames WHERE document_id = %s ORDER BY page_number, chunk_id",
+            (file_id,),
+            fetchall=True
+        )
+        return rows or []
+
+    def ensure_document_fields_table(self):
+        if not getattr(self, "_document_fields_ready", False):
+            self.execute_query(DOCUMENT_FIELDS_DDL, commit=True)
+            self._document_fields_ready = True
+
+    def save_document_fields(self, file_id: int, fields: list[dict]):
+        """Upsert extracted fields (ExtractedField.to_dict() rows) of a document."""
+        if not fields:
+            return
+        self.ensure_document_fields_table()
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO public.rag_document_fields (document_id, field, value, raw_text, page_number, coordinates, confidence)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (document_id, field) DO UPDATE SET
+                            value = EXCLUDED.value, raw_text = EXCLUDED.raw_text, page_number = EXCLUDED.page_number,
+                            coordinates = EXCLUDED.coordinates, confidence = EXCLUDED.confidence
+                        """,
+                        [
+                            (file_id, f["field"], f["value"], f["raw_text"], f["page_number"], json.dumps(f["coordinates"]), f["confidence"])
+                            for f in fields
+                        ]
+                    )
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error saving document fields for file ID {file_id}: {e}")
+
+    def get_document_field(self, file_id: int, field: str) -> tuple:
+        """(value, page_number, coordinates, confidence) of one extracted field, None if it was not found at ingest."""
+        self.ensure_document_fields_table()
+        return self.execute_query(
+            "SELECT value, page_number, coordinates, confidence FROM public.rag_document_fields WHERE document_id = %s AND field = %s",
+            (file_id, field),
+            fetchone=True
+        )
+
+    def delete_document_fields(self, file_id: int, page_numbers: set[int] = None, keep_fields: list[str] = None):
+        """Delete the extracted fields of a document, or only those found on the given pages, except keep_fields."""
+        self.ensure_document_fields_table()
+        if page_numbers is None:
+            self.execute_query("DELETE FROM public.rag_document_fields WHERE document_id = %s", (file_id,), commit=True)
+        else:
+            self.execute_query(
+                "DELETE FROM public.rag_document_fields WHERE document_id = %s AND page_number = ANY(%s) AND NOT field = ANY(%s)",
+                (file_id, list(page_numbers), list(keep_fields or [])),
+                commit=True
+            )
+
+    def get_collection_summaries(self, collection_name: str) -> list[tuple]:
+        """[(chunk_id, summary)] of one PGVector collection."""
+        with self.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT e.cmetadata->>'chunk_id', e.document
+                    FROM public.langchain_pg_embedding e
+                    JOIN public.langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = %s
+                """, (str(collection_name),))
+                return cur.fetchall()
+
+    def ensure_summary_tree_table(self):
+        if not getattr(self, "_summary_tree_ready", False):
+            self.execute_query(SUMMARY_TREE_DDL, commit=True)
+            self._summary_tree_ready = True
+
+    def save_summary_tree(self, file_id: int, nodes: list):
+        """Replace the summary tree of a document with SummaryNode rows."""
+        self.ensure_summary_tree_table()
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM public.rag_summary_tree WHERE document_id = %s", (file_id,))
+                    cur.executemany(
+                        """
+                        INSERT INTO public.rag_summary_tree (document_id, level, position, page_start, page_end, summary, children)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        [
+                            (file_id, node.level, node.position, node.page_start, node.page_end, node.summary, json.dumps(node.children))
+                            for node in nodes
+                        ]
+                    )
+        except DEADLINE_ERRORS:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error saving summary tree for file ID {file_id}: {e}")
+
+    def get_summary_tree(self, file_id: int, min_level: int = 1) -> list[tuple]:
+        """[(level, position, page_start, page_end, summary)], document first, then sections in order."""
+        self.ensure_summary_tree_table()
+        rows = self.execute_query(
+            """
+            SELECT level, position, page_start, page_end, summary FROM public.rag_summary_tree
+            WHERE document_id = %s AND level >= %s ORDER BY level DESC, position
+            """,
+            (file_id, min_level),
+            fetchall=True
+        )
+        return rows or []
+
+    def get_chunk_pages(self, file_id: int) -> dict[str, set[int]]:
+        """Map every stored chunk of a document to the pages its elements come from."""
+        rows = self.execute_query(
+            "SELECT chunk_id, type, content FROM public.rag_original_chunks WHERE document_id = %s",
+            (file_id,),
+            fetchall=True
+        )
+        chunk_pages = {}
+        for chunk_id, chunk_type, content in rows or []:
+            elements = json.loads(content)
+            if chunk_type == 'image':
+                elements = [elements]
+            chunk_pages[str(chunk_id)] = {elm.get("metadata", {}).get("page_number", 1) for elm in elements}
+        return chunk_pages
+
+    def delete_chunks(self, file_id: int, chunk_ids: list[str]):
+        """Delete chunks from rag_original_chunks and their embeddings from the vector store."""
+        if not chunk_ids:
+            return
+        self.ensure_table_frames_table()
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM public.rag_original_chunks WHERE document_id = %s AND chunk_id = ANY(%s::uuid[])",
+                    (file_id, list(chunk_ids))
+                )
+                cur.execute(
+                    "DELETE FROM public.rag_table_frames WHERE document_id = %s AND chunk_id = ANY(%s)",
+                    (file_id, list(chunk_ids))
+                )
+        with self.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM public.langchain_pg_embedding
+                    WHERE collection_id = (
+                        SELECT uuid FROM public.langchain_pg_collection WHERE name = %s
+                    )
+                    AND cmetadata->>'chunk_id' = ANY(%s)
+                """, (str(file_id), list(chunk_ids)))
+            self.delete_consolidated_embeddings(file_id, conn, chunk_ids)
+
     def is_processed(self, file_id: int) -> bool:
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT * FROM rag_original_chunks WHERE document_id = %s", (file_id,))
                     row = cur.fetchone()
                     if row and row[0]:
                         return True
             return False
+        except DEADLINE_ERRORS:
+            raise
         except Exception as e:
             self.logger.error(f"Error checking if file with ID {file_id} is processed: {e}")
             return False
@@ -190,27 +675,55 @@ class SQLService:
             cur.execute("DELETE FROM public.langchain_pg_collection WHERE name = %s", (str(file_id),))
 
 
+    def delete_consolidated_embeddings(self, file_id: int, conn, chunk_ids: list[str] = None, table: str = "public.rag_embeddings"):
+        """Delete from the consolidated table whatever the current layout, a migrated or switched back deployment
+        has rows in both. Nothing to do when the table was never created."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0] is None:
+                return
+            # document_id prunes the delete to a single hash partition
+            if chunk_ids is None:
+                cur.execute(f"DELETE FROM {table} WHERE document_id = %s", (int(file_id),))
+            else:
+                cur.execute(f"DELETE FROM {table} WHERE document_id = %s AND chunk_id = ANY(%s)", (int(file_id), list(chunk_ids)))
+
     def delete_document_data(self, file_id: int, conn):
         with conn.cursor() as cur:
             # Delete RAG chunks
             cur.execute("DELETE FROM public.rag_original_chunks WHERE document_id = %s", (file_id,))
             
+            # Delete page fingerprints
+            cur.execute("DELETE FROM public.rag_page_fingerprints WHERE document_id = %s", (file_id,))
+            
+            # Delete parsed tables and extracted fields
+            cur.execute("DELETE FROM public.rag_table_frames WHERE document_id = %s", (file_id,))
+            cur.execute("DELETE FROM public.rag_document_fields WHERE document_id = %s", (file_id,))
+            cur.execute("DELETE FROM public.rag_summary_tree WHERE document_id = %s", (file_id,))
+            
             # Delete document
             cur.execute("DELETE FROM public.documents WHERE id = %s", (file_id,))
 
 
     def delete_by_id(self, file_id: int):
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            self.ensure_page_fingerprints_table()
+            self.ensure_table_frames_table()
+            self.ensure_document_fields_table()
+            self.ensure_summary_tree_table()
+            with self.connection() as conn:
                 self.delete_document_data(file_id, conn)
                 conn.commit()
 
-            with psycopg2.connect(**self.vector_db_config) as conn:
+            with self.connection(vector_db=True) as conn:
                 self.delete_langchain_data(file_id, conn)
+                self.delete_consolidated_embeddings(file_id, conn)
                 conn.commit()
 
             self.logger.info(f"All data related to file ID {file_id} deleted successfully.")
             return True
+        except DEADLINE_ERRORS:
+            raise
         except Exception as e:
             self.logger.error(f"Error deleting all data for file ID {file_id}: {e}")
             return False
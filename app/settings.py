@@ -0,0 +1,178 @@
+import os
+from dataclasses import dataclass, replace
+from app import config
+
+@dataclass
+class ServiceSettings:
+    """Runtime configuration shared by the Flask app, Celery workers and the Lambda.
+
+    The services only read from this object, so every runtime runs the same
+    code path and differs only in where it connects, where it writes files
+    and how many connections it keeps open.
+    """
+    database_url: str
+    vector_database_url: str
+    download_dir: str
+    log_dir: str = 'logs'
+    log_format: str = 'text'  # 'text' or 'json' (one JSON object per line)
+    log_capture_size: int = 1000  # latest records kept in memory by the log capture
+    log_async: bool = True  # file and console writes on a listener thread instead of the calling thread
+    log_queue_size: int = 10000  # records waiting for the listener, further ones are dropped and counted
+    db_pool_size: int = 5  # 0 opens a new connection per query
+    vector_pool_size: int = 5
+    partition_cache_dir: str = os.path.join('cache', 'partitions')
+    partition_cache_max_bytes: int = 0  # 0 disables the per-page partition cache
+    vector_layout: str = 'collection'  # 'collection' (one PGVector collection per file) or 'consolidated'
+    embedding_partitions: int = 16  # hash partitions of the consolidated embeddings table
+    ann_dimensions: int = 0  # >0 searches a truncated/quantized copy first, then rescores with full vectors
+    ann_type: str = 'halfvec'  # 'vector', 'halfvec' or 'bit'
+    ann_oversample: int = 4
+    ann_index: bool = False  # HNSW index on the ANN column, useful for searches across many documents
+    vector_cache_max_bytes: int = 0  # 0 disables the in-process embedding matrices of small documents
+    vector_cache_max_chunks: int = 256  # larger documents are always searched in Postgres
+    vector_cache_dtype: str = 'float32'  # or 'float16' to halve the memory
+    vector_cache_ttl: int = 300  # seconds, bounds staleness after another process re-ingests a document
+    reranker: str = 'none'  # 'none', 'lexical' or 'cross-encoder', rescoring retrieved chunks on their original content
+    rerank_model: str = None  # cross-encoder model name, sentence-transformers default when unset
+    rerank_top_n: int = 3  # chunks passed on to the prompt after reranking
+    rerank_overfetch: int = 3  # vector candidates fetched per final chunk
+    rerank_budget_ms: int = 200  # batches not started by then keep their vector order, 0 for no limit
+    summary_min_tokens: int = 256  # shorter chunks are embedded as they are, 0 summarizes every chunk
+    summary_max_numeric_ratio: float = 0.5  # text chunks with at least this share of numeric words are embedded as they are
+    image_min_side: int = 40  # pixels, smaller images (icons, rules) are not summarized
+    image_min_entropy: float = 1.5  # bits, flatter images (separators, blank boxes) are not summarized
+    image_max_distance: int = 4  # dHash bits, closer images in one document are duplicates
+    table_engine: bool = False  # answer lookup/aggregate questions from the parsed table frames before retrieval
+    field_answers: bool = True  # answer total/due date/invoice number... questions from the fields extracted at ingest
+    summary_tree: bool = True  # build section/document summaries at ingest and answer whole-document questions from them
+    summary_section_tokens: int = 2000  # chunk summaries grouped into one section summary
+    page_render_dir: str = os.path.join('cache', 'pages')
+    page_render_max_bytes: int = 0  # disk budget of rendered page PNGs, 0 keeps renders in memory only
+    page_render_dpi: int = 110
+    page_render_memory_pages: int = 32
+    batch_max_questions: int = 20  # questions accepted by one /ask/batch request
+    batch_max_concurrency: int = 4  # answers of one batch generated at the same time
+    ask_max_concurrent: int = 8  # questions answered at once per process, the rest wait in the queue
+    ask_max_queue: int = 16  # waiting questions beyond this are shed with a 503
+    ask_max_wait_ms: int = 2000  # longest wait for a slot before being shed
+    ask_deadline_ms: int = 30000  # default and maximum deadline of a question, clients may ask for less
+    ask_min_remaining_ms: int = 1000  # questions admitted with less time left are shed instead of started
+    llm_timeout: float = 60.0  # seconds, per chat model request
+    embedding_timeout: float = 20.0  # seconds, per embedding request
+    llm_max_retries: int = 2
+    breaker_window: int = 20  # last provider calls the error and slow rates are computed over
+    breaker_min_calls: int = 5
+    breaker_error_rate: float = 0.5
+    breaker_slow_call_ms: int = 15000
+    breaker_slow_rate: float = 0.8
+    breaker_open_seconds: float = 30.0  # refusing calls for this long before a half-open probe
+    extractive_fallback: bool = True  # answer with the top retrieved passages while the chat model is unavailable
+    fake_models: bool = False  # deterministic local chat model and embeddings, see app.helpers.fake_models
+    fake_model_latency_ms: int = 0
+    fake_model_error_rate: float = 0.0
+    tracing: str = 'none'  # 'none', 'log' (JSON span lines) or 'otel' (OpenTelemetry tracer)
+    metrics: bool = False  # Prometheus metrics at /metrics, set PROMETHEUS_MULTIPROC_DIR for Celery and gunicorn workers
+
+    @classmethod
+    def local(cls) -> "ServiceSettings":
+        """Flask and Celery running next to the database."""
+        return cls(
+            database_url=config.DATABASE_URL,
+            vector_database_url=config.PG_VECTOR_CONNECTION_STRING,
+            download_dir=os.getenv("DOWNLOAD_DIR", os.path.join(os.getcwd(), 'downloads')),
+            log_dir=os.getenv("LOG_DIR", 'logs'),
+            log_format=os.getenv("LOG_FORMAT", 'text'),
+            log_capture_size=int(os.getenv("LOG_CAPTURE_SIZE", 1000)),
+            log_async=os.getenv("LOG_ASYNC", "true").lower() == "true",
+            log_queue_size=int(os.getenv("LOG_QUEUE_SIZE", 10000)),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+            vector_pool_size=int(os.getenv("VECTOR_DB_POOL_SIZE", 5)),
+            partition_cache_dir=os.getenv("PARTITION_CACHE_DIR", os.path.join(os.getcwd(), 'cache', 'partitions')),
+            partition_cache_max_bytes=int(os.getenv("PARTITION_CACHE_MAX_BYTES", 2 * 1024 ** 3)),
+            vector_layout=os.getenv("VECTOR_LAYOUT", 'collection'),
+            embedding_partitions=int(os.getenv("EMBEDDING_PARTITIONS", 16)),
+            ann_dimensions=int(os.getenv("ANN_DIMENSIONS", 0)),
+            ann_type=os.getenv("ANN_TYPE", 'halfvec'),
+            ann_oversample=int(os.getenv("ANN_OVERSAMPLE", 4)),
+            ann_index=os.getenv("ANN_INDEX", "false").lower() == "true",
+            vector_cache_max_bytes=int(os.getenv("VECTOR_CACHE_MAX_BYTES", 256 * 1024 ** 2)),
+            vector_cache_max_chunks=int(os.getenv("VECTOR_CACHE_MAX_CHUNKS", 256)),
+            vector_cache_dtype=os.getenv("VECTOR_CACHE_DTYPE", 'float32'),
+            vector_cache_ttl=int(os.getenv("VECTOR_CACHE_TTL", 300)),
+            reranker=os.getenv("RERANKER", 'none'),
+            rerank_model=os.getenv("RERANK_MODEL"),
+            rerank_top_n=int(os.getenv("RERANK_TOP_N", 3)),
+            rerank_overfetch=int(os.getenv("RERANK_OVERFETCH", 3)),
+            rerank_budget_ms=int(os.getenv("RERANK_BUDGET_MS", 200)),
+            summary_min_tokens=int(os.getenv("SUMMARY_MIN_TOKENS", 256)),
+            summary_max_numeric_ratio=float(os.getenv("SUMMARY_MAX_NUMERIC_RATIO", 0.5)),
+            image_min_side=int(os.getenv("IMAGE_MIN_SIDE", 40)),
+            image_min_entropy=float(os.getenv("IMAGE_MIN_ENTROPY", 1.5)),
+            image_max_distance=int(os.getenv("IMAGE_MAX_DISTANCE", 4)),
+            table_engine=os.getenv("TABLE_ENGINE", "false").lower() == "true",
+            field_answers=os.getenv("FIELD_ANSWERS", "true").lower() == "true",
+            summary_tree=os.getenv("SUMMARY_TREE", "true").lower() == "true",
+            summary_section_tokens=int(os.getenv("SUMMARY_SECTION_TOKENS", 2000)),
+            page_render_dir=os.getenv("PAGE_RENDER_DIR", os.path.join(os.getcwd(), 'cache', 'pages')),
+            page_render_max_bytes=int(os.getenv("PAGE_RENDER_MAX_BYTES", 512 * 1024 ** 2)),
+            page_render_dpi=int(os.getenv("PAGE_RENDER_DPI", 110)),
+            page_render_memory_pages=int(os.getenv("PAGE_RENDER_MEMORY_PAGES", 32)),
+            batch_max_questions=int(os.getenv("BATCH_MAX_QUESTIONS", 20)),
+            batch_max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", 4)),
+            ask_max_concurrent=int(os.getenv("ASK_MAX_CONCURRENT", 8)),
+            ask_max_queue=int(os.getenv("ASK_MAX_QUEUE", 16)),
+            ask_max_wait_ms=int(os.getenv("ASK_MAX_WAIT_MS", 2000)),
+            ask_deadline_ms=int(os.getenv("ASK_DEADLINE_MS", 30000)),
+            ask_min_remaining_ms=int(os.getenv("ASK_MIN_REMAINING_MS", 1000)),
+            llm_timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+            embedding_timeout=float(os.getenv("EMBEDDING_TIMEOUT", 20)),
+            llm_max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+            breaker_window=int(os.getenv("BREAKER_WINDOW", 20)),
+            breaker_min_calls=int(os.getenv("BREAKER_MIN_CALLS", 5)),
+            breaker_error_rate=float(os.getenv("BREAKER_ERROR_RATE", 0.5)),
+            breaker_slow_call_ms=int(os.getenv("BREAKER_SLOW_CALL_MS", 15000)),
+            breaker_slow_rate=float(os.getenv("BREAKER_SLOW_RATE", 0.8)),
+            breaker_open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", 30)),
+            extractive_fallback=os.getenv("EXTRACTIVE_FALLBACK", "true").lower() == "true",
+            fake_models=os.getenv("FAKE_MODELS", "false").lower() == "true",
+            fake_model_latency_ms=int(os.getenv("FAKE_MODEL_LATENCY_MS", 0)),
+            fake_model_error_rate=float(os.getenv("FAKE_MODEL_ERROR_RATE", 0)),
+            tracing=os.getenv("TRACING", 'none'),
+            metrics=os.getenv("METRICS", "false").lower() == "true",
+        )
+
+    @classmethod
+    def lambda_runtime(cls, is_docker_build: bool = False) -> "ServiceSettings":
+        """AWS Lambda: only /tmp is writable and one invocation runs at a time per container.
+
+        Everything else is read from the environment like local().
+        """
+        database_url = config.DATABASE_URL
+        vector_database_url = config.PG_VECTOR_CONNECTION_STRING
+        if is_docker_build:
+            missing = [name for name in ("DATABASE_URL_DOCKER", "PG_VECTOR_CONNECTION_STRING_DOCKER") if not hasattr(config, name)]
+            if missing:
+                # Falling back to the host URLs would point the image build at an unreachable database
+                raise RuntimeError(f"Docker builds need {', '.join(missing)} in app/config.py")
+            database_url = config.DATABASE_URL_DOCKER
+            vector_database_url = config.PG_VECTOR_CONNECTION_STRING_DOCKER
+        return replace(
+            cls.local(),
+            database_url=database_url,
+            vector_database_url=vector_database_url,
+            download_dir=os.path.join('/tmp', 'downloads'),
+            log_dir=os.path.join('/tmp', 'logs'),
+            # A listener thread would be frozen with the execution environment between invocations
+            log_async=False,
+            db_pool_size=1,
+            vector_pool_size=1,
+            partition_cache_dir=os.path.join('/tmp', 'partition_cache'),
+            partition_cache_max_bytes=256 * 1024 ** 2,
+            # Smaller default than local(), the cache shares the function's memory with the layout model
+            vector_cache_max_bytes=int(os.getenv("VECTOR_CACHE_MAX_BYTES", 64 * 1024 ** 2)),
+            page_render_dir=os.path.join('/tmp', 'page_renders'),
+            page_render_max_bytes=128 * 1024 ** 2,
+            page_render_memory_pages=8,
+            ask_max_concurrent=1,
+            ask_max_queue=0,
+        )
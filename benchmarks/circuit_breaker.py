@@ -0,0 +1,95 @@
+"""Chat model outage with and without the circuit breaker, against the fault-injecting fake model.
+
+Concurrent callers ask the guarded fake model through three phases:
+healthy, down (every call fails after the injected latency, like a
+provider timing out) and recovered. For each phase the latency seen by the
+callers is reported together with the calls that reached the provider and
+the ones the open circuit refused, so the fail-fast and the half-open
+recovery can be checked without any network.
+
+Usage:
+    python benchmarks/circuit_breaker.py
+    python benchmarks/circuit_breaker.py --latency-ms 500 --open-seconds 2 --no-breaker
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage
+from app.helpers.circuit_breaker import CircuitBreaker, CircuitOpen
+from app.helpers.fake_models import FakeChatModel, Faults
+from app.services.RAGService import GuardedRunnable, extractive_answer
+
+def percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * share) - 1, 0)] if values else 0.0
+
+def run_phase(model, seconds: float, callers: int) -> dict:
+    latencies, outcomes = [], Counter()
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def caller():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                model.invoke([HumanMessage(content="What is the total?")])
+                outcome = "answered"
+            except CircuitOpen:
+                # The service answers from the retrieved passages instead
+                extractive_answer([])
+                outcome = "fallback"
+            except Exception:
+                outcome = "failed"
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"latencies": latencies, "outcomes": outcomes}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=8)
+    parser.add_argument("--phase-seconds", type=float, default=3.0)
+    parser.add_argument("--latency-ms", type=int, default=50, help="healthy provider latency")
+    parser.add_argument("--outage-latency-ms", type=int, default=1000, help="latency of a failing call, e.g. a timeout")
+    parser.add_argument("--open-seconds", type=float, default=1.0)
+    parser.add_argument("--no-breaker", action="store_true")
+    args = parser.parse_args()
+
+    faults = Faults(latency=args.latency_ms / 1000)
+    breaker = CircuitBreaker("chat", window=20, min_calls=5, error_rate=0.5, open_seconds=args.open_seconds)
+    fake = FakeChatModel(faults)
+    model = fake if args.no_breaker else GuardedRunnable(fake, breaker)
+
+    phases = [
+        ("healthy", lambda: None),
+        ("down", lambda: (setattr(faults, "down", True), setattr(faults, "latency", args.outage_latency_ms / 1000))),
+        ("recovered", lambda: (setattr(faults, "down", False), setattr(faults, "latency", args.latency_ms / 1000))),
+    ]
+    print(f"{'phase':10s} {'calls':>6s} {'provider':>8s} {'answered':>8s} {'failed':>6s} {'fallback':>8s} {'p50 ms':>8s} {'p95 ms':>8s} state")
+    for name, setup in phases:
+        setup()
+        provider_calls = faults.calls
+        result = run_phase(model, args.phase_seconds, args.callers)
+        outcomes, latencies = result["outcomes"], result["latencies"]
+        print(
+            f"{name:10s} {len(latencies):6d} {faults.calls - provider_calls:8d} {outcomes['answered']:8d} {outcomes['failed']:6d} "
+            f"{outcomes['fallback']:8d} {percentile(latencies, 0.5) * 1000:8.1f} {percentile(latencies, 0.95) * 1000:8.1f} "
+            f"{'-' if args.no_breaker else breaker.state}"
+        )
+    if not args.no_breaker:
+        print(f"breaker: {breaker.stats()}")
+
+if __name__ == "__main__":
+    main()
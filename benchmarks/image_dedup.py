@@ -0,0 +1,127 @@
+"""Vision calls avoided by the image pre-filter and the cross-document summary reuse.
+
+The default fixture corpus is generated: invoice-like documents that each
+carry the company logo on every page (re-encoded, so bytes differ), a
+signature, horizontal rules, small icons and one or two unique photos.
+With --pdf-dir the embedded images of real PDFs are used instead.
+
+No model is called. A call is counted for every image that would be sent to
+summarize_images, before and after filtering, and cross-document reuse is
+simulated with the same content hashes stored in rag_image_summaries.
+
+Usage:
+    python benchmarks/image_dedup.py --documents 50
+    python benchmarks/image_dedup.py --pdf-dir ./fixtures/invoices
+"""
+import argparse
+import base64
+import io
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers.image_filter import ImageFilter
+
+def to_base64(image, quality: int) -> str:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+def noise_image(width: int, height: int, rng: random.Random):
+    from PIL import Image
+    return Image.frombytes("L", (width, height), bytes(rng.randrange(256) for _ in range(width * height)))
+
+def logo(rng: random.Random):
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (240, 80), "white")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((10, 10, 70, 70), fill=(20, 60, 160))
+    draw.rectangle((90, 25, 230, 55), fill=(200, 40, 40))
+    draw.text((100, 32), "ACME", fill="white")
+    return image
+
+def signature(rng: random.Random):
+    from PIL import Image, ImageDraw
+    image = Image.new("L", (200, 60), 255)
+    draw = ImageDraw.Draw(image)
+    draw.line([(10 + i * 12, 30 + rng.randint(-20, 20)) for i in range(16)], fill=0, width=2)
+    return image
+
+def synthetic_corpus(documents: int, pages: int, seed: int) -> list[list[str]]:
+    from PIL import Image
+    rng = random.Random(seed)
+    company_logos = [logo(rng) for _ in range(3)]
+    corpus = []
+    for _ in range(documents):
+        company_logo = rng.choice(company_logos)
+        images = []
+        for _ in range(pages):
+            images.append(to_base64(company_logo, quality=rng.randint(70, 95)))
+            images.append(to_base64(Image.new("L", (600, 3), 0), quality=90))  # rule
+            images.append(to_base64(Image.new("L", (300, 120), 250), quality=90))  # blank stamp box
+            images.append(to_base64(noise_image(24, 24, rng), quality=90))  # icon
+        images.append(to_base64(signature(rng), quality=85))
+        images.extend(to_base64(noise_image(320, 240, rng), quality=85) for _ in range(rng.randint(1, 2)))  # photos
+        corpus.append(images)
+    return corpus
+
+def pdf_corpus(pdf_dir: str) -> list[list[str]]:
+    import fitz
+    corpus = []
+    for name in sorted(os.listdir(pdf_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        with fitz.open(os.path.join(pdf_dir, name)) as pdf:
+            images = []
+            for page in pdf:
+                for xref, *_ in page.get_images(full=True):
+                    images.append(base64.b64encode(pdf.extract_image(xref)["image"]).decode())
+            corpus.append(images)
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-dir", default=None)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--min-side", type=int, default=40)
+    parser.add_argument("--min-entropy", type=float, default=1.5)
+    parser.add_argument("--max-distance", type=int, default=4)
+    args = parser.parse_args()
+
+    corpus = pdf_corpus(args.pdf_dir) if args.pdf_dir else synthetic_corpus(args.documents, args.pages, args.seed)
+    image_filter = ImageFilter(args.min_side, args.min_entropy, args.max_distance)
+
+    reasons = Counter()
+    known_hashes = set()  # stands in for rag_image_summaries
+    baseline_calls = filtered_calls = reused = 0
+    start = time.perf_counter()
+    for images in corpus:
+        decisions = image_filter.plan(images)
+        baseline_calls += len(images)
+        for decision in decisions:
+            reasons[decision.reason] += 1
+            if not decision.keep:
+                continue
+            if decision.content_hash in known_hashes:
+                reused += 1
+            else:
+                known_hashes.add(decision.content_hash)
+                filtered_calls += 1
+    elapsed = time.perf_counter() - start
+
+    total = sum(reasons.values())
+    print(f"documents {len(corpus)}, images {total}, filter time {elapsed * 1000 / max(total, 1):.2f} ms/image")
+    for reason, count in sorted(reasons.items()):
+        print(f"  {reason:12s} {count:6d}")
+    print(f"vision calls without filter {baseline_calls}")
+    print(f"vision calls with filter    {filtered_calls} ({reused} summaries reused across documents)")
+    print(f"calls avoided               {baseline_calls - filtered_calls} ({(baseline_calls - filtered_calls) / max(baseline_calls, 1):.1%})")
+
+if __name__ == "__main__":
+    main()
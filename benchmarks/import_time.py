@@ -0,0 +1,101 @@
+"""Import-time profile of each entry point.
+
+Runs every entry point in a fresh interpreter with `python -X importtime`,
+reports the wall time of the import and the slowest modules, and compares
+against a stored baseline.
+
+Usage:
+    python benchmarks/import_time.py                  # report
+    python benchmarks/import_time.py --save-baseline  # store the current numbers
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines", "import_time.json")
+
+# name -> (working directory, statement that loads the entry point)
+ENTRY_POINTS = {
+    "flask": (ROOT, "import run"),
+    "celery_worker": (ROOT, "import app.celery.celery_worker, app.celery.tasks"),
+    "lambda": (os.path.join(ROOT, "deploy"), "from lambda_function import lambda_handler"),
+}
+
+def parse_importtime(stderr: str) -> list[tuple[str, int]]:
+    """Return (module, cumulative microseconds) for every top level import line."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.split("|")]
+        try:
+            modules.append((name, int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+def profile(name: str, runs: int = 3) -> dict:
+    cwd, statement = ENTRY_POINTS[name]
+    wall_times = []
+    modules = []
+    error = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            cwd=cwd, capture_output=True, text=True,
+            # Every runtime imports the shared app package from the repository root
+            env={**os.environ, "PYTHONPATH": ROOT},
+        )
+        wall_times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+            break
+        modules = parse_importtime(proc.stderr)
+
+    slowest = sorted(modules, key=lambda m: m[1], reverse=True)[:10]
+    return {
+        "wall_seconds": min(wall_times),
+        "slowest_modules": [{"module": m, "cumulative_ms": us / 1000} for m, us in slowest],
+        "error": error,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--entry", choices=list(ENTRY_POINTS), action="append")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name in args.entry or ENTRY_POINTS:
+        result = profile(name, args.runs)
+        results[name] = result
+        if result["error"]:
+            print(f"{name:15s} FAILED: {result['error']}")
+            continue
+        line = f"{name:15s} {result['wall_seconds'] * 1000:8.1f} ms"
+        if name in baseline:
+            previous = baseline[name]["wall_seconds"]
+            line += f"  (baseline {previous * 1000:.1f} ms, {(result['wall_seconds'] / previous - 1) * 100:+.1f}%)"
+        print(line)
+        for module in result["slowest_modules"][:5]:
+            print(f"    {module['cumulative_ms']:8.1f} ms  {module['module']}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Per-call cost and memory of the logging pipeline.
+
+Every mode runs in a fresh interpreter, logs --calls records through
+Logger().get_logger() into a temporary log directory (console output goes
+to /dev/null) and reports the microseconds per call on the calling thread
+and the RSS after each quarter of the calls:
+  - unbounded: synchronous handlers and a capture keeping every record, as before
+  - sync: synchronous handlers, ring-buffer capture
+  - async: ring-buffer capture, file and console writes on the listener thread
+
+A steady RSS across the quarters means memory no longer grows with the
+number of records logged. --io-latency-us adds a sleep to every file write,
+standing in for a slow or stalled disk: the synchronous modes pay it on the
+calling thread, the async one only drops records once its queue is full.
+
+Usage:
+    python benchmarks/logging_overhead.py
+    python benchmarks/logging_overhead.py --calls 500000 --format json
+    python benchmarks/logging_overhead.py --calls 20000 --io-latency-us 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# mode -> Logger() arguments
+MODES = {
+    "unbounded": {"capture_size": None, "async_handlers": False},
+    "sync": {"capture_size": 1000, "async_handlers": False},
+    "async": {"capture_size": 1000, "async_handlers": True},
+}
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        import resource
+        # Peak rather than current RSS where /proc is not available (ru_maxrss is in bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def run_mode(mode: str, calls: int, log_format: str, queue_size: int, io_latency: float):
+    sys.path.insert(0, ROOT)
+    sys.stderr = open(os.devnull, "w")  # the console handler binds stderr when it is created
+    from app.helpers.logger import Logger, stats
+    if io_latency:
+        from logging.handlers import TimedRotatingFileHandler
+        emit = TimedRotatingFileHandler.emit
+
+        def slow_emit(self, record):
+            time.sleep(io_latency)
+            emit(self, record)
+        TimedRotatingFileHandler.emit = slow_emit
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = Logger(log_dir=log_dir, log_format=log_format, queue_size=queue_size, **MODES[mode]).get_logger()
+        quarter = max(calls // 4, 1)
+        rss, elapsed = [], 0.0
+        for _ in range(4):
+            start = time.perf_counter()
+            for i in range(quarter):
+                logger.info("Answered question %d for file %s in %.3fs", i, "42", 0.125)
+            elapsed += time.perf_counter() - start
+            rss.append(round(rss_mb(), 1))
+        logging_stats = next(iter(stats().values()))
+    print(json.dumps({"us_per_call": elapsed / (quarter * 4) * 1e6, "rss_mb": rss, "dropped": logging_stats["dropped"]}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--io-latency-us", type=float, default=0.0, help="extra latency of every file write")
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.calls, args.format, args.queue_size, args.io_latency_us / 1e6)
+        return
+
+    print(f"{'mode':10s} {'us/call':>8s} {'dropped':>8s}  RSS MB after each quarter")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--calls", str(args.calls),
+             "--format", args.format, "--queue-size", str(args.queue_size), "--io-latency-us", str(args.io_latency_us)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:10s} {result['us_per_call']:8.2f} {result['dropped']:8d}  {' -> '.join(map(str, result['rss_mb']))}")
+
+if __name__ == "__main__":
+    main()
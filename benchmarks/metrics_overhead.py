@@ -0,0 +1,64 @@
+"""Per-request cost of the Prometheus metrics, disabled and enabled, and the cost of a scrape.
+
+Replays the metric calls of one /ask request (request and ask latency,
+database statements counted by the cursor, a chat and an embeddings call,
+a vector cache lookup and the batch stage timings) in a tight loop, first
+with metrics off (the default) and then on, and reports the microseconds
+added per request. The scrape is timed with the component stats registered.
+
+Usage:
+    python benchmarks/metrics_overhead.py
+    python benchmarks/metrics_overhead.py --requests 200000 --queries 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.helpers import metrics
+
+def simulated_request(queries: int):
+    with metrics.count_queries() as counter:
+        for _ in range(queries):
+            metrics.record_query()
+        metrics.observe_provider_call("embeddings", "ok", 0.12, input_tokens=12)
+        metrics.record_cache("vector", "hit")
+        metrics.observe_provider_call("chat", "ok", 0.9, input_tokens=1800, output_tokens=120)
+        metrics.observe_stages("batch", {"embed": 0.12, "search": 0.03, "generate": 0.9})
+    metrics.observe_request("/services/rag/chats/ask", "POST", 200, 1.1, counter[0])
+    metrics.observe_ask("/services/rag/chats/ask", "success", 1.1)
+
+def per_request_us(requests: int, queries: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        simulated_request(queries)
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=3, help="database statements per request")
+    parser.add_argument("--scrapes", type=int, default=200)
+    args = parser.parse_args()
+
+    disabled = per_request_us(args.requests, args.queries)
+    metrics.configure(True)
+    enabled = per_request_us(args.requests, args.queries)
+    print(f"{'metrics':10s} {'us/request':>10s}")
+    print(f"{'disabled':10s} {disabled:10.2f}")
+    print(f"{'enabled':10s} {enabled:10.2f}")
+    print(f"overhead: {enabled - disabled:.2f} us per request")
+
+    for component in ("ask_paths", "admission", "providers", "vector_cache"):
+        metrics.register_stats(component, lambda: {"hits": 10, "misses": 2, "latency": {"p50": 0.4, "p95": 1.2}})
+    payload, _ = metrics.render()
+    start = time.perf_counter()
+    for _ in range(args.scrapes):
+        metrics.render()
+    scrape_ms = (time.perf_counter() - start) / args.scrapes * 1000
+    print(f"scrape: {scrape_ms:.2f} ms, {len(payload)} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,75 @@
 import os
+import json
+import time
 
 os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
 
-from src.services.SQLService import SQLService
-from src.services.RAGService import RAGService
-from src.services.FileService import FileService
-from src.helpers.logger import Logger
+_init_start = time.perf_counter()
+
+from app.services.SQLService import SQLService
+from app.services.FileService import FileService
+from app.service_instances import ServiceRegistry
+from app.settings import ServiceSettings
+from app.helpers.timing import StageTimer
+
+# Module scope objects live for the whole container and are reused by warm invocations
+_registries = {}  # is_docker_build -> ServiceRegistry
+
+def get_registry(is_docker_build: bool = False) -> ServiceRegistry:
+    """Build the services on first use, validate the pooled connection when reusing them."""
+    registry = _registries.get(is_docker_build)
+    if registry is None:
+        registry = ServiceRegistry(lambda: ServiceSettings.lambda_runtime(is_docker_build))
+        registry.tracer
+        _registries[is_docker_build] = registry
+    else:
+        registry.sql_service.validate_connection()
+    return registry
+
+_default_registry = get_registry()
+logger = _default_registry.logger
+
+# Init phase: load the layout model before the first invocation is billed for it
+try:
+    _default_registry.file_service.preload_models()
+except Exception as e:
+    logger.error(f"Failed to preload layout models during init: {e}")
+
+INIT_SECONDS = time.perf_counter() - _init_start
+_is_cold_start = True
+
+def log_timing(id, status_code: int, timer: StageTimer, started: float):
+    global _is_cold_start
+    logger.info(json.dumps({
+        "event": "invocation_timing",
+        "file_id": id,
+        "status_code": status_code,
+        "cold_start": _is_cold_start,
+        "container_init_seconds": round(INIT_SECONDS, 4) if _is_cold_start else 0.0,
+        "stages": timer.as_dict(),
+        "total_seconds": round(time.perf_counter() - started, 4),
+    }))
+    _is_cold_start = False
 
 def lambda_handler(event, context):
+    started = time.perf_counter()
+    timer = StageTimer()
+    response = handle(event, timer)
+    log_timing(event.get('id'), response["statusCode"], timer, started)
+    return response
+
+def handle(event, timer: StageTimer):
     id = event.get('id')
     is_docker_build = event.get('is_docker_build', False)
-    logger = Logger().get_logger()
-    
+
     logger.info(f"Received event: {event}")
-    
-    sql_service = SQLService(logger, is_docker_build)
-    rag_service = RAGService(logger, sql_service, is_docker_build)
-    file_service = FileService(logger, sql_service, rag_service)
-    
-    #test the connection 
+
+    with timer.stage("init"):
+        registry = get_registry(is_docker_build)
+        sql_service: SQLService = registry.sql_service
+        file_service: FileService = registry.file_service
+
+    #test the connection
     if int(id) == -1:
         result = sql_service.test("SELECT * FROM users", fetchone=True)
         logger.info(f"Test query result: {result}")
@@ -27,7 +78,7 @@ def lambda_handler(event, context):
             "message": "Database connection test successful.",
             "result": result
         }
-    
+
     is_processed = sql_service.is_processed(id)
     if is_processed:
         logger.info(f"File with ID {id} has already been processed.")
@@ -37,8 +88,8 @@ def lambda_handler(event, context):
         }
     try:
         logger.info(f"Received process request for file ID: {id}")
-        
-        result = file_service.prepare_data_for_rag(id)
+
+        result = file_service.prepare_data_for_rag(id, timer)
         if result:
             logger.info(f"File with ID {id} processed successfully.")
             return {
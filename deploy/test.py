@@ -1,10 +1,15 @@
-from lambda_function import lambda_handler
+import os
 import sys
 
+# lambda_function imports the shared app package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lambda_function import lambda_handler
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print("Usage: python test.py <id>")
         sys.exit(1)
     event = {"id": sys.argv[1], "is_docker_build": True}  # Set is_docker_build to True for testing
     result = lambda_handler(event, None)
-    print(result)
\ No newline at end of file
+    print(result)
@@ -0,0 +1,51 @@
+"""Move per-file PGVector collections into the consolidated rag_embeddings table.
+
+Each collection is copied and dropped in its own transaction, so the script can
+be stopped and re-run at any time. Run it with VECTOR_LAYOUT=consolidated set
+on the services once it has finished (or before, deletes cover both layouts).
+
+Usage:
+    python scripts/migrate_embeddings.py                # every numeric collection
+    python scripts/migrate_embeddings.py 552 553        # selected documents
+    python scripts/migrate_embeddings.py --keep         # copy without dropping the collections
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.service_instances import registry
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("document_ids", nargs="*")
+    parser.add_argument("--keep", action="store_true", help="keep the original collections")
+    args = parser.parse_args()
+
+    logger = registry.logger
+    sql_service = registry.sql_service
+    store = registry.rag_service.embedding_store
+
+    names = args.document_ids
+    if not names:
+        # The collections live in the vector database, which may not be the main one
+        with sql_service.connection(vector_db=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT name FROM public.langchain_pg_collection WHERE name ~ '^[0-9]+$' ORDER BY name")
+                names = [row[0] for row in cur.fetchall()]
+
+    total = 0
+    started = time.perf_counter()
+    for index, name in enumerate(names, start=1):
+        try:
+            moved = store.migrate_collection(name, drop_collection=not args.keep)
+            total += moved
+            logger.info(f"[{index}/{len(names)}] Migrated collection {name}: {moved} embeddings")
+        except Exception as e:
+            logger.error(f"[{index}/{len(names)}] Failed to migrate collection {name}: {e}")
+    logger.info(f"Migrated {total} embeddings from {len(names)} collections in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
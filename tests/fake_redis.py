@@ -0,0 +1,72 @@
+"""In-memory stand-in for the few Redis commands the locks use, thread safe, with a clock tests can advance."""
+import threading
+import time
+
+class FakeRedis:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._expires = {}
+        self._offset = 0.0
+
+    def advance(self, seconds: float):
+        """Move the clock forward, expiring keys whose TTL ran out."""
+        with self._lock:
+            self._offset += seconds
+
+    def _now(self) -> float:
+        return time.monotonic() + self._offset
+
+    def _live(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= self._now():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return self._values.get(key)
+
+    def get(self, key):
+        with self._lock:
+            value = self._live(key)
+            return None if value is None else str(value).encode()
+
+    def exists(self, key) -> int:
+        with self._lock:
+            return int(self._live(key) is not None)
+
+    def set(self, key, value, nx: bool = False, ex: int = None):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self._values[key] = str(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = self._now() + ex
+            return True
+
+    def incr(self, key) -> int:
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self._values[key] = str(value)
+            return value
+
+    def delete(self, key) -> int:
+        with self._lock:
+            existed = self._live(key) is not None
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+            return int(existed)
+
+    def register_script(self, script: str):
+        """The compare-and-set scripts of app.redis.lock: renew (PEXPIRE) or release (DEL) if the token matches."""
+        def run(keys, args):
+            key, token = keys[0], str(args[0])
+            with self._lock:
+                if self._live(key) != token:
+                    return 0
+                if "PEXPIRE" in script:
+                    self._expires[key] = self._now() + int(args[1]) / 1000
+                else:
+                    self._values.pop(key, None)
+                    self._expires.pop(key, None)
+                return 1
+        return run
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from app.helpers.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+def fail():
+    raise ConnectionError("provider down")
+
+def test_opens_on_errors_and_closes_after_a_successful_probe():
+    breaker = CircuitBreaker("chat", window=4, min_calls=2, error_rate=0.5, open_seconds=0.05)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: "not called")
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.transitions == {OPEN: 1, HALF_OPEN: 1, CLOSED: 1}
+    assert breaker.calls["rejected"] == 1
+
+def test_failed_probe_opens_again():
+    breaker = CircuitBreaker("chat", min_calls=1, open_seconds=0.05)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    time.sleep(0.06)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    assert breaker.transitions[OPEN] == 2
+
+def test_opens_on_slow_calls():
+    breaker = CircuitBreaker("embeddings", min_calls=2, slow_call_seconds=0.01, slow_rate=0.5)
+    for _ in range(2):
+        breaker.call(time.sleep, 0.02)
+    assert breaker.state == OPEN
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.helpers.field_extraction import extract_fields, looks_like_invoice, match_intent
+
+@pytest.mark.parametrize("question, field", [
+    ("What is the total?", "total"),
+    ("What's the invoice total?", "total"),
+    ("How much do I owe?", "total"),
+    ("What is the amount due on this invoice?", "total"),
+    ("When is the invoice due?", "due_date"),
+    ("What is the due date", "due_date"),
+    ("What is the invoice number?", "invoice_number"),
+    ("When was this invoice issued?", "invoice_date"),
+    ("What is the VAT amount?", "tax"),
+    ("What is the subtotal?", "subtotal"),
+    ("Who issued this invoice?", "vendor"),
+])
+def test_field_questions(question, field):
+    assert match_intent(question) == field
+
+@pytest.mark.parametrize("question", [
+    "What is the total number of pages?",
+    "How many hours in total did the contractor work?",
+    "What is the tax ID of the vendor?",
+    "Is this contract subject to VAT?",
+    "What is the total contract value and the payment schedule?",
+    "Summarize the payment terms including the due date and penalties",
+    "What is the total of each line item?",
+])
+def test_other_questions_need_retrieval(question):
+    assert match_intent(question) is None
+
+def element(text: str, page_number: int = 1):
+    return SimpleNamespace(text=text, metadata=SimpleNamespace(to_dict=lambda: {"page_number": page_number, "coordinates": {}}))
+
+def test_fields_only_count_for_invoices():
+    invoice = [element("INVOICE"), element("Invoice No: INV-0042"), element("Invoice date: 2024-03-01"), element("Total: $1,250.00")]
+    report = [element("Quarterly report"), element("Date: 2024-03-01"), element("Total: 1,250")]
+
+    assert looks_like_invoice(invoice, extract_fields(invoice))
+    assert extract_fields(invoice)["total"].value == "$1,250.00"
+    assert not looks_like_invoice(report, extract_fields(report))
@@ -0,0 +1,77 @@
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("app.config", reason="the services need the local app/config.py")
+
+from langchain.schema.document import Document
+
+from app.helpers.circuit_breaker import CLOSED, OPEN, CircuitOpen
+from app.helpers.fake_models import ProviderError
+from app.services.RAGService import RAGService
+from app.settings import ServiceSettings
+
+def rag_service(**overrides) -> RAGService:
+    settings = ServiceSettings(
+        database_url="postgresql://localhost/unused",
+        vector_database_url="postgresql://localhost/unused",
+        download_dir="/tmp",
+        fake_models=True,
+        breaker_min_calls=2,
+        breaker_open_seconds=0.05,
+        **overrides,
+    )
+    return RAGService(logging.getLogger("tests"), SimpleNamespace(settings=settings))
+
+def test_chat_model_breaker_opens_and_recovers():
+    service = rag_service(fake_model_error_rate=1.0)
+    model = service.model
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            model.invoke("What is the total?")
+    assert service.chat_breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        model.invoke("What is the total?")
+
+    # The provider comes back: the half-open probe goes through and closes the circuit
+    model.runnable.faults.error_rate = 0.0
+    time.sleep(0.06)
+    assert model.invoke("What is the total?").content.startswith("Fake answer: What is the total?")
+    assert service.chat_breaker.state == CLOSED
+    assert service.provider_stats()["chat"]["transitions"] == {"open": 1, "half_open": 1, "closed": 1}
+
+def test_slow_embeddings_open_the_breaker():
+    service = rag_service(fake_model_latency_ms=20, breaker_slow_call_ms=10, breaker_slow_rate=0.5)
+    embeddings = service.embeddings
+    embeddings.embed_documents(["invoice total"])
+    embeddings.embed_query("invoice total")
+    assert service.embedding_breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        embeddings.embed_query("invoice total")
+    assert service.chat_breaker.state == CLOSED
+
+def test_extractive_fallback_while_the_chat_model_is_down():
+    service = rag_service(fake_model_error_rate=1.0)
+    retrieved = {
+        "result": {("42", 2): [
+            Document(page_content="Total due:  $1,250.00", metadata={"type": "Text", "page_number": 2}),
+            Document(page_content="base64", metadata={"type": "Image", "page_number": 2}),
+        ]},
+        "file_id": "42",
+    }
+    answers = [service.generate_answer("What is the total?", retrieved) for _ in range(3)]
+
+    # Failed calls first, then calls refused by the open circuit, all answered from the passages
+    assert service.chat_breaker.state == OPEN
+    for answer, path in answers:
+        assert path == "extractive"
+        assert "- Page 2: Total due: $1,250.00" in answer
+        assert "base64" not in answer
+
+def test_no_fallback_when_disabled():
+    service = rag_service(fake_model_error_rate=1.0, extractive_fallback=False)
+    with pytest.raises(ProviderError):
+        service.generate_answer("What is the total?", {"result": {}, "file_id": "42"})
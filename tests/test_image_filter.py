@@ -0,0 +1,55 @@
+import base64
+import io
+import random
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image, ImageDraw
+
+from app.helpers.image_filter import ImageFilter, content_hash, decode_image, dhash, hamming, image_content_hash
+
+def encode(image, format: str = "PNG", **options) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def noise(size: int = 120, seed: int = 0):
+    rng = random.Random(seed)
+    image = Image.new("L", (size, size))
+    image.putdata([rng.randrange(256) for _ in range(size * size)])
+    return image.convert("RGB")
+
+def bar_chart(values: list[int]):
+    image = Image.new("RGB", (200, 120), "white")
+    draw = ImageDraw.Draw(image)
+    for i, value in enumerate(values):
+        draw.rectangle([20 + i * 45, 110 - value, 50 + i * 45, 110], fill="navy")
+    return image
+
+def test_plan_drops_small_flat_and_repeated_images():
+    logo = noise(seed=1)
+    images = [
+        encode(logo),
+        encode(noise(size=20, seed=2)),  # icon
+        encode(Image.new("RGB", (200, 200), "white")),  # blank box
+        encode(logo, "JPEG", quality=90),  # the logo again, re-encoded
+        encode(noise(seed=3)),
+        "not an image",
+    ]
+    decisions = ImageFilter().plan(images)
+
+    assert [decision.reason for decision in decisions] == ["unique", "too_small", "low_entropy", "duplicate", "unique", "unreadable"]
+    assert decisions[3].duplicate_of == 0
+    assert ImageFilter.stats(decisions) == {"images": 6, "kept": 2, "too_small": 1, "low_entropy": 1, "duplicate": 1, "unreadable": 1}
+
+def test_look_alike_charts_share_a_dhash_but_not_a_content_hash():
+    first, second = bar_chart([40, 70, 55, 90]), bar_chart([40, 71, 55, 90])
+
+    assert hamming(dhash(first), dhash(second)) <= 4
+    assert content_hash(first) != content_hash(second)
+
+def test_content_hash_ignores_the_encoding_of_the_same_pixels():
+    chart = bar_chart([40, 70, 55, 90])
+    assert image_content_hash(encode(chart)) == image_content_hash(encode(chart, optimize=True, compress_level=1))
+    assert content_hash(decode_image(encode(chart))) == content_hash(chart)
@@ -0,0 +1,21 @@
+import builtins
+import logging
+
+from app.helpers import metrics
+
+def test_metrics_are_disabled_when_prometheus_client_is_missing(monkeypatch, caplog):
+    real_import = builtins.__import__
+
+    def import_without_prometheus(name, *args, **kwargs):
+        if name.startswith("prometheus_client"):
+            raise ImportError(f"No module named {name!r}")
+        return real_import(name, *args, **kwargs)
+    monkeypatch.setattr(builtins, "__import__", import_without_prometheus)
+    monkeypatch.setattr(metrics, "_metrics", {})
+
+    with caplog.at_level(logging.WARNING):
+        metrics.configure(True, logging.getLogger("tests"))
+
+    assert not metrics.enabled()
+    assert "metrics are disabled" in caplog.text
+    metrics.observe_request("ask", "POST", 200, 0.1)  # A no-op, not a crash
@@ -0,0 +1,35 @@
+import os
+from types import SimpleNamespace
+
+from app.helpers.partition_cache import PartitionCache, group_by_page
+
+class Element:
+    def __init__(self, text: str, page_number: int = None):
+        self.text = text
+        self.metadata = SimpleNamespace(page_number=page_number)
+
+    def to_dict(self) -> dict:
+        return {"type": "NarrativeText", "text": self.text, "metadata": {"page_number": self.metadata.page_number}}
+
+def disk_usage(cache_dir: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(cache_dir) for name in files)
+
+def test_overwriting_an_entry_keeps_the_size_in_step_with_the_disk(tmp_path):
+    cache = PartitionCache(str(tmp_path), max_bytes=1_000_000)
+    cache.put("page", [Element("x" * 1000)])
+    cache.put("page", [Element("short")])
+    cache.put("other", [Element("text")])
+
+    assert cache.stats()["bytes"] == disk_usage(str(tmp_path))
+    assert cache.evictions == 0
+
+def test_elements_without_a_page_stay_with_their_neighbours():
+    elements = [Element("a"), Element("b", 1), Element("c"), Element("d", 2), Element("e")]
+    by_page, paged = group_by_page(elements, {1: 3, 2: 7})
+
+    assert paged
+    assert {page: [el.text for el in els] for page, els in by_page.items()} == {3: ["a", "b", "c"], 7: ["d", "e"]}
+
+def test_elements_without_any_page_are_not_grouped():
+    _, paged = group_by_page([Element("a"), Element("b")], {1: 3})
+    assert not paged
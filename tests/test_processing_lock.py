@@ -0,0 +1,149 @@
+import logging
+import queue
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("celery")
+
+from app.celery import tasks
+from app.extensions import celery
+from app.redis.lock import ProcessingLock
+from tests.fake_redis import FakeRedis
+
+FILE_ID = 42
+
+class Store:
+    """The ingested state of one file and how many times it was ingested."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ingested = False
+        self.ingestions = 0
+
+    def file_exists(self, file_id) -> bool:
+        # The database round trip: a worker can finish and release the lock meanwhile
+        time.sleep(random.uniform(0, 0.002))
+        return self.ingested
+
+    def ingest(self):
+        time.sleep(random.uniform(0, 0.005))
+        with self._lock:
+            self.ingestions += 1
+            self.ingested = True
+
+class FileService:
+    """prepare_data_for_rag writing to a Store, checking the lock before its writes like the real one."""
+    def __init__(self, store: Store, during_ingest=None):
+        self.store = store
+        self.rag_service = SimpleNamespace(file_exists=store.file_exists)
+        self.during_ingest = during_ingest
+
+    def prepare_data_for_rag(self, file_id, timer=None, before_write=None):
+        if self.during_ingest is not None:
+            self.during_ingest()
+        before_write()
+        self.store.ingest()
+        return True
+
+@pytest.fixture
+def redis_client(monkeypatch) -> FakeRedis:
+    client = FakeRedis()
+    monkeypatch.setattr(tasks, "redis_client", client)
+    return client
+
+def use_services(monkeypatch, file_service: FileService):
+    monkeypatch.setitem(celery.conf, "file_service", file_service)
+    monkeypatch.setitem(celery.conf, "logger", logging.getLogger("tests"))
+
+def test_concurrent_requests_and_workers_ingest_once(redis_client, monkeypatch):
+    pytest.importorskip("app.config", reason="the controllers need the local app/config.py")
+    from flask import Flask
+    from app.controllers import chat_controller
+    monkeypatch.setattr(chat_controller, "redis_client", redis_client)
+
+    for _ in range(50):
+        store, queued = Store(), queue.Queue()
+        use_services(monkeypatch, FileService(store))
+        app = Flask(__name__)
+        app.logger = logging.getLogger("tests")
+        app.rag_service = SimpleNamespace(file_exists=store.file_exists)
+
+        def apply_async(args):
+            queued.put(args)
+            return SimpleNamespace(id="task")
+        monkeypatch.setattr(tasks.process_file_task, "apply_async", apply_async)
+        stop = threading.Event()
+
+        def ask_repeatedly():
+            with app.app_context():
+                while not stop.is_set():
+                    chat_controller.file_not_ready_response(FILE_ID)
+
+        def work():
+            while not stop.is_set() or not queued.empty():
+                try:
+                    args = queued.get(timeout=0.01)
+                except queue.Empty:
+                    continue
+                tasks.process_file_task(*args)
+
+        threads = [threading.Thread(target=ask_repeatedly) for _ in range(8)] + [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        assert store.ingestions == 1
+
+def test_task_acquires_again_when_the_adopted_lock_expired_in_the_queue(redis_client, monkeypatch):
+    store = Store()
+    use_services(monkeypatch, FileService(store))
+    token = ProcessingLock(redis_client, FILE_ID, ttl=600).acquire()
+    redis_client.advance(601)
+
+    assert tasks.process_file_task(FILE_ID, token) == {"status": "success", "file_id": FILE_ID}
+    assert store.ingestions == 1
+    assert not redis_client.exists(f"processing:{FILE_ID}")
+
+def test_task_skips_a_file_ingested_while_it_was_queued(redis_client, monkeypatch):
+    store = Store()
+    store.ingested = True
+    use_services(monkeypatch, FileService(store))
+    token = ProcessingLock(redis_client, FILE_ID).acquire()
+
+    assert tasks.process_file_task(FILE_ID, token) == {"status": "success", "file_id": FILE_ID}
+    assert store.ingestions == 0
+
+def test_task_skips_when_another_owner_took_the_expired_lock(redis_client, monkeypatch):
+    store = Store()
+    use_services(monkeypatch, FileService(store))
+    stale_token = ProcessingLock(redis_client, FILE_ID).acquire()
+    redis_client.advance(601)
+    owner = ProcessingLock(redis_client, FILE_ID)
+    assert owner.acquire() is not None
+
+    assert tasks.process_file_task(FILE_ID, stale_token) == {"status": "processing", "file_id": FILE_ID}
+    assert store.ingestions == 0
+    assert redis_client.get(owner.key) == owner.token.encode()
+
+def test_task_that_lost_its_lock_does_not_write(redis_client, monkeypatch):
+    store = Store()
+    owner = ProcessingLock(redis_client, FILE_ID)
+
+    def lose_the_lock():
+        # The job outlives its TTL (a stalled worker) and another one takes the file over
+        redis_client.advance(601)
+        assert owner.acquire() is not None
+    use_services(monkeypatch, FileService(store, during_ingest=lose_the_lock))
+    token = ProcessingLock(redis_client, FILE_ID).acquire()
+
+    result = tasks.process_file_task(FILE_ID, token)
+
+    assert result["status"] == "error"
+    assert store.ingestions == 0
+    assert redis_client.get(owner.key) == owner.token.encode()
@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("app.config", reason="the services need the local app/config.py")
+
+from app.services import FileService as file_service_module
+from app.services.FileService import FileService
+from app.settings import ServiceSettings
+
+class SQLService:
+    """Records the writes of a re-ingest, in order."""
+    def __init__(self, stored_fingerprints: dict, chunk_pages: dict):
+        self.settings = ServiceSettings("postgresql://localhost/unused", "postgresql://localhost/unused", "/tmp", summary_tree=False)
+        self.stored_fingerprints = stored_fingerprints
+        self.chunk_pages = chunk_pages
+        self.calls = []
+
+    def download_file_by_id(self, file_id):
+        return "/tmp/document.pdf", "document.pdf"
+
+    def get_page_fingerprints(self, file_id):
+        return self.stored_fingerprints
+
+    def get_chunk_pages(self, file_id):
+        return self.chunk_pages
+
+    def delete_chunks(self, file_id, chunk_ids):
+        self.calls.append(("delete_chunks", list(chunk_ids)))
+
+    def delete_document_fields(self, file_id, page_numbers, keep_fields=None):
+        self.calls.append(("delete_document_fields", sorted(page_numbers), keep_fields))
+
+    def save_page_fingerprints(self, file_id, fingerprints):
+        self.calls.append(("save_page_fingerprints",))
+
+class RAGService:
+    def invalidate_vector_cache(self, file_id):
+        pass
+
+def reingest(monkeypatch, changed_pages: set[int], chunk_pages: dict, saved: bool = True):
+    fingerprints = [f"page {page}" + (" v2" if page in changed_pages else "") for page in range(1, 7)]
+    sql_service = SQLService({page: f"page {page}" for page in range(1, 7)}, chunk_pages)
+    service = FileService(logging.getLogger("tests"), sql_service, RAGService())
+    monkeypatch.setattr(file_service_module, "page_fingerprints", lambda path: fingerprints)
+    monkeypatch.setattr(service, "get_chunks_for_pages", lambda path, pages: [f"chunk of {sorted(pages)}"])
+
+    def save_chunks(file_id, chunks, timer=None, before_write=None):
+        sql_service.calls.append(("save_chunks", chunks))
+        return {"fields_extracted": ["total"]} if saved else None
+    monkeypatch.setattr(service, "save_chunks", save_chunks)
+    return service.reingest(7), sql_service.calls
+
+def test_stale_chunks_are_expanded_until_the_pages_stop_growing(monkeypatch):
+    # A chain of chunks spanning pages 3-4, 4-5 and 5-6: changing page 3 makes all of them stale
+    chunk_pages = {"a": {1, 2}, "b": {3, 4}, "c": {4, 5}, "d": {5, 6}}
+    report, calls = reingest(monkeypatch, {3}, chunk_pages)
+
+    assert report["pages_processed"] == 4
+    assert report["chunks_deleted"] == 3
+    assert calls[0] == ("save_chunks", ["chunk of [3, 4, 5, 6]"])
+    assert calls[1] == ("delete_chunks", ["b", "c", "d"])
+    assert calls[2] == ("delete_document_fields", [3, 4, 5, 6], ["total"])
+
+def test_failed_save_keeps_the_previous_chunks(monkeypatch):
+    report, calls = reingest(monkeypatch, {1}, {"a": {1, 2}, "b": {3}}, saved=False)
+
+    assert report is None
+    assert [call[0] for call in calls] == ["save_chunks"]
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("redis")
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.helpers.single_flight import RedisSingleFlight, SingleFlight
+from tests.fake_redis import FakeRedis
+
+class Counter:
+    """A computation that counts its runs and can be held until released."""
+    def __init__(self, release: threading.Event = None):
+        self._lock = threading.Lock()
+        self.release = release
+        self.started = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        return {"answer": "yes", "run": calls}
+
+class BrokenRedis(FakeRedis):
+    def get(self, key):
+        raise RedisConnectionError("Connection refused")
+
+    def set(self, key, value, nx: bool = False, ex: int = None):
+        raise RedisConnectionError("Connection refused")
+
+def run_concurrently(calls):
+    results = [None] * len(calls)
+
+    def run(index, call):
+        results[index] = call()
+    threads = [threading.Thread(target=run, args=(index, call)) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_local_calls_with_the_same_key_share_one_run():
+    single_flight, release = SingleFlight(), threading.Event()
+    fn = Counter(release)
+    threads, results = run_concurrently([lambda: single_flight.do("key", fn)] * 8)
+    fn.started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fn.calls == 1
+    assert all(result == {"answer": "yes", "run": 1} for result in results)
+
+def test_local_failure_is_raised_to_every_caller():
+    single_flight = SingleFlight()
+
+    def fail():
+        raise ValueError("no answer")
+    with pytest.raises(ValueError):
+        single_flight.do("key", fail)
+
+def test_redis_follower_in_another_process_gets_the_leader_result():
+    client, release = FakeRedis(), threading.Event()
+    leader, follower = RedisSingleFlight(client, poll_interval=0.01), RedisSingleFlight(client, poll_interval=0.01)
+    fn = Counter(release)
+    threads, results = run_concurrently([lambda: leader.do("key", fn)])
+    fn.started.wait(5)
+    follower_threads, follower_results = run_concurrently([lambda: follower.do("key", fn)])
+    time.sleep(0.05)
+    release.set()
+    for thread in threads + follower_threads:
+        thread.join()
+
+    assert fn.calls == 1
+    assert results == follower_results == [{"answer": "yes", "run": 1}]
+
+def test_redis_results_from_before_an_ingest_are_not_shared():
+    client = FakeRedis()
+    single_flight, fn = RedisSingleFlight(client), Counter()
+
+    assert single_flight.do("key", fn)["run"] == 1
+    assert single_flight.do("key", fn)["run"] == 1  # Shared within result_ttl
+
+    RedisSingleFlight(client).invalidate()
+
+    assert single_flight.do("key", fn)["run"] == 2
+
+def test_redis_calls_after_an_ingest_do_not_wait_for_an_older_leader():
+    client, release = FakeRedis(), threading.Event()
+    fn = Counter(release)
+    threads, results = run_concurrently([lambda: RedisSingleFlight(client).do("key", fn)])
+    fn.started.wait(5)
+
+    RedisSingleFlight(client).invalidate()
+
+    assert RedisSingleFlight(client).do("key", lambda: "after the ingest") == "after the ingest"
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [{"answer": "yes", "run": 1}]
+    # The older leader's result is not shared with the new generation
+    assert RedisSingleFlight(client).do("key", fn) == "after the ingest"
+
+def test_redis_leader_keeps_its_lock_while_computing():
+    client, release = FakeRedis(), threading.Event()
+    single_flight = RedisSingleFlight(client, lock_ttl=0.3)
+    fn = Counter(release)
+    threads, _ = run_concurrently([lambda: single_flight.do("key", fn)])
+    fn.started.wait(5)
+    time.sleep(0.6)
+
+    locks = [key for key in client._values if key.endswith(":lock")]
+    assert len(locks) == 1 and client.exists(locks[0])
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert not client.exists(locks[0])
+
+def test_redis_failure_falls_back_to_local_coalescing():
+    single_flight, release = RedisSingleFlight(BrokenRedis()), threading.Event()
+    fn = Counter(release)
+    threads, results = run_concurrently([lambda: single_flight.do("key", fn)] * 4)
+    fn.started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fn.calls == 1
+    assert results == [{"answer": "yes", "run": 1}] * 4
+    single_flight.invalidate()  # Logged, not raised
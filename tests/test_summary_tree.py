@@ -0,0 +1,35 @@
+import pytest
+
+from app.helpers.summary_tree import group_sections, is_broad_question
+
+@pytest.mark.parametrize("question", [
+    "Summarize this document",
+    "Can you summarise the contract for me?",
+    "Give me a short summary",
+    "What's the overview of this report?",
+    "TL;DR",
+    "What are the key points?",
+    "What are the main takeaways of the paper?",
+    "What is this document about?",
+    "What does the agreement cover?",
+])
+def test_whole_document_questions(question):
+    assert is_broad_question(question)
+
+@pytest.mark.parametrize("question", [
+    "What does the executive summary say about Q3 revenue?",
+    "What is the total in the summary of charges?",
+    "Give me an overview of the termination clause",
+    "What are the key terms of the payment schedule?",
+    "Summarize the payment terms",
+    "Summarize the document and list the parties",
+    "Give me a summary, then the due date",
+    "What is the due date?",
+])
+def test_questions_about_a_part_need_retrieval(question):
+    assert not is_broad_question(question)
+
+def test_sections_split_on_summary_tokens():
+    chunks = [(str(i), "word " * 400, i) for i in range(5)]
+    sections = group_sections(chunks, max_tokens=1000)
+    assert [[chunk[0] for chunk in section] for section in sections] == [["0", "1"], ["2", "3"], ["4"]]
@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.helpers.table_frames import TableFrame, answer_table_question, parse_number
+
+INVOICE_TABLE = """
+<table>
+  <tr><th>Description</th><th>Qty</th><th>Unit Price</th><th>Amount</th></tr>
+  <tr><td>Widget A</td><td>2</td><td>$10.00</td><td>$20.00</td></tr>
+  <tr><td>Widget B</td><td>1</td><td>$5.00</td><td>$5.00</td></tr>
+  <tr><td>Subtotal</td><td></td><td></td><td>$25.00</td></tr>
+  <tr><td>Tax</td><td></td><td></td><td>$2.50</td></tr>
+  <tr><td>Total</td><td></td><td></td><td>$27.50</td></tr>
+</table>
+"""
+
+@pytest.fixture
+def frame() -> TableFrame:
+    return TableFrame.from_html(INVOICE_TABLE)
+
+def answer(question: str, frame: TableFrame):
+    result = answer_table_question(question, frame)
+    return None if result is None else (result.operation, result.column, result.value)
+
+def test_parse_number():
+    assert parse_number("$1,234.50") == 1234.5
+    assert parse_number("(12)") == -12.0
+    assert parse_number("15%") == 15.0
+    assert parse_number("Widget") is None
+
+def test_frame_types(frame):
+    assert frame.columns == ["Description", "Qty", "Unit Price", "Amount"]
+    assert frame.types == ["text", "number", "number", "number"]
+    assert frame.row_count == 5
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the total?", ("lookup", "Amount", 27.5)),
+    ("What is the total of widget B?", ("lookup", "Amount", 5.0)),
+    ("What was the total quantity?", ("sum", "Qty", 3.0)),
+    ("What is the tax amount?", ("lookup", "Amount", 2.5)),
+    ("What is the unit price of widget B?", ("lookup", "Unit Price", 5.0)),
+    ("What is the sum of the amounts?", ("sum", "Amount", 25.0)),
+    ("What is the most expensive item?", ("max", "Amount", 20.0)),
+    ("How many items are there?", ("count", "rows", 2)),
+])
+def test_invoice_questions(question, expected, frame):
+    assert answer(question, frame) == expected
+
+@pytest.mark.parametrize("question", [
+    "What is the date of the total?",
+    "How many pages does the contract have?",
+    "Who signed the agreement?",
+])
+def test_questions_the_table_cannot_answer(question, frame):
+    assert answer(question, frame) is None